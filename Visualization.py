@@ -1,36 +1,42 @@
-import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-# Load the cleaned dataset
-df = pd.read_excel("cleaned_data.xlsx")
+from results_cache import load_results
+
+# Load the tables derived from the cleaned dataset (cached by
+# data_processing.py, or computed once from the file - see results_cache.py)
+results = load_results("cleaned_data.xlsx", verbose=True)
 
 # Display the first few rows
-print(df.head())
+print(results["head"])
 
 # Distribution of Classroom Sizes
+histogram = results["n_chairs_histogram"]
 plt.figure(figsize=(8, 5))
-sns.histplot(df["n_chairs"], bins=10, kde=True, color="blue")
+plt.bar(histogram["edges"][:-1], histogram["counts"], width=np.diff(histogram["edges"]), align="edge",
+        color="blue", alpha=0.5, edgecolor="white")
+if histogram["kde_x"] is not None:
+    plt.plot(histogram["kde_x"], histogram["kde_y"], color="blue")
 plt.title("Distribution of Classroom Sizes (Number of Chairs)")
 plt.xlabel("Number of Chairs")
 plt.ylabel("Frequency")
 
 
 # Number of Classrooms Per Floor
+floor_counts = results["value_counts"]["floor"]
 plt.figure(figsize=(8, 5))
-sns.countplot(y=df["floor"], order=df["floor"].value_counts().index, palette="viridis")
+sns.barplot(x="Count", y="floor", data=floor_counts, order=floor_counts["floor"].tolist(), orient="h",
+            palette="viridis")
 plt.title("Number of Classrooms Per Floor")
 plt.xlabel("Number of Classrooms")
 plt.ylabel("Floor")
 
 
 # Heatmap: Correlation Between Numeric Features
-numeric_df = df.select_dtypes(include=['number'])
-
 plt.figure(figsize=(10, 6))
-sns.heatmap(numeric_df.corr(), annot=True, cmap="coolwarm", fmt=".2f", linewidths=0.5)
+sns.heatmap(results["correlation"], annot=True, cmap="coolwarm", fmt=".2f", linewidths=0.5)
 plt.title("Correlation Between Classroom Features")
 
 
 plt.show()
-
@@ -0,0 +1,151 @@
+"""Clean many classroom workbooks in parallel and analyse them as one dataset.
+
+    python batch_processing.py exports/                          # every .xlsx in the folder
+    python batch_processing.py "exports/*/week42*.xlsx" --workers 8 --output-dir batch_output
+
+Each workbook is loaded and cleaned in its own worker process
+(ProcessPoolExecutor), so the per-file phase uses every core and pandas is
+imported once per worker rather than once per file. The cleaned frames are
+then combined: duplicate classrooms are consolidated across files and the
+statistics describe the union. A file that fails is reported in
+batch_report.csv and left out; the rest of the batch still runs.
+"""
+import argparse
+import glob
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from cleaning import clean
+from column_stats import describe
+from consolidation import consolidate_duplicates
+from data_cache import load_excel
+from schema import NUMERICAL_COLS
+
+SHEET_NAME = "Classroom Data"
+
+
+def find_workbooks(inputs, pattern="*.xlsx"):
+    # Directories (searched for `pattern`), glob patterns or plain file paths
+    found = []
+    for item in inputs:
+        if os.path.isdir(item):
+            found.extend(Path(item).glob(pattern))
+        else:
+            found.extend(Path(path) for path in (glob.glob(item) if glob.has_magic(item) else [item]))
+    # Skip Excel's lock files ("~$book.xlsx") and repeated matches
+    return sorted({path for path in found if not path.name.startswith("~$")})
+
+
+def clean_workbook(path, sheet_name=SHEET_NAME, use_cache=True):
+    # Worker: load and clean one workbook. Never raises - failures come back
+    # in result["error"] so one bad file does not stop the batch.
+    result = {"file": str(path), "rows": 0, "read_seconds": 0.0, "clean_seconds": 0.0,
+              "cpu_seconds": 0.0, "error": None, "frame": None}
+    start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        raw = load_excel(path, sheet_name=sheet_name) if use_cache else pd.read_excel(path, sheet_name=sheet_name)
+        result["read_seconds"] = time.perf_counter() - start
+        cleaned = time.perf_counter()
+        df = clean(raw)
+        result["clean_seconds"] = time.perf_counter() - cleaned
+        result["rows"] = len(df)
+        result["frame"] = df
+    except Exception as err:
+        result["error"] = f"{type(err).__name__}: {err}"
+        result["traceback"] = traceback.format_exc()
+    result["cpu_seconds"] = time.process_time() - cpu_start
+    return result
+
+
+def run_batch(paths, sheet_name=SHEET_NAME, workers=None, use_cache=True, verbose=True):
+    # Clean every workbook in a process pool. Returns ({file: cleaned frame},
+    # per-file report), frames in the order of `paths`.
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(clean_workbook, path, sheet_name, use_cache): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as err:
+                # The worker process itself died (e.g. killed for using too much memory)
+                result = {"file": str(futures[future]), "rows": 0, "error": f"{type(err).__name__}: {err}",
+                          "frame": None}
+            results.append(result)
+            if verbose:
+                if result["error"]:
+                    print(f"❌ {result['file']}: {result['error']}")
+                else:
+                    print(f"✅ {result['file']}: {result['rows']} rows "
+                          f"(read {result['read_seconds']:.2f}s, clean {result['clean_seconds']:.2f}s)")
+
+    order = {str(path): i for i, path in enumerate(paths)}
+    results.sort(key=lambda result: order[result["file"]])
+    frames = {}
+    for result in results:
+        frame = result.pop("frame")
+        if frame is not None:
+            frames[result["file"]] = frame
+    report = pd.DataFrame(results).drop(columns=["traceback"], errors="ignore")
+    return frames, report
+
+
+def merge_frames(frames, key="classroom"):
+    # Union of the cleaned files with duplicates consolidated across files.
+    # Returns (merged frame, original rows of duplicated keys with their file).
+    combined = pd.concat([df.assign(source_file=file) for file, df in frames.items()], ignore_index=True)
+    if key not in combined.columns:
+        return combined.drop(columns="source_file"), combined.iloc[:0]
+    merged, duplicate_keys = consolidate_duplicates(combined.drop(columns="source_file"), key=key)
+    duplicates = combined[combined[key].isin(duplicate_keys)]
+    return merged, duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="workbooks, directories or glob patterns")
+    parser.add_argument("--pattern", default="*.xlsx", help="file pattern used inside directories")
+    parser.add_argument("--sheet", default=SHEET_NAME)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--output-dir", default="batch_output")
+    parser.add_argument("--no-cache", action="store_true", help="always parse the workbooks (see data_cache.py)")
+    args = parser.parse_args()
+
+    paths = find_workbooks(args.inputs, args.pattern)
+    if not paths:
+        parser.error("no workbooks found")
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"📂 Cleaning {len(paths)} workbooks with {args.workers or os.cpu_count()} workers...")
+    start = time.perf_counter()
+    frames, report = run_batch(paths, args.sheet, args.workers, use_cache=not args.no_cache)
+    batch_seconds = time.perf_counter() - start
+    report.to_csv(output_dir / "batch_report.csv", index=False)
+
+    failed = report["error"].notna().sum()
+    busy = report["cpu_seconds"].sum() if "cpu_seconds" in report else 0.0
+    print(f"\n⏱️ Per-file phase: {batch_seconds:.2f}s wall, {busy:.2f}s CPU in workers "
+          f"({len(frames)} cleaned, {failed} failed)")
+    if not frames:
+        print("⚠️ Nothing to merge - every file failed")
+        return
+
+    # Cross-file duplicates and statistics are computed once over the union
+    df, duplicates = merge_frames(frames)
+    print(f"✅ Merged {sum(len(frame) for frame in frames.values())} rows into {len(df)} "
+          f"({duplicates['classroom'].nunique() if len(duplicates) else 0} classrooms had duplicates)")
+    df.to_csv(output_dir / "cleaned_data.csv", index=False)
+    duplicates.to_csv(output_dir / "duplicate_entries.csv", index=False)
+    numerical_cols = list(NUMERICAL_COLS) + ["area_numeric"]
+    describe(df, numerical_cols).to_excel(output_dir / "numerical_statistics.xlsx")
+    print(f"✅ Results saved to '{output_dir}/' (cleaned_data.csv, duplicate_entries.csv, "
+          f"numerical_statistics.xlsx, batch_report.csv)")
+
+
+if __name__ == "__main__":
+    main()
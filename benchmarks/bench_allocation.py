@@ -0,0 +1,72 @@
+"""Classroom allocation: the matching solver against the greedy loop.
+
+Run from the project root:
+
+    python -m benchmarks.bench_allocation                                # 300 to 3000 sections
+    python -m benchmarks.bench_allocation --sections 600 6000 --rooms cleaned_data.xlsx
+    python -m benchmarks.bench_allocation --ilp-max 600                  # exact solution for comparison
+
+Rooms come from --rooms (the cleaned data) or, without it, from a
+synthetic export (synthetic_data.py) of --room-rows rows put through the
+cleaning steps. Sections come from synthetic_data.make_sections with a fixed
+seed. For each size every method places the same sections; the table shows
+the time, the sections placed and the empty seats. The greedy loop is only
+run up to --greedy-max sections and the integer program up to --ilp-max.
+"""
+import argparse
+import time
+
+from allocation import allocate, allocate_greedy, allocate_ilp, summary
+from cleaning import clean
+from consolidation import consolidate_duplicates
+from data_cache import load_cleaned
+from synthetic_data import make_raw_frame, make_sections
+
+
+def synthetic_rooms(n_rows, seed):
+    df = clean(make_raw_frame(n_rows, seed=seed))
+    df, _ = consolidate_duplicates(df, key="classroom")
+    return df
+
+
+def run_method(name, solver, sections, rooms):
+    start = time.perf_counter()
+    assigned, unassigned = solver(sections, rooms)
+    return {"method": name, "seconds": time.perf_counter() - start, **summary(assigned, unassigned)}
+
+
+def benchmark(rooms, sizes, seed=0, greedy_max=3000, ilp_max=0, time_limit=60):
+    results = []
+    for n_sections in sizes:
+        sections = make_sections(n_sections, seed)
+        methods = [("matching", allocate)]
+        if n_sections <= ilp_max:
+            methods.append(("ilp", lambda s, r: allocate_ilp(s, r, time_limit)))
+        if n_sections <= greedy_max:
+            methods.append(("greedy", allocate_greedy))
+        for name, solver in methods:
+            result = run_method(name, solver, sections, rooms)
+            results.append(result)
+            print(f"  {n_sections:>7} {name:<9} {result['seconds']:9.2f}s {result['assigned']:>8} placed "
+                  f"{result['empty_seats']:>9} empty seats")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, nargs="+", default=[300, 600, 1500, 3000])
+    parser.add_argument("--rooms", default=None, help="cleaned data to take the rooms from")
+    parser.add_argument("--room-rows", type=int, default=300, help="synthetic export size without --rooms")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--greedy-max", type=int, default=3000, help="largest size to run the greedy loop on")
+    parser.add_argument("--ilp-max", type=int, default=0, help="largest size to run the integer program on")
+    parser.add_argument("--time-limit", type=float, default=60, help="seconds per integer program")
+    args = parser.parse_args()
+
+    rooms = load_cleaned(args.rooms) if args.rooms else synthetic_rooms(args.room_rows, args.seed)
+    print(f"🏫 {len(rooms)} rooms")
+    benchmark(rooms, args.sections, args.seed, args.greedy_max, args.ilp_max, args.time_limit)
+
+
+if __name__ == "__main__":
+    main()
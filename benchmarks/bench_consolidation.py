@@ -0,0 +1,137 @@
+"""Benchmark: grouped duplicate consolidation vs. the original per-classroom loop.
+
+Run from the project root:
+
+    python -m benchmarks.bench_consolidation
+    python -m benchmarks.bench_consolidation --sizes 10000 100000 --legacy-max-rows 100000
+
+The legacy loop is quadratic, so by default it is only timed up to
+--legacy-max-rows rows; wherever both run, their outputs are checked to be equal.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from consolidation import consolidate_duplicates
+from schema import BOOLEAN_COLS, EXCLUDE_COLUMNS, NUMERICAL_COLS, NUMERIC_INT_COLS
+
+
+def make_cleaned_frame(n_rows, duplicate_rate=0.3, seed=0):
+    # Synthetic frame shaped like the output of the cleaning steps
+    rng = np.random.default_rng(seed)
+    n_rooms = max(1, int(n_rows * (1 - duplicate_rate)))
+    classroom = np.char.add("R", rng.integers(0, n_rooms, n_rows).astype(str))
+    floor_number = rng.integers(-1, 5, n_rows)
+    area_numeric = rng.uniform(15, 150, n_rows).round(2)
+    df = pd.DataFrame({
+        "classroom": classroom,
+        "floor": np.char.add(floor_number.astype(str), " floor"),
+        "n_chairs": rng.integers(5, 120, n_rows),
+        "n_aircon": rng.integers(0, 4, n_rows),
+        "n_windows": rng.integers(0, 8, n_rows),
+        "Lighting": rng.integers(2, 20, n_rows).astype(float),
+        "socket": rng.integers(0, 20, n_rows),
+        "Nbr of cameras": rng.integers(0, 3, n_rows),
+        "Nbr of doors": rng.integers(1, 3, n_rows),
+        "area": [f"{a:.2f} sqm" for a in area_numeric],
+        "has_blinds": rng.random(n_rows) < 0.5,
+        "has_smartboard": rng.random(n_rows) < 0.3,
+        "has_computer": rng.random(n_rows) < 0.6,
+        "Exit banner": rng.random(n_rows) < 0.8,
+        "Cleaning Service": rng.choice(["daily", "weekly", "monthly"], n_rows),
+        "WiFi Connection": rng.choice(["Good", "Poor"], n_rows),
+        "Noise Level": rng.choice(["High", "Low", "Moderate"], n_rows),
+        "Main Entrance Distance": rng.choice(["Short", "Medium", "Long", "Very short"], n_rows),
+        "name": rng.choice(["ann", "bob", None], n_rows),
+        "floor_number": floor_number.astype(float),
+        "area_numeric": area_numeric,
+    })
+    return df
+
+
+def legacy_consolidate(df):
+    # The original per-classroom loop from data_processing.py, kept verbatim
+    # apart from being wrapped in a function
+    numerical_cols = NUMERICAL_COLS
+    numeric_int_cols = NUMERIC_INT_COLS
+    boolean_cols = BOOLEAN_COLS
+    exclude_columns = EXCLUDE_COLUMNS
+
+    duplicate_classrooms = df["classroom"].value_counts()
+    duplicate_classrooms = duplicate_classrooms[duplicate_classrooms > 1].index.tolist()
+    consolidated_df = pd.DataFrame(columns=df.columns)
+    for classroom in duplicate_classrooms:
+        duplicate_rows = df[df["classroom"] == classroom]
+        consolidated_row = {}
+        for column in df.columns:
+            if column.lower() in [col.lower() for col in exclude_columns]:
+                consolidated_row[column] = None
+                continue
+            if column == "classroom":
+                consolidated_row[column] = classroom
+            elif column in numerical_cols:
+                if column in numeric_int_cols:
+                    consolidated_row[column] = int(np.ceil(duplicate_rows[column].mean()))
+                else:
+                    consolidated_row[column] = round(duplicate_rows[column].mean(), 2)
+            elif column == "area_numeric":
+                consolidated_row[column] = round(duplicate_rows[column].mean(), 2)
+            elif column == "floor":
+                consolidated_row[column] = duplicate_rows[column].mode()[0]
+                if "floor_number" in df.columns:
+                    consolidated_row["floor_number"] = duplicate_rows["floor_number"].mode()[0]
+            elif column in boolean_cols:
+                consolidated_row[column] = duplicate_rows[column].any()
+            elif column == "area":
+                if "area_numeric" in consolidated_row:
+                    area_value = consolidated_row["area_numeric"]
+                else:
+                    area_value = round(duplicate_rows["area_numeric"].mean(), 2)
+                consolidated_row[column] = f"{area_value:.2f} sqm"
+            else:
+                non_null_values = duplicate_rows[column].dropna()
+                if len(non_null_values) > 0:
+                    consolidated_row[column] = non_null_values.mode()[0]
+                else:
+                    consolidated_row[column] = None
+        consolidated_df = pd.concat([consolidated_df, pd.DataFrame([consolidated_row])], ignore_index=True)
+
+    df_clean = df[~df["classroom"].isin(duplicate_classrooms)]
+    df_clean = pd.concat([df_clean, consolidated_df], ignore_index=True)
+    df_clean = df_clean.sort_values(by="classroom").reset_index(drop=True)
+    return df_clean, duplicate_classrooms
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--duplicate-rate", type=float, default=0.3)
+    parser.add_argument("--legacy-max-rows", type=int, default=10_000,
+                        help="skip the quadratic legacy loop above this many rows")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'duplicates':>11} {'grouped (s)':>12} {'legacy (s)':>11} {'speedup':>8}")
+    for n_rows in args.sizes:
+        df = make_cleaned_frame(n_rows, args.duplicate_rate)
+        (fast, keys), fast_time = timed(consolidate_duplicates, df)
+
+        legacy_time = None
+        if n_rows <= args.legacy_max_rows:
+            (slow, _), legacy_time = timed(legacy_consolidate, df)
+            pd.testing.assert_frame_equal(fast, slow, check_dtype=False)
+
+        legacy_text = f"{legacy_time:11.3f}" if legacy_time is not None else f"{'skipped':>11}"
+        speedup = f"{legacy_time / fast_time:7.1f}x" if legacy_time is not None else f"{'-':>8}"
+        print(f"{n_rows:>10} {len(keys):>11} {fast_time:12.3f} {legacy_text} {speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Startup cost of the pipeline modules, measured with `python -X importtime`.
+
+Run from the project root:
+
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --module data_processing --repeat 5
+
+Each module is imported in a fresh interpreter (best of --repeat runs). The
+table lists the module's cumulative import time and the heaviest third-party
+packages it pulled in; `plots` shows what the plotting stage adds on top.
+"""
+import argparse
+import subprocess
+import sys
+
+MODULES = ["data_processing", "cleaning", "streaming", "incremental", "batch_processing"]
+HEAVY = ["pandas", "numpy", "matplotlib.pyplot", "seaborn", "scipy", "openpyxl", "pyarrow"]
+
+
+def import_times(statement):
+    # {module: cumulative microseconds} for one fresh interpreter
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times.setdefault(name.strip(), int(cumulative))
+    return times
+
+
+def best_of(statement, repeat):
+    runs = [import_times(statement) for _ in range(repeat)]
+    return {name: min(run.get(name, 0) for run in runs) for name in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", action="append", help="module(s) to measure (default: the pipeline scripts)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'import':<28} {'total (ms)':>11}  heaviest dependencies")
+    statements = [(module, f"import {module}") for module in args.module or MODULES]
+    statements.append(("plots", "import matplotlib.pyplot, seaborn"))
+    for label, statement in statements:
+        times = best_of(statement, args.repeat)
+        top = label if label != "plots" else "seaborn"
+        total = times.get(top, 0) + (times.get("matplotlib.pyplot", 0) if label == "plots" else 0)
+        heavy = ", ".join(f"{name} {times[name] / 1000:.0f}" for name in HEAVY if times.get(name))
+        print(f"{label:<28} {total / 1000:11.1f}  {heavy}")
+
+
+if __name__ == "__main__":
+    main()
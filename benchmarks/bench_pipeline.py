@@ -0,0 +1,222 @@
+"""Stage timings of the whole pipeline on synthetic exports of growing size.
+
+Run from the project root:
+
+    python -m benchmarks.bench_pipeline                                  # 1k, 10k, 100k rows
+    python -m benchmarks.bench_pipeline --sizes 10000 1000000 --format csv --label big-csv
+    python -m benchmarks.bench_pipeline --compare benchmarks/results/v1.json
+
+For each size a synthetic export (synthetic_data.py, fixed seed) is written
+once to --workdir and reused by later runs. data_processing.py then runs on
+it in a fresh interpreter with an empty input cache, and its run record
+(instrumentation.py) gives the time of every stage. compare_files.py's diff
+of the export against the cleaned output runs next, in its own process.
+Each stage keeps its best time over --repeat runs.
+
+The results are saved as benchmarks/results/<label>.json (default label: the
+current commit). --compare prints them next to an earlier result and flags
+stages that got slower by more than --threshold.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import RunRecord
+from synthetic_data import make_raw_frame, write_raw_frame
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+
+def current_label():
+    # Short commit hash (+ "-dirty" with uncommitted changes), or the time
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+
+def synthetic_input(workdir, n_rows, fmt, duplicate_rate, seed):
+    # The export for one size, generated on first use
+    path = Path(workdir) / f"synthetic_{n_rows}_{duplicate_rate}_{seed}.{fmt}"
+    if not path.exists():
+        start = time.perf_counter()
+        write_raw_frame(make_raw_frame(n_rows, duplicate_rate, seed), path)
+        print(f"   generated '{path}' in {time.perf_counter() - start:.1f}s")
+    return path
+
+
+def run_pipeline(raw_path, run_dir, stages):
+    # data_processing.py in a fresh interpreter and an empty input cache;
+    # returns its run record
+    shutil.rmtree(run_dir, ignore_errors=True)
+    run_dir.mkdir(parents=True)
+    env = dict(os.environ, CLASSROOM_CACHE_DIR=str(run_dir / ".cache"), MPLBACKEND="Agg")
+    command = [sys.executable, str(ROOT / "data_processing.py"), str(raw_path.resolve()),
+               "--stages", ",".join(stages), "--run-record", "run_record.json"]
+    result = subprocess.run(command, cwd=run_dir, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"data_processing.py failed on '{raw_path}':\n{result.stderr[-2000:]}")
+    return json.loads((run_dir / "run_record.json").read_text())
+
+
+def time_diff(raw_path, cleaned_path, log_path):
+    # compare_files.py's steps under a run record (runs in a worker process)
+    from compare_files import diff_frames, load_table, write_change_log
+
+    record = RunRecord()
+    with record.stage("load original") as stage:
+        original = load_table(raw_path, sheet_name="Classroom Data")
+        stage["rows_out"] = len(original)
+    with record.stage("load cleaned") as stage:
+        cleaned = load_table(cleaned_path)
+        stage["rows_out"] = len(cleaned)
+    with record.stage("diff", rows_in=len(original)) as stage:
+        log, _ = diff_frames(original, cleaned)
+        stage["rows_out"] = len(log)
+    with record.stage("write log", rows_in=len(log)):
+        write_change_log(log, log_path)
+    return record.as_dict()
+
+
+def run_diff(raw_path, run_dir):
+    # Fresh process each time, so its peak memory is the diff's own
+    os.environ["CLASSROOM_CACHE_DIR"] = str(run_dir / ".cache")
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(time_diff, raw_path, run_dir / "cleaned_data.csv", run_dir / "change_log.parquet").result()
+
+
+def best_stages(records, prefix):
+    # {prefix:stage: best wall/CPU seconds over the repeats} plus a
+    # "<prefix> total" entry with the whole run and its peak memory
+    stages = {}
+    for record in records:
+        for entry in record["stages"]:
+            best = stages.setdefault(f"{prefix}:{entry['name']}", {
+                "parent": f"{prefix}:{entry['parent']}" if entry["parent"] else None,
+                "wall_s": np.inf, "cpu_s": np.inf, "rows_in": entry["rows_in"], "rows_out": entry["rows_out"]})
+            best["wall_s"] = min(best["wall_s"], entry["wall_s"])
+            best["cpu_s"] = min(best["cpu_s"], entry["cpu_s"])
+    stages[f"{prefix} total"] = {
+        "parent": None,
+        "wall_s": min(record["run"]["wall_s"] for record in records),
+        "cpu_s": min(record["run"]["cpu_s"] for record in records),
+        "peak_rss_mb": max(record["run"]["peak_rss_mb"] for record in records),
+    }
+    return stages
+
+
+def benchmark(sizes, workdir, fmt="xlsx", repeat=1, stages=("clean", "stats", "report"), duplicate_rate=0.2,
+              seed=0):
+    workdir = Path(workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    results = {}
+    for n_rows in sizes:
+        print(f"\n📏 {n_rows} rows")
+        raw_path = synthetic_input(workdir, n_rows, fmt, duplicate_rate, seed)
+        run_dir = workdir / f"run_{n_rows}"
+        pipeline, diff = [], []
+        for _ in range(repeat):
+            pipeline.append(run_pipeline(raw_path, run_dir, stages))
+            diff.append(run_diff(raw_path, run_dir))
+        results[str(n_rows)] = {**best_stages(pipeline, "pipeline"), **best_stages(diff, "compare_files")}
+        print(format_results(results[str(n_rows)]))
+    return results
+
+
+def format_results(stages, baseline=None, threshold=1.2, min_delta=0.05):
+    # Top-level stages (and any nested stage that regressed) with the
+    # baseline's time and the ratio when a baseline is given
+    lines = [f"  {'stage':<50} {'wall s':>9}" + (f" {'before':>9} {'ratio':>7}" if baseline is not None else "")]
+    for name, stage in stages.items():
+        old = (baseline or {}).get(name)
+        regressed = bool(old) and is_regression(old["wall_s"], stage["wall_s"], threshold, min_delta)
+        if stage["parent"] is not None and not regressed:
+            continue
+        line = f"  {name:<50} {stage['wall_s']:9.3f}"
+        if baseline is not None:
+            line += f" {old['wall_s']:9.3f} {stage['wall_s'] / max(old['wall_s'], 1e-9):6.2f}x" if old else f" {'-':>9}"
+            if regressed:
+                line += "  ⚠️ slower"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def is_regression(old, new, threshold, min_delta):
+    return new > old * threshold and new - old > min_delta
+
+
+def save_results(results, label, args):
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{label}.json"
+    document = {
+        "label": label,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "cpus": os.cpu_count(),
+        "format": args.format,
+        "repeat": args.repeat,
+        "duplicate_rate": args.duplicate_rate,
+        "seed": args.seed,
+        "sizes": results,
+    }
+    path.write_text(json.dumps(document, indent=2))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--format", choices=["xlsx", "csv"], default="xlsx", help="synthetic export format")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--stages", default="clean,stats,report", help="data_processing.py stages to run")
+    parser.add_argument("--duplicate-rate", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=".cache/bench_pipeline", help="synthetic inputs and run outputs")
+    parser.add_argument("--label", default=None, help="results name (default: the current commit)")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="flag stages slower than this ratio (and by more than 0.05s)")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    results = benchmark(args.sizes, args.workdir, args.format, args.repeat, stages, args.duplicate_rate, args.seed)
+    path = save_results(results, args.label or current_label(), args)
+    print(f"\n✅ Results saved as '{path}'")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        regressions = 0
+        for size, size_stages in results.items():
+            if size not in baseline["sizes"]:
+                continue
+            old = baseline["sizes"][size]
+            print(f"\n📊 {size} rows vs '{baseline['label']}'")
+            print(format_results(size_stages, old, args.threshold))
+            regressions += sum(1 for name, stage in size_stages.items()
+                               if name in old and is_regression(old[name]["wall_s"], stage["wall_s"],
+                                                                args.threshold, 0.05))
+        if regressions:
+            print(f"\n⚠️ {regressions} stage(s) slower than {args.threshold}x the baseline")
+            sys.exit(1)
+        print("\n✅ No stage slower than the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Micro-benchmark: row-wise regex lambdas vs. the compiled cleaning rules.
+
+Run from the project root:
+
+    python -m benchmarks.bench_text_normalization
+    python -m benchmarks.bench_text_normalization --rows 200000
+
+Each column is cleaned both ways on the same synthetic frame (values drawn
+from a small pool of messy strings, like a real survey export) and the
+results are checked to be equal.
+"""
+import argparse
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from cleaning import FLOOR_MAPPING, NOISE_PATTERN, PIPELINE
+
+LIGHTING_VALUES = [4, 6, 8, 12, "10 lamps", "12.5", "6 (broken 2)", " 8 ", "about 20", None, "n/a"]
+NOISE_VALUES = ["high", "Low noise", "moderate level", "HIGH!", "quiet", " Moderate ", "very low", None]
+FLOOR_VALUES = ["first", "second", "third", "ground floor", "1st", "2nd", "2nd floor", "2 nd", "3rd",
+                "0", "-1", "1", "2", "4", "5. floor", "3-floor", "Ground Floor ", None]
+
+
+def make_raw_frame(n_rows, n_classrooms=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    rooms = [f"{block}-{number}" for block, number in zip(rng.choice(list("ABCDE"), n_classrooms),
+                                                           rng.integers(100, 999, n_classrooms))]
+    spellings = rooms + [room.lower() for room in rooms] + [room.replace("-", " ") for room in rooms]
+    pick = lambda values: np.array(values, dtype=object)[rng.integers(0, len(values), n_rows)]
+    return pd.DataFrame({
+        "Lighting": pick(LIGHTING_VALUES),
+        "Noise Level": pick(NOISE_VALUES),
+        "classroom": pick(spellings),
+        "floor": pick(FLOOR_VALUES),
+    })
+
+
+# ------------------------------------
+# The original row-wise code from data_processing.py
+# ------------------------------------
+
+def legacy_lighting(df):
+    s = df["Lighting"].astype(str).str.strip()
+    s = pd.to_numeric(s.str.extract(r'(\d+(?:\.\d+)?)').fillna('')[0], errors='coerce')
+    s = s.astype(str)
+    s = s.apply(lambda x: re.search(r"\d+", x).group() if re.search(r"\d+", x) else "")
+    return pd.DataFrame({"Lighting": pd.to_numeric(s, errors="coerce")})
+
+
+def legacy_noise(df):
+    s = df["Noise Level"].astype(str).str.lower().str.strip()
+    s = s.apply(lambda x: re.search(NOISE_PATTERN, x).group().capitalize() if re.search(NOISE_PATTERN, x) else "")
+    return pd.DataFrame({"Noise Level": s})
+
+
+def legacy_classroom(df):
+    s = df["classroom"].astype(str).str.upper()
+    s = s.apply(lambda x: re.sub(r"[^A-Z0-9]", "", x))
+    return pd.DataFrame({"classroom": s})
+
+
+def legacy_floor(df):
+    s = df["floor"].astype(str).str.lower().str.strip()
+    s = s.replace(FLOOR_MAPPING)
+    s = s.apply(lambda x: f"{x} floor" if x.lstrip('-').isdigit() else x)
+    s = s.str.replace(r"\.", "", regex=True)
+    s = s.str.replace(r"(\d+)-?\s*floor", r"\1 floor", regex=True)
+    return pd.DataFrame({"floor": s, "floor_number": s.str.extract(r"(-?\d+)").astype(float)[0]})
+
+
+LEGACY = {
+    "Lighting": legacy_lighting,
+    "Noise Level": legacy_noise,
+    "classroom": legacy_classroom,
+    "floor": legacy_floor,
+}
+
+
+def compiled(column):
+    # The compiled element-wise operations for one column (fills excluded)
+    operations = [op for op in PIPELINE
+                  if op.column == column and not op.label.split(":", 1)[1].startswith("fill")]
+
+    def run(df):
+        df = df[[column]].copy()
+        for operation in operations:
+            df = operation.func(df)
+        return df
+    return run
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = make_raw_frame(args.rows)
+    print(f"{args.rows} rows")
+    print(f"{'column':<12} {'distinct':>9} {'row-wise (s)':>13} {'compiled (s)':>13} {'speedup':>8}")
+    for column, legacy in LEGACY.items():
+        slow, slow_time = timed(legacy, df)
+        fast, fast_time = timed(compiled(column), df)
+        pd.testing.assert_frame_equal(fast[slow.columns], slow, check_dtype=False)
+        distinct = df[column].astype(str).nunique()
+        print(f"{column:<12} {distinct:>9} {slow_time:13.3f} {fast_time:13.3f} {slow_time / fast_time:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
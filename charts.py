@@ -0,0 +1,209 @@
+"""Render the chart set from a cleaned dataset, headless and in parallel.
+
+    python charts.py                                      # cleaned_data.xlsx -> charts/
+    python charts.py cleaned_data.csv --output-dir charts --workers 4
+
+Everything the charts need (value counts, the correlation matrix, histogram
+bins and the density curve) is computed once from the cleaned frame and
+cached (see results_cache.py), so charts for a file data_processing.py
+wrote do not read the data at all. Only
+those small tables are passed to the renderers, so the work per chart does
+not grow with the number of rows. Each chart is drawn on its own Agg figure,
+saved, and dropped straight away - nothing is kept in pyplot's figure list.
+With more than one worker the charts are rendered in a process pool.
+
+data_processing.py uses the same functions for its plots stage.
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# One chart to render: what to draw (kind), where to save it, the
+# precomputed data and the figure options (title, labels, size)
+Chart = namedtuple("Chart", ["kind", "path", "data", "options"])
+
+KDE_GRID = 200
+KDE_BINS = 1024
+# Bar charts of free-text columns (classroom codes, names) show the most
+# frequent values only
+MAX_BARS = 30
+
+
+# ====================================
+# Chart data (computed once)
+# ====================================
+
+def value_counts_table(s, top=None):
+    # Counts of each value, most frequent first (categories with no rows left
+    # out), optionally only the `top` most frequent
+    counts = s.value_counts()
+    counts = counts[counts > 0].iloc[:top].reset_index()
+    counts.columns = [s.name, "Count"]
+    return counts
+
+
+def histogram_data(s, bins=10):
+    # Bin edges and counts plus a Gaussian density curve scaled to the counts,
+    # the same curve seaborn's histplot(kde=True) draws (Scott's bandwidth,
+    # evaluated over the data range). The density is computed from a fine
+    # histogram of the values, so its cost does not depend on the row count.
+    values = pd.to_numeric(s, errors="coerce").dropna().to_numpy(dtype="float64")
+    if not len(values):
+        return {"edges": np.array([0.0, 1.0]), "counts": np.array([0]), "kde_x": None, "kde_y": None}
+    counts, edges = np.histogram(values, bins=bins)
+    kde_x = kde_y = None
+    std = values.std(ddof=1) if len(values) > 1 else 0.0
+    if std > 0:
+        fine_counts, fine_edges = np.histogram(values, bins=KDE_BINS)
+        centres = (fine_edges[:-1] + fine_edges[1:]) / 2
+        bandwidth = std * len(values) ** (-1 / 5)
+        kde_x = np.linspace(values.min(), values.max(), KDE_GRID)
+        weights = np.exp(-0.5 * ((kde_x[:, None] - centres[None, :]) / bandwidth) ** 2) @ fine_counts
+        density = weights / (len(values) * bandwidth * np.sqrt(2 * np.pi))
+        kde_y = density * len(values) * (edges[1] - edges[0])
+    return {"edges": edges, "counts": counts, "kde_x": kde_x, "kde_y": kde_y}
+
+
+def report_charts(correlation_matrix, categorical_stats, output_dir="."):
+    # The charts of data_processing.py's plots stage, from tables it already has
+    output_dir = Path(output_dir)
+    charts = []
+    if correlation_matrix is not None:
+        charts.append(Chart("heatmap", output_dir / "correlation_heatmap.png", correlation_matrix,
+                            {"figsize": (10, 8), "title": "Correlation Matrix of Numerical Features"}))
+    for col, counts in categorical_stats.items():
+        charts.append(Chart("bars", output_dir / f"{col}_distribution.png", counts,
+                            {"figsize": (10, 6), "title": f"Distribution of {col}", "rotation": 45}))
+    return charts
+
+
+def overview_charts(results, output_dir="."):
+    # The charts of vis2.py / vis3.py / Visualization.py, as files, from the
+    # derived tables of the cleaned data (results_cache.load_results())
+    output_dir = Path(output_dir)
+    charts = []
+    if results["n_chairs_histogram"] is not None:
+        charts.append(Chart("histogram", output_dir / "classroom_size_distribution.png", results["n_chairs_histogram"],
+                            {"figsize": (8, 5), "title": "Distribution of Classroom Sizes (Number of Chairs)",
+                             "xlabel": "Number of Chairs", "ylabel": "Frequency"}))
+    if "floor" in results["value_counts"]:
+        charts.append(Chart("hbars", output_dir / "classrooms_per_floor.png", results["value_counts"]["floor"],
+                            {"figsize": (8, 5), "title": "Number of Classrooms Per Floor",
+                             "xlabel": "Number of Classrooms", "ylabel": "Floor"}))
+    if results["correlation"].shape[1] > 1:
+        charts.append(Chart("heatmap", output_dir / "feature_correlation_heatmap.png", results["correlation"],
+                            {"figsize": (10, 6), "title": "Correlation Between Classroom Features",
+                             "linewidths": 0.5}))
+    for col in results["categorical"]:
+        counts = results["value_counts"][col].iloc[:MAX_BARS]
+        title = f"Distribution of {col}" if results["distinct"][col] <= MAX_BARS else f"Top {MAX_BARS} values of {col}"
+        charts.append(Chart("bars", output_dir / f"{col}_distribution.png", counts,
+                            {"figsize": (8, 5), "title": title, "rotation": 45, "xlabel": col, "ylabel": "Count"}))
+    return charts
+
+
+# ====================================
+# Rendering
+# ====================================
+
+def _draw_heatmap(ax, data, options):
+    import seaborn as sns
+    sns.heatmap(data, annot=True, cmap="coolwarm", fmt=".2f", linewidths=options.get("linewidths", 0), ax=ax)
+
+
+def _draw_bars(ax, data, options):
+    import seaborn as sns
+    col = data.columns[0]
+    sns.barplot(x=col, y="Count", data=data, order=data[col].tolist(), ax=ax)
+    ax.tick_params(axis="x", labelrotation=options.get("rotation", 0))
+
+
+def _draw_hbars(ax, data, options):
+    import seaborn as sns
+    col = data.columns[0]
+    sns.barplot(x="Count", y=col, data=data, order=data[col].tolist(), orient="h", ax=ax)
+
+
+def _draw_histogram(ax, data, options):
+    edges = data["edges"]
+    ax.bar(edges[:-1], data["counts"], width=np.diff(edges), align="edge", color="blue", alpha=0.5,
+           edgecolor="white")
+    if data["kde_x"] is not None:
+        ax.plot(data["kde_x"], data["kde_y"], color="blue")
+
+
+DRAW = {
+    "heatmap": _draw_heatmap,
+    "bars": _draw_bars,
+    "hbars": _draw_hbars,
+    "histogram": _draw_histogram,
+}
+
+
+def render_chart(chart):
+    # Draw one chart on its own Agg figure and save it. The figure never
+    # enters pyplot's list of open figures, so it is freed on return.
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    start = time.perf_counter()
+    fig = Figure(figsize=chart.options.get("figsize", (8, 5)))
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    DRAW[chart.kind](ax, chart.data, chart.options)
+    ax.set_title(chart.options.get("title", ""))
+    if "xlabel" in chart.options:
+        ax.set_xlabel(chart.options["xlabel"])
+    if "ylabel" in chart.options:
+        ax.set_ylabel(chart.options["ylabel"])
+    fig.tight_layout()
+    fig.savefig(chart.path)
+    return str(chart.path), time.perf_counter() - start
+
+
+def render_charts(charts, workers=None):
+    # Render every chart; with more than one worker (default: one per core)
+    # they are spread over a process pool. Returns [(path, seconds)].
+    # The workers are spawned, not forked: this runs from a pipeline stage
+    # thread while other stages and the export threads hold locks, and a
+    # forked child could inherit one of them locked forever.
+    workers = min(workers or os.cpu_count() or 1, len(charts))
+    if workers <= 1:
+        return [render_chart(chart) for chart in charts]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(render_chart, charts, chunksize=max(1, len(charts) // (workers * 4))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", nargs="?", default="cleaned_data.xlsx")
+    parser.add_argument("--output-dir", default="charts")
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: one per core)")
+    args = parser.parse_args()
+
+    from results_cache import load_results
+
+    start = time.perf_counter()
+    # The tables data_processing.py cached for this file, or computed once
+    # from it (see results_cache.py)
+    results = load_results(args.file)
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    charts = overview_charts(results, output_dir)
+    prepared = time.perf_counter()
+
+    rendered = render_charts(charts, args.workers)
+    done = time.perf_counter()
+    print(f"✅ {len(rendered)} charts saved to '{output_dir}/' "
+          f"(data {prepared - start:.2f}s, rendering {done - prepared:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
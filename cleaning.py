@@ -0,0 +1,526 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+import column_stats
+import fuzzy_matching
+from schema import BOOLEAN_COLS, CATEGORICAL_COLS, NUMERIC_INT_COLS
+
+# ====================================
+# Cleaning Rules
+# ====================================
+#
+# The cleaning steps are described as data: CLEANING_RULES is an ordered list
+# of (column, [rules]) entries. compile_rules() turns it once into a list of
+# vectorized operations, fusing what can be fused:
+#   - consecutive text rules (strip/lower/upper) become one string pass
+#   - consecutive value mappings become one replace() with a merged dict
+#   - runs of element-wise rules are evaluated on the distinct values only
+#   - number extraction skips the str round-trip when the column is numeric
+# clean(df) runs the compiled operations on a copy of the frame. Importing this
+# module has no side effects.
+#
+# Fills and the area step need statistics of the whole column (GLOBAL_KINDS);
+# every other rule only looks at one row at a time, which is what lets
+# streaming.py run them chunk by chunk.
+
+Rule = namedtuple("Rule", ["kind", "arg"])
+Operation = namedtuple("Operation", ["label", "column", "func", "rule"])
+
+GLOBAL_KINDS = ("fill_median", "fill_mode", "fill_blank_with_mode", "frame")
+
+INTEGER = r"(\d+)"
+DECIMAL = r"(\d+(?:\.\d+)?)"
+
+
+def strip():
+    return Rule("strip", None)
+
+
+def lower():
+    return Rule("lower", None)
+
+
+def upper():
+    return Rule("upper", None)
+
+
+def capitalize():
+    return Rule("capitalize", None)
+
+
+def fuzzy(vocabulary):
+    # Values a typo or two away from exactly one vocabulary word become that
+    # word (see fuzzy_matching.py); anything else is kept
+    return Rule("fuzzy", tuple(sorted(vocabulary)))
+
+
+def map_values(mapping):
+    # Whole-value replacement; values not in the mapping are kept
+    return Rule("map", dict(mapping))
+
+
+def extract_number(pattern=DECIMAL):
+    return Rule("extract_number", pattern)
+
+
+def fill_median():
+    return Rule("fill_median", None)
+
+
+def fill_mode(default):
+    return Rule("fill_mode", default)
+
+
+def fill_blank_with_mode(default):
+    # Replace "" with the most frequent value (which may itself be "")
+    return Rule("fill_blank_with_mode", default)
+
+
+def to_int():
+    return Rule("to_int", None)
+
+
+def to_bool(mapping):
+    return Rule("to_bool", dict(mapping))
+
+
+def apply(func):
+    # Element-wise Python function; prefer a vectorized rule where one exists
+    return Rule("apply", func)
+
+
+def extract_text(pattern, default=""):
+    # First match of `pattern`, or `default` when nothing matches
+    return Rule("extract_text", (pattern, default))
+
+
+def suffix_numbers(suffix):
+    # Append `suffix` to values that are just a (possibly negative) integer
+    return Rule("suffix_numbers", suffix)
+
+
+def regex_replace(pattern, replacement):
+    return Rule("regex_replace", (pattern, replacement))
+
+
+def derive(target, pattern):
+    # New float column from the first match of `pattern`
+    return Rule("derive", (target, pattern))
+
+
+def frame_step(func, row_local=False):
+    # Whole-frame function for steps that do not fit a single column. Pass
+    # row_local=True when the step never looks at other rows.
+    return Rule("row_frame" if row_local else "frame", func)
+
+
+# Step 2: Rename columns for consistency
+COLUMN_RENAMES = {
+    "Ligting": "Lighting",
+    "Cleaning service": "Cleaning Service",
+    "Interior Deign": "Interior Design",
+    "Uage Timing": "Usage Timing",
+    "m_entr_distance": "Main Entrance Distance",
+    "wifi_connec": "WiFi Connection"
+}
+
+BOOLEAN_MAPPING = {
+    "yes": True, "no": False, "Yes": True, "NO": False, "No": False,
+    "TRUE": True, "FALSE": False, "YES": True, "True": True, "False": False
+}
+
+FLOOR_MAPPING = {
+    "first": "1 floor",
+    "second": "2 floor",
+    "third": "3 floor",
+    "ground floor": "0 floor",
+    "1st": "1 floor",
+    "2nd": "2 floor",
+    "2nd floor": "2 floor",
+    "2 nd": "2 floor",
+    "3rd": "3 floor",
+    "0": "0 floor",
+    "-1": "-1 floor"
+}
+
+WIFI_MAPPING = {
+    "good": "Good",
+    "poor": "Poor",
+    "low": "Poor",
+    "non exising": "Poor",
+    "non existing": "Poor"
+}
+
+DISTANCE_MAPPING = {
+    "short": "Short",
+    "medium": "Medium",
+    "long": "Long",
+    "very short": "Very Short"
+}
+
+# Known spellings that unlisted typos are resolved to before the mappings
+WIFI_WORDS = list(WIFI_MAPPING) + ["excellent"]
+
+NOISE_PATTERN = r"\b(high|low|moderate)\b"
+
+
+def area_numeric(area):
+    # Number in a raw area value, e.g. " 45.5 Sqm" -> 45.5 (NaN when there is none)
+    text = area.astype(str).str.lower().str.strip()
+    return pd.to_numeric(text.str.extract(r"(\d+\.?\d*)")[0], errors="coerce")
+
+
+def standardize_area(df, stats=None):
+    # Standardize the area column to "XX.XX sqm" and fix impossible areas.
+    # `stats` (median_area, median_ratio) replaces the statistics of this
+    # frame, e.g. with ones computed over a whole file. Outlier detection
+    # for review lives in outliers.py.
+    if "area" not in df.columns:
+        return df
+    df["area"] = df["area"].astype(str).str.lower().str.strip()
+
+    # Extract numerical values from area, fill any missing values with the median area
+    df["area_numeric"] = area_numeric(df["area"])
+    median_area = stats["median_area"] if stats else df["area_numeric"].median()
+    df["area_numeric"] = df["area_numeric"].fillna(median_area)
+
+    # Rooms with more than 50 chairs in under 10 sqm: the area is a typo, so
+    # estimate it from the typical chairs-per-sqm ratio (one masked assignment)
+    median_ratio = stats["median_ratio"] if stats else (df["n_chairs"] / df["area_numeric"]).median()
+    small_area_many_chairs = (df["area_numeric"] < 10) & (df["n_chairs"] > 50)
+    df.loc[small_area_many_chairs, "area_numeric"] = df.loc[small_area_many_chairs, "n_chairs"] / median_ratio
+
+    # Format area consistently with 2 decimal places and "sqm", once per
+    # distinct area
+    codes, areas = pd.factorize(df["area_numeric"])
+    labels = np.array([f"{x:.2f} sqm" for x in areas] + [""], dtype=object)
+    df["area"] = labels[codes]
+    return df
+
+
+def _rename_columns(df):
+    # Cleaning column names (remove spaces & fix names)
+    df.columns = df.columns.str.strip()
+    return df.rename(columns=COLUMN_RENAMES)
+
+
+CLEANING_RULES = [
+    (None, [frame_step(_rename_columns, row_local=True)]),
+
+    # Numbers stored as text, e.g. "2 (just for hot weather)" -> 2.
+    # No strip() needed: the regex search ignores surrounding spaces.
+    ("n_aircon", [extract_number(INTEGER)]),
+    ("n_chairs", [extract_number(DECIMAL)]),
+    ("Nbr of cameras", [extract_number(DECIMAL)]),
+    ("Nbr of doors", [extract_number(DECIMAL)]),
+    ("n_windows", [extract_number(DECIMAL)]),
+    ("socket", [extract_number(DECIMAL)]),
+    ("Lighting", [extract_number(DECIMAL)]),
+
+    # Missing values: median for counts, mode for categories (raw values)
+    ("n_chairs", [fill_median()]),
+    ("Nbr of cameras", [fill_median()]),
+    ("Nbr of doors", [fill_median()]),
+    ("n_aircon", [fill_median()]),
+    ("socket", [fill_median()]),
+    ("n_windows", [fill_median()]),
+] + [
+    (col, [fill_mode("Unknown")]) for col in CATEGORICAL_COLS
+] + [
+    (col, [to_int()]) for col in NUMERIC_INT_COLS
+] + [
+    (col, [to_bool(BOOLEAN_MAPPING), fill_mode(False)]) for col in BOOLEAN_COLS
+] + [
+    # "2nd" -> "2 floor", "3-floor" -> "3 floor", plus a numeric floor_number
+    ("floor", [lower(), strip(), fuzzy(FLOOR_MAPPING), map_values(FLOOR_MAPPING),
+               suffix_numbers(" floor"), regex_replace(r"\.", ""), regex_replace(r"(\d+)-?\s*floor", r"\1 floor"),
+               derive("floor_number", r"(-?\d+)")]),
+    # Remove all special characters and spaces from classroom codes
+    ("classroom", [upper(), regex_replace(r"[^A-Z0-9]", "")]),
+    # Lighting keeps only the first whole number, e.g. "12.5" -> 12
+    ("Lighting", [extract_number(INTEGER), fill_median()]),
+    # Keep only 'High', 'Low' or 'Moderate'
+    ("Noise Level", [lower(), strip(), extract_text(NOISE_PATTERN), capitalize(),
+                     fill_blank_with_mode("Moderate")]),
+    (None, [frame_step(standardize_area)]),
+    ("WiFi Connection", [lower(), strip(), fuzzy(WIFI_WORDS), map_values(WIFI_MAPPING), capitalize()]),
+    ("Main Entrance Distance", [lower(), strip(), fuzzy(DISTANCE_MAPPING), map_values(DISTANCE_MAPPING),
+                                capitalize()]),
+]
+
+
+# ------------------------------------
+# Compiled operations
+# ------------------------------------
+
+_TEXT_KINDS = ("strip", "lower", "upper")
+
+# Rules that look at one value at a time. Consecutive element-wise rules on a
+# column are fused into one operation that runs on the column's distinct values
+# only and then maps the results back, so the regex work scales with the
+# number of distinct strings rather than the number of rows.
+_ELEMENTWISE_KINDS = _TEXT_KINDS + ("capitalize", "map", "fuzzy", "regex_replace", "extract_text",
+                                    "suffix_numbers", "extract_number", "apply", "derive")
+
+
+def _text_op(kinds):
+    # One astype(str) followed by the fused case/strip chain
+    def run(s):
+        s = s.astype(str)
+        for kind in kinds:
+            if kind == "strip":
+                s = s.str.strip()
+            elif kind == "lower":
+                s = s.str.lower()
+            else:
+                s = s.str.upper()
+        return s
+    return run
+
+
+def _is_plain_number(s):
+    # True when str(x) of every value is plain decimal notation, so regex
+    # extraction on the text would just give back |x|
+    if s.dtype.kind in "iu":
+        return True
+    if s.dtype.kind != "f":
+        return False
+    magnitude = s.abs()
+    plain = (magnitude < 1e16) & ((magnitude >= 1e-4) | (magnitude == 0))
+    return bool((plain | s.isna()).all())
+
+
+def _extract_number_op(pattern):
+    def run(s):
+        if _is_plain_number(s):
+            # Already numeric: no str round-trip needed
+            result = s.abs()
+            if pattern == INTEGER and result.dtype.kind == "f":
+                result = np.trunc(result)
+                if not result.isna().any():
+                    result = result.astype("int64")
+            return result
+        extracted = s.astype(str).str.extract(pattern, expand=False)
+        return pd.to_numeric(extracted, errors="coerce")
+    return run
+
+
+def _extract_text_op(pattern, default):
+    return lambda s: s.str.extract(pattern, expand=False).fillna(default)
+
+
+def _suffix_numbers_op(suffix):
+    # "2" -> "2 floor", "-1" -> "-1 floor"; anything else is kept
+    def run(s):
+        return s.where(~s.str.fullmatch(r"-*\d+"), s + suffix)
+    return run
+
+
+# Fill values come from column_stats, like the statistics table
+
+def _fill_median_op(s):
+    return s.fillna(column_stats.median(s))
+
+
+def _fill_mode_op(default):
+    return lambda s: s.fillna(column_stats.mode(s, default))
+
+
+def _fill_blank_with_mode_op(default):
+    return lambda s: s.replace("", column_stats.mode(s, default))
+
+
+def _to_int_op(s):
+    return pd.to_numeric(s, errors='coerce').fillna(0).astype(int)
+
+
+def _map_op(mapping):
+    return lambda s: s.replace(mapping)
+
+
+def _single_op(rule):
+    kind, arg = rule
+    if kind == "capitalize":
+        return lambda s: s.str.capitalize()
+    if kind == "extract_number":
+        return _extract_number_op(arg)
+    if kind == "extract_text":
+        return _extract_text_op(*arg)
+    if kind == "suffix_numbers":
+        return _suffix_numbers_op(arg)
+    if kind == "fill_median":
+        return _fill_median_op
+    if kind == "fill_mode":
+        return _fill_mode_op(arg)
+    if kind == "fill_blank_with_mode":
+        return _fill_blank_with_mode_op(arg)
+    if kind == "to_int":
+        return _to_int_op
+    if kind == "to_bool":
+        return lambda s: s.map(arg)
+    if kind == "apply":
+        return lambda s: s.apply(arg)
+    if kind == "fuzzy":
+        return lambda s: s.replace(fuzzy_matching.resolve(s.dropna().unique(), arg))
+    if kind == "regex_replace":
+        pattern, replacement = arg
+        return lambda s: s.str.replace(pattern, replacement, regex=True)
+    raise ValueError(f"Unknown cleaning rule: {kind}")
+
+
+def _fuse_elementwise(rules):
+    # [(label, target, func)]: target is None for steps that transform the
+    # column, or the name of the new column a derive step creates
+    steps = []
+    i = 0
+    while i < len(rules):
+        kind, arg = rules[i]
+        if kind in _TEXT_KINDS:
+            kinds = []
+            while i < len(rules) and rules[i].kind in _TEXT_KINDS:
+                kinds.append(rules[i].kind)
+                i += 1
+            steps.append(("+".join(kinds), None, _text_op(kinds)))
+        elif kind == "map":
+            mapping = {}
+            while i < len(rules) and rules[i].kind == "map":
+                # Later mappings apply to the output of earlier ones
+                step = rules[i].arg
+                mapping = {key: step.get(value, value) for key, value in mapping.items()}
+                mapping.update({key: value for key, value in step.items() if key not in mapping})
+                i += 1
+            steps.append(("map", None, _map_op(mapping)))
+        elif kind == "derive":
+            target, pattern = arg
+            steps.append((f"derive {target}", target,
+                          lambda s, pattern=pattern: s.str.extract(pattern)[0].astype(float)))
+            i += 1
+        else:
+            steps.append((kind, None, _single_op(rules[i])))
+            i += 1
+    return steps
+
+
+def _elementwise_op(column, rules):
+    steps = _fuse_elementwise(rules)
+    starts_as_text = rules[0].kind in _TEXT_KINDS or rules[0].kind == "extract_number"
+
+    def run(df):
+        s = df[column]
+        codes = None
+        if starts_as_text and not (rules[0].kind == "extract_number" and _is_plain_number(s)):
+            # Convert to str before factorizing: factorize treats 1, 1.0 and
+            # True (or None and NaN) as the same value, str() does not
+            codes, uniques = pd.factorize(s.astype(str))
+            s = pd.Series(uniques, dtype=object)
+
+        derived = {}
+        for _, target, func in steps:
+            if target is None:
+                s = func(s)
+            else:
+                derived[target] = func(s)
+
+        if codes is not None:
+            s = s.iloc[codes].set_axis(df.index)
+            derived = {target: values.iloc[codes].set_axis(df.index) for target, values in derived.items()}
+        df[column] = s
+        for target, values in derived.items():
+            df[target] = values
+        return df
+    return run
+
+
+def _column_op(column, func):
+    def run(df):
+        df[column] = func(df[column])
+        return df
+    return run
+
+
+def is_global(operation):
+    # True when the operation needs statistics of the whole column/frame
+    return operation.rule.kind in GLOBAL_KINDS
+
+
+def with_fill_value(operation, value):
+    # The same fill, using `value` instead of one computed from the column
+    kind = operation.rule.kind
+    if kind == "fill_blank_with_mode":
+        func = lambda s: s.replace("", value)
+    elif kind in ("fill_median", "fill_mode"):
+        func = lambda s: s.fillna(value)
+    else:
+        raise ValueError(f"{operation.label} is not a fill")
+    return operation._replace(func=_column_op(operation.column, func))
+
+
+def compile_rules(rules):
+    # Turn the rule registry into a flat list of Operations. Runs of
+    # element-wise rules on a column become one operation over its distinct
+    # values; everything else (fills, type conversions) runs on the column.
+    operations = []
+    for column, column_rules in rules:
+        i = 0
+        while i < len(column_rules):
+            kind, arg = column_rules[i]
+            if kind in ("frame", "row_frame"):
+                operations.append(Operation(f"frame:{arg.__name__.lstrip('_')}", None, arg, column_rules[i]))
+                i += 1
+            elif kind in _ELEMENTWISE_KINDS:
+                run = []
+                while i < len(column_rules) and column_rules[i].kind in _ELEMENTWISE_KINDS:
+                    run.append(column_rules[i])
+                    i += 1
+                label = "+".join(step[0] for step in _fuse_elementwise(run))
+                operations.append(Operation(f"{column}:{label}", column, _elementwise_op(column, run),
+                                            Rule("elementwise", tuple(run))))
+            else:
+                operations.append(Operation(f"{column}:{kind}", column,
+                                            _column_op(column, _single_op(column_rules[i])), column_rules[i]))
+                i += 1
+    return operations
+
+
+PIPELINE = compile_rules(CLEANING_RULES)
+
+
+def rule_group(operation):
+    # What kind of cleaning step an operation is, for run records
+    if is_global(operation) and operation.rule.kind != "frame":
+        return "imputation"
+    if operation.column in ("floor", "classroom") or operation.func is standardize_area:
+        return "normalization"
+    return "columns"
+
+
+def clean(df, pipeline=PIPELINE, timings=None, record=None):
+    # Clean a raw classroom frame. Pass a dict as `timings` to collect the
+    # wall time (seconds) spent in each rule, keyed by "column:rule", or an
+    # instrumentation.RunRecord as `record` for one stage entry per rule.
+    df = df.copy()
+    for operation in pipeline:
+        if operation.column is not None and operation.column not in df.columns:
+            continue
+        start = time.perf_counter()
+        if record is None:
+            df = operation.func(df)
+        else:
+            with record.stage(f"clean:{operation.label}", rows_in=len(df), group=rule_group(operation)) as stage:
+                df = operation.func(df)
+                stage["rows_out"] = len(df)
+        if timings is not None:
+            timings[operation.label] = timings.get(operation.label, 0.0) + time.perf_counter() - start
+    return df
+
+
+def format_timings(timings, top=10):
+    # Slowest rules first
+    total = sum(timings.values()) or 1.0
+    lines = []
+    for label, seconds in sorted(timings.items(), key=lambda item: item[1], reverse=True)[:top]:
+        lines.append(f"  {label:<40} {seconds * 1000:9.1f} ms  {seconds / total:6.1%}")
+    return "\n".join(lines)
@@ -0,0 +1,407 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# ====================================
+# Column Statistics
+# ====================================
+#
+# One place for the statistics the pipeline needs: the central-tendency table
+# (mean, median, std, min, quartiles, max, range) and the median/mode used to
+# fill missing values.
+#
+#   describe(df, columns)  exact table for an in-memory frame. All columns go
+#                          through the same NumPy reductions on one 2-D array
+#                          instead of one pandas call per statistic per column,
+#                          with results identical to Series.mean()/median()/...
+#   ColumnStats            mergeable summary for data seen in pieces (chunks,
+#                          worker processes). Exact while a column has few
+#                          distinct values (value counts); past max_distinct it
+#                          switches to a KLL quantile sketch and a heavy-hitters
+#                          list for the mode.
+#   stats_table(stats)     the same table built from ColumnStats objects
+
+TABLE_ROWS = ["Mean", "Median", "Std Dev", "Min", "25%", "75%", "Max", "Range"]
+
+
+def describe(df, columns=None):
+    # Central-tendency table (TABLE_ROWS x columns) for the numeric columns
+    columns = [col for col in (df.columns if columns is None else columns) if col in df.columns]
+    # Fortran order keeps each column contiguous, so every reduction below
+    # sums a column the same way Series.sum() does
+    values = np.asfortranarray(df[columns].to_numpy(dtype="float64", na_value=np.nan))
+    missing = np.isnan(values)
+    count = (~missing).sum(axis=0)
+
+    filled = values.copy(order="F")
+    filled[missing] = 0.0
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = filled.sum(axis=0) / count
+        squares = (mean - values) ** 2
+        squares[missing] = 0.0
+        std = np.sqrt(squares.sum(axis=0) / (count - 1))
+        std[count < 2] = np.nan
+        minimum = np.nanmin(values, axis=0) if len(values) else np.full(len(columns), np.nan)
+        maximum = np.nanmax(values, axis=0) if len(values) else np.full(len(columns), np.nan)
+        median = np.nanmedian(values, axis=0) if len(values) else np.full(len(columns), np.nan)
+        q25, q75 = np.nanquantile(values, [0.25, 0.75], axis=0) if len(values) else (minimum, minimum)
+
+    table = np.vstack([mean, median, std, minimum, q25, q75, maximum, maximum - minimum])
+    return pd.DataFrame(table, index=TABLE_ROWS, columns=columns)
+
+
+def median(s):
+    # Series.median()
+    values = s.to_numpy(dtype="float64", na_value=np.nan)
+    if np.isnan(values).all():
+        return np.nan
+    return np.nanmedian(values)
+
+
+def mode(s, default=None):
+    # Series.mode()[0]: most frequent non-null value, ties go to the smallest
+    counts = s.value_counts(dropna=True, sort=False)
+    return weighted_mode(counts.index, counts.to_numpy(), default)
+
+
+# ------------------------------------
+# Statistics of weighted distinct values (value counts)
+# ------------------------------------
+
+def weighted_median(values, weights):
+    # Series.median() of the column the counts describe
+    values = np.asarray(values, dtype="float64")
+    weights = np.asarray(weights)
+    present = ~np.isnan(values)
+    values, weights = values[present], weights[present]
+    if not len(values):
+        return np.nan
+    order = np.argsort(values, kind="stable")
+    values, cumulative = values[order], np.cumsum(weights[order])
+    n = cumulative[-1]
+    low = values[np.searchsorted(cumulative, (n - 1) // 2, side="right")]
+    high = values[np.searchsorted(cumulative, n // 2, side="right")]
+    return np.mean([low, high])
+
+
+def weighted_quantile(values, weights, q):
+    # Series.quantile(q) (linear interpolation) of the column the counts describe
+    values = np.asarray(values, dtype="float64")
+    weights = np.asarray(weights)
+    present = ~np.isnan(values)
+    values, weights = values[present], weights[present]
+    if not len(values):
+        return np.nan
+    order = np.argsort(values, kind="stable")
+    values, cumulative = values[order], np.cumsum(weights[order])
+    n = cumulative[-1]
+    # Same arithmetic as numpy's "linear" method
+    index = n * q + (1 - q) - 1
+    below = np.floor(index)
+    gamma = index - below
+    low = values[np.searchsorted(cumulative, below, side="right")]
+    high = values[np.searchsorted(cumulative, min(below + 1, n - 1), side="right")]
+    diff = high - low
+    return high - diff * (1 - gamma) if gamma >= 0.5 else low + diff * gamma
+
+
+def weighted_mode(values, weights, default=None):
+    # Series.mode()[0] of the column the counts describe: the most frequent
+    # non-null value, ties going to the smallest. Values counted zero times
+    # (unobserved categories) never occur in the column and are not candidates.
+    totals = pd.Series(np.asarray(weights)).groupby(pd.Series(values, dtype=object).to_numpy(),
+                                                     dropna=True, sort=False).sum()
+    totals = totals[totals > 0]
+    if totals.empty:
+        return default
+    candidates = totals.index[totals == totals.max()].tolist()
+    try:
+        return sorted(candidates)[0]
+    except TypeError:
+        # Mixed types: numbers sort before strings, like pandas' safe_sort
+        numbers = [value for value in candidates if not isinstance(value, str)]
+        try:
+            return sorted(numbers)[0] if numbers else sorted(candidates)[0]
+        except TypeError:
+            return candidates[0]
+
+
+def weighted_mean_std(values, weights):
+    values = np.asarray(values, dtype="float64")
+    weights = np.asarray(weights, dtype="float64")
+    present = ~np.isnan(values)
+    values, weights = values[present], weights[present]
+    n = weights.sum()
+    if not n:
+        return np.nan, np.nan
+    mean = (values * weights).sum() / n
+    variance = (weights * (values - mean) ** 2).sum() / (n - 1) if n > 1 else np.nan
+    return mean, np.sqrt(variance)
+
+
+# ------------------------------------
+# Mergeable summaries
+# ------------------------------------
+
+class QuantileSketch:
+    # KLL-style sketch: level h holds items that each stand for 2**h values.
+    # When a level outgrows its capacity it is sorted and every other item
+    # (random offset) moves up a level. Rank error is about 1.7/k.
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compact(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                keep = items[len(items) - len(items) % 2:]
+                promoted = items[:len(items) - len(keep)][self.rng.integers(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values, weights=None):
+        # Add values; integer weights are split into powers of two
+        values = np.asarray(values, dtype="float64")
+        if weights is None:
+            self.levels[0] = np.concatenate([self.levels[0], values])
+        else:
+            weights = np.asarray(weights, dtype="int64")
+            for level in range(int(weights.max()).bit_length() if len(weights) else 0):
+                while level >= len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level] = np.concatenate([self.levels[level], values[(weights >> level) & 1 == 1]])
+        self._compact()
+        return self
+
+    def merge(self, other):
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self._compact()
+        return self
+
+    def quantile(self, q):
+        items = np.concatenate(self.levels)
+        if not len(items):
+            return np.nan
+        weights = np.concatenate([np.full(len(items), 2 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        rank = q * (cumulative[-1] - 1)
+        return items[order][np.searchsorted(cumulative, rank, side="right")]
+
+
+def _add_counts(a, b):
+    # Running value counts (also merges repeated values within b)
+    combined = b if a is None or a.empty else pd.concat([a, b])
+    return combined.groupby(level=0, sort=False).sum()
+
+
+def _heavy_hitters(counts, size):
+    # Misra-Gries: keep the `size` largest counts, all lowered by the next one
+    if len(counts) <= size:
+        return counts
+    counts = counts.sort_values(ascending=False, kind="stable")
+    cut = counts.iloc[size]
+    return counts.iloc[:size] - cut
+
+
+class ColumnStats:
+    # Mergeable summary of one column. update() it with each chunk, merge()
+    # summaries built elsewhere (other chunks, other workers), then read the
+    # statistics. Medians, quantiles and modes are exact while the column has
+    # at most max_distinct distinct values; mean, std, min and max always are
+    # (up to floating-point summation order).
+
+    def __init__(self, max_distinct=100_000, sketch_size=200, seed=0):
+        self.max_distinct = max_distinct
+        self.sketch_size = sketch_size
+        self.seed = seed
+        self.n = 0
+        self.missing = 0
+        self.numeric = True
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.min = np.nan
+        self.max = np.nan
+        self.counts = pd.Series(dtype="int64")
+        self.exact = True
+        self.sketch = None
+
+    @classmethod
+    def from_counts(cls, values, weights, **kwargs):
+        # Summary of a column given as distinct values and how often each occurs
+        stats = cls(**kwargs)
+        counts = pd.Series(np.asarray(weights, dtype="int64"), index=pd.Index(values, dtype=object))
+        stats._add(counts[counts.index.notna()], int(counts[counts.index.isna()].sum()))
+        return stats
+
+    def update(self, values):
+        s = pd.Series(values) if not isinstance(values, pd.Series) else values
+        self._add(s.value_counts(dropna=True, sort=False), int(s.isna().sum()))
+        return self
+
+    def _add(self, counts, missing):
+        self.missing += missing
+        if counts.empty:
+            return
+        n = int(counts.sum())
+        if self.numeric and pd.api.types.is_numeric_dtype(counts.index.infer_objects().dtype):
+            values = counts.index.to_numpy(dtype="float64")
+            mean, std = weighted_mean_std(values, counts.to_numpy())
+            m2 = std ** 2 * (n - 1) if n > 1 else 0.0
+            self._merge_moments(n, mean, m2, values.min(), values.max())
+        else:
+            self.numeric = False
+            self.n += n
+        self._merge_counts(counts)
+
+    def _merge_moments(self, n, mean, m2, minimum, maximum):
+        # Chan et al. parallel update of count, mean and sum of squared deviations
+        total = self.n + n
+        delta = mean - self._mean
+        self._m2 += m2 + delta ** 2 * self.n * n / total
+        self._mean += delta * n / total
+        self.n = total
+        self.min = minimum if np.isnan(self.min) else min(self.min, minimum)
+        self.max = maximum if np.isnan(self.max) else max(self.max, maximum)
+
+    def _merge_counts(self, counts):
+        if self.exact:
+            self.counts = _add_counts(self.counts, counts)
+            if self.max_distinct is not None and len(self.counts) > self.max_distinct:
+                self._switch_to_sketch()
+            return
+        if self.numeric:
+            self.sketch.update(counts.index.to_numpy(dtype="float64"), counts.to_numpy())
+        self.counts = _heavy_hitters(_add_counts(self.counts, counts), self.max_distinct)
+
+    def _switch_to_sketch(self):
+        self.exact = False
+        if self.numeric:
+            self.sketch = QuantileSketch(self.sketch_size, self.seed)
+            self.sketch.update(self.counts.index.to_numpy(dtype="float64"), self.counts.to_numpy())
+        self.counts = _heavy_hitters(self.counts, self.max_distinct)
+
+    def merge(self, other):
+        self.missing += other.missing
+        if other.n == 0:
+            return self
+        if self.numeric and other.numeric:
+            self._merge_moments(other.n, other._mean, other._m2, other.min, other.max)
+        else:
+            self.numeric = False
+            self.n += other.n
+        if not other.exact:
+            if self.exact:
+                self._switch_to_sketch()
+            if self.numeric:
+                self.sketch.merge(other.sketch)
+            self.counts = _heavy_hitters(_add_counts(self.counts, other.counts), self.max_distinct)
+        else:
+            self._merge_counts(other.counts)
+        return self
+
+    @property
+    def mean(self):
+        return self._mean if self.n and self.numeric else np.nan
+
+    def std(self):
+        return np.sqrt(self._m2 / (self.n - 1)) if self.n > 1 and self.numeric else np.nan
+
+    def quantile(self, q):
+        if not self.numeric or not self.n:
+            return np.nan
+        if self.exact:
+            return weighted_quantile(self.counts.index, self.counts.to_numpy(), q)
+        return self.sketch.quantile(q)
+
+    def median(self):
+        if self.exact and self.numeric:
+            return weighted_median(self.counts.index, self.counts.to_numpy())
+        return self.quantile(0.5)
+
+    def mode(self, default=None):
+        return weighted_mode(self.counts.index, self.counts.to_numpy(), default)
+
+
+def stats_table(stats):
+    # describe()-style table from {column: ColumnStats}
+    table = {}
+    for column, s in stats.items():
+        table[column] = [s.mean, s.median(), s.std(), s.min, s.quantile(0.25), s.quantile(0.75),
+                         s.max, s.max - s.min]
+    return pd.DataFrame(table, index=TABLE_ROWS, dtype="float64")
+
+
+class CoMoments:
+    # Running sums behind means, variances and pairwise-complete correlations
+    # of several columns. Rows can be added and taken away again (sign=-1),
+    # so the statistics can follow a frame that changes a few rows at a time.
+    # Values are shifted by the first batch's means to keep the sums small.
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        p = len(self.columns)
+        self.shift = None
+        self.n = np.zeros((p, p))
+        self.sx = np.zeros((p, p))    # sx[i, j]: sum of column i where i and j are both present
+        self.sxx = np.zeros((p, p))
+        self.sxy = np.zeros((p, p))
+
+    def update(self, df, sign=1):
+        values = df.reindex(columns=self.columns).to_numpy(dtype="float64", na_value=np.nan)
+        present = ~np.isnan(values)
+        if self.shift is None:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                self.shift = np.nan_to_num(np.nanmean(values, axis=0)) if len(values) else np.zeros(len(self.columns))
+        x = np.where(present, values - self.shift, 0.0)
+        m = present.astype("float64")
+        self.n += sign * (m.T @ m)
+        self.sx += sign * (x.T @ m)
+        self.sxx += sign * ((x * x).T @ m)
+        self.sxy += sign * (x.T @ x)
+        return self
+
+    def _diagonal(self):
+        n, sx, sxx = np.diag(self.n), np.diag(self.sx), np.diag(self.sxx)
+        return n, sx, sxx
+
+    def mean(self):
+        n, sx, _ = self._diagonal()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return pd.Series(self.shift + sx / n, index=self.columns)
+
+    def std(self):
+        n, sx, sxx = self._diagonal()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            variance = np.maximum(sxx - sx ** 2 / n, 0.0) / (n - 1)
+        return pd.Series(np.where(n > 1, np.sqrt(variance), np.nan), index=self.columns)
+
+    def corr(self):
+        # DataFrame.corr() (Pearson, pairwise complete observations)
+        n = self.n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = self.sxy - self.sx * self.sx.T / n
+            ss = np.maximum(self.sxx - self.sx ** 2 / n, 0.0)
+            corr = np.clip(cov / np.sqrt(ss * ss.T), -1.0, 1.0)
+        corr[(n < 1) | (ss == 0) | (ss.T == 0)] = np.nan
+        diagonal = np.diag(ss) > 0
+        corr[np.diag_indices_from(corr)] = np.where(diagonal, 1.0, np.nan)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
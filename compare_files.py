@@ -1,27 +1,286 @@
+"""Cell-level diff between the raw workbook and the cleaned output.
+
+    python compare_files.py                                   # default files, change_log.parquet
+    python compare_files.py raw.xlsx cleaned_data.csv --log changes.csv
+
+Rows are matched on their classroom code (the raw codes go through the same
+clean-up rule as in cleaning.py), not on their position, so consolidated
+duplicates line up with the record they were merged into. Every changed cell
+is written to the change log as (classroom, row, column, old, new, reason):
+
+    imputation      the raw cell was empty
+    consolidation   the classroom had several rows that still disagreed here
+                    after the row-level cleaning rules
+    type coercion   same value, new type ("2 units" -> 2, "yes" -> True)
+    mapping         anything else the cleaning rules rewrote
+
+`row` is the row number in the original sheet as Excel shows it (the header
+is row 1, so the first data row is 2). Rows whose classroom only exists on
+one side are logged as "row removed" / "row added" (for added rows `row` is
+the row number in the cleaned file, counted the same way). Missing values on
+both sides count as equal.
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
+
+from cleaning import BOOLEAN_MAPPING, COLUMN_RENAMES, DECIMAL, clean
+from data_cache import HAS_PYARROW, load_excel
+from streaming import split_pipeline
 
 # Load the original and cleaned datasets
 original_file = "Data Science Classroom Data.xlsx"
 cleaned_file = "cleaned_data.xlsx"
 
-df_original = pd.read_excel(original_file, sheet_name="Classroom Data")
-df_cleaned = pd.read_excel(cleaned_file)
+LOG_COLUMNS = ["classroom", "row", "column", "old", "new", "reason"]
+# Data position 0 is sheet row 2 (1-based, below the header)
+FIRST_ROW = 2
+REASONS = ["imputation", "consolidation", "type coercion", "mapping", "row removed", "row added"]
+
+
+def load_table(path, sheet_name=0):
+    if Path(path).suffix.lower() == ".csv":
+        return pd.read_csv(path)
+    return load_excel(path, sheet_name=sheet_name)
+
+
+def normalize_columns(df):
+    # 🛠 Same column names as the cleaned data (trimmed, typos fixed)
+    df = df.copy()
+    df.columns = df.columns.str.strip()
+    return df.rename(columns=COLUMN_RENAMES)
+
+
+def row_level_clean(df):
+    # The raw rows through the cleaning rules that only look at one row (no
+    # fills, no area correction): classroom codes to join on, and the values
+    # each duplicate would have had on its own. Also returns the columns
+    # those rules change.
+    row_local, _ = split_pipeline()
+    return clean(df, pipeline=row_local), {op.column for op in row_local if op.column}
+
+
+def _distinct(s):
+    # (codes, distinct values) of a column; every missing value gets the
+    # last code so the checks below run once per distinct value
+    codes, uniques = pd.factorize(s)
+    values = pd.Series(list(uniques) + [np.nan], dtype=object)
+    return np.where(codes < 0, len(uniques), codes), values
+
+
+def _text_codes(values):
+    # Codes into a list of strings for the log (missing -> -1)
+    present = values.notna().to_numpy()
+    codes, text = pd.factorize(values[present].map(str))
+    remap = np.full(len(values), -1, dtype="int64")
+    remap[present] = codes
+    return remap, pd.Index(text, dtype=object)
+
+
+def _is_missing(values):
+    text = values.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+    return values.isna().to_numpy() | (text & values.map(lambda value: str(value).strip() == "").to_numpy(dtype=bool))
+
+
+def _coerced(old, dtype):
+    # The raw value converted to the cleaned column's type, without any
+    # mapping: numbers pulled out of text, yes/no text as booleans, text trimmed
+    if pd.api.types.is_bool_dtype(dtype):
+        return old.map(lambda value: BOOLEAN_MAPPING.get(value, value) if isinstance(value, str) else value)
+    if pd.api.types.is_numeric_dtype(dtype):
+        text = old.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+        numbers = pd.to_numeric(old.where(~text), errors="coerce").astype("float64")
+        if text.any():
+            numbers[text] = pd.to_numeric(old[text].str.extract(DECIMAL)[0], errors="coerce").to_numpy()
+        return numbers
+    return old.map(lambda value: value.strip() if isinstance(value, str) else value)
+
+
+def _equal(a, b):
+    # NaN-aware element-wise equality of two aligned series
+    both_missing = a.isna().to_numpy() & b.isna().to_numpy()
+    same = a.astype(object).to_numpy() == b.astype(object).to_numpy()
+    return np.asarray(same, dtype=bool) | both_missing
+
+
+def _own_value(values, new, dtype):
+    # The cleaned value is this row's own value, up to type, case and spacing
+    if pd.api.types.is_numeric_dtype(dtype):
+        return _equal(_coerced(values, dtype), new)
+    fold = lambda s: s.map(lambda value: str(value).strip().casefold() if pd.notna(value) else value)
+    return _equal(fold(values), fold(new))
+
+
+def _disagrees(codes, n_codes, groups, duplicated):
+    # True for rows of duplicated groups whose values differ within the group.
+    # Missing counts as a value: it is filled before the rows are merged.
+    if not duplicated.any():
+        return np.zeros(len(codes), dtype=bool)
+    width = np.int64(n_codes)
+    pairs = pd.unique(groups[duplicated].astype("int64") * width + codes[duplicated])
+    distinct = np.bincount(pairs // width, minlength=groups.max() + 1)
+    return duplicated & (distinct[groups] > 1)
+
+
+def diff_frames(original, cleaned, key="classroom"):
+    # Returns (change log, summary). `original` is the raw sheet, `cleaned`
+    # the cleaned (usually consolidated) data.
+    original = normalize_columns(original)
+    cleaned = normalize_columns(cleaned)
+    if key not in original.columns or key not in cleaned.columns:
+        raise ValueError(f"both files need a '{key}' column to match rows on")
+    local, touched = row_level_clean(original)
+    original_keys = local[key].astype(str)
+    # Already-cleaned codes pass through the classroom rule unchanged
+    cleaned_keys = clean(cleaned[[key]], pipeline=[op for op in split_pipeline()[0] if op.column == key])
+    cleaned_keys = cleaned_keys[key].astype(str)
+
+    # Index join on the classroom code; when the cleaned side still has
+    # repeated codes (not consolidated) the n-th raw row of a code is matched
+    # with the n-th cleaned row of it
+    consolidated = not cleaned_keys.duplicated().any()
+    if consolidated:
+        left = pd.Index(original_keys)
+        right = pd.Index(cleaned_keys)
+    else:
+        left = pd.MultiIndex.from_arrays([original_keys, original_keys.groupby(original_keys).cumcount()])
+        right = pd.MultiIndex.from_arrays([cleaned_keys, cleaned_keys.groupby(cleaned_keys).cumcount()])
+    position = right.get_indexer(left)
+    matched = position >= 0
+    rows = np.flatnonzero(matched)
+    target = position[matched]
+
+    # The log is built from integer codes (classroom, column, reason) and
+    # categoricals of strings (old, new), so a change log of millions of cells
+    # stays small in memory and in Parquet
+    key_codes, key_names = pd.factorize(pd.concat([original_keys, cleaned_keys], ignore_index=True))
+    original_codes, cleaned_codes = key_codes[:len(original_keys)], key_codes[len(original_keys):]
+    groups = original_codes[rows]
+    group_sizes = np.bincount(original_codes, minlength=len(key_names))
+    duplicated = group_sizes[groups] > 1 if consolidated else np.zeros(len(rows), dtype=bool)
+
+    common_columns = [col for col in original.columns if col in cleaned.columns and col != key]
+    parts, modified = [], {}
+    for col in common_columns:
+        dtype = cleaned[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            dtype = dtype.categories.dtype
+        old_codes, old_values = _distinct(original[col])
+        new_codes, new_values = _distinct(cleaned[col])
+        local_codes, local_values = _distinct(local[col]) if col in touched else (old_codes, old_values)
+        old_codes, new_codes, local_codes = old_codes[rows], new_codes[target], local_codes[rows]
+
+        # Every check runs once per distinct (old, row-level, new) combination
+        n_new, n_local = len(new_values), len(local_values)
+        combos, combo_keys = pd.factorize((old_codes.astype("int64") * n_local + local_codes) * n_new + new_codes)
+        combo_old, rest = np.divmod(combo_keys, n_local * n_new)
+        combo_local, combo_new = np.divmod(rest, n_new)
+        old = old_values.iloc[combo_old].reset_index(drop=True)
+        new = new_values.iloc[combo_new].reset_index(drop=True)
+        changed = ~_equal(old, new)
+        index = np.flatnonzero(changed[combos])
+        if not len(index):
+            continue
+        old_missing, new_missing = _is_missing(old), new.isna().to_numpy()
+        coerced = _equal(_coerced(old, dtype), new)
+        own = _own_value(local_values.iloc[combo_local].reset_index(drop=True), new, dtype)
+
+        # Consolidation: the duplicates still differed after the row-level
+        # rules and the merged value is not this row's own, or the value was
+        # dropped from the merged record (EXCLUDE_COLUMNS)
+        combo = combos[index]
+        disagree = _disagrees(local_codes, n_local, groups, duplicated)[index] & ~own[combo]
+        disagree |= duplicated[index] & new_missing[combo] & ~old_missing[combo]
+        reason = np.select(
+            [old_missing[combo] & ~new_missing[combo], disagree, coerced[combo]],
+            [REASONS.index("imputation"), REASONS.index("consolidation"), REASONS.index("type coercion")],
+            default=REASONS.index("mapping"),
+        ).astype("int8")
+        old_text, old_categories = _text_codes(old_values)
+        new_text, new_categories = _text_codes(new_values)
+        modified[col] = len(index)
+        parts.append((groups[index], rows[index], len(modified) - 1,
+                      pd.Categorical.from_codes(old_text[old_codes[index]], categories=old_categories),
+                      pd.Categorical.from_codes(new_text[new_codes[index]], categories=new_categories),
+                      reason))
+
+    # Whole rows present on one side only
+    removed = np.flatnonzero(~matched)
+    added = np.setdiff1d(np.arange(len(cleaned)), position[matched])
+    nothing = pd.Categorical([], categories=pd.Index([], dtype=object))
+    for reason, codes, row_numbers in [("row removed", original_codes[removed], removed),
+                                       ("row added", cleaned_codes[added], added)]:
+        if len(row_numbers):
+            missing = pd.Categorical.from_codes(np.full(len(row_numbers), -1), categories=nothing.categories)
+            parts.append((codes, row_numbers, -1, missing, missing,
+                          np.full(len(row_numbers), REASONS.index(reason), dtype="int8")))
+
+    columns = pd.Index(list(modified), dtype=object)
+    log = pd.DataFrame({
+        "classroom": pd.Categorical.from_codes(np.concatenate([p[0] for p in parts] or [[]]).astype("int64"),
+                                               categories=pd.Index(key_names, dtype=object)),
+        "row": np.concatenate([p[1] for p in parts] or [[]]).astype("int64") + FIRST_ROW,
+        "column": pd.Categorical.from_codes(np.concatenate([np.full(len(p[1]), p[2]) for p in parts] or [[]])
+                                            .astype("int64"), categories=columns),
+        "old": union_categoricals([p[3] for p in parts] or [nothing]),
+        "new": union_categoricals([p[4] for p in parts] or [nothing]),
+        "reason": pd.Categorical.from_codes(np.concatenate([p[5] for p in parts] or [[]]).astype("int8"),
+                                            categories=REASONS),
+    }, columns=LOG_COLUMNS)
+    summary = {
+        "modified": pd.Series(modified, dtype="int64"),
+        "only_original": [col for col in original.columns if col not in cleaned.columns],
+        "only_cleaned": [col for col in cleaned.columns if col not in original.columns],
+        "removed_rows": len(removed),
+        "added_rows": len(added),
+    }
+    return log, summary
+
+
+def write_change_log(log, path):
+    # Parquet when pyarrow is installed, otherwise (or for a .csv path) CSV
+    path = Path(path)
+    if path.suffix.lower() == ".parquet" and not HAS_PYARROW:
+        path = path.with_suffix(".csv")
+        print("⚠️ pyarrow is not installed - writing the change log as CSV")
+    if path.suffix.lower() == ".parquet":
+        log.to_parquet(path, index=False)
+    else:
+        log.to_csv(path, index=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("original", nargs="?", default=original_file)
+    parser.add_argument("cleaned", nargs="?", default=cleaned_file)
+    parser.add_argument("--sheet", default="Classroom Data", help="sheet of the original workbook")
+    parser.add_argument("--log", default="change_log.parquet", help="change log file (.parquet or .csv)")
+    args = parser.parse_args()
 
-# 🛠 Step 1: Standardize Column Names (Trim Spaces)
-df_original.columns = df_original.columns.str.strip()
-df_cleaned.columns = df_cleaned.columns.str.strip()
+    df_original = load_table(args.original, sheet_name=args.sheet)
+    df_cleaned = load_table(args.cleaned)
+    log, summary = diff_frames(df_original, df_cleaned)
 
-# 🛠 Step 2: Ensure Both DataFrames Have the Same Columns
-common_columns = df_original.columns.intersection(df_cleaned.columns)  # Find common columns
-df_original = df_original[common_columns]  # Keep only matching columns
-df_cleaned = df_cleaned[common_columns]  # Keep only matching columns
+    # 🟢 Now Compare
+    print("\n🔍 Columns with Modified Values:")
+    if len(summary["modified"]):
+        changes = log[log["column"].notna()]
+        table = pd.crosstab(changes["column"], changes["reason"]).reindex(summary["modified"].index)
+        table = table.loc[:, (table > 0).any()]
+        table["total"] = summary["modified"]
+        print(table.to_string())
+    else:
+        print("(none)")
+    print(f"Rows only in Original: {summary['removed_rows']}, rows only in Cleaned: {summary['added_rows']}")
+    print("Columns only in Original:", set(summary["only_original"]))
+    print("Columns only in Cleaned:", set(summary["only_cleaned"]))
+    path = write_change_log(log, args.log)
+    print(f"✅ {len(log)} changes written to '{path}'")
 
-# 🛠 Step 3: Reset Indexes to Align Data Properly
-df_original.reset_index(drop=True, inplace=True)
-df_cleaned.reset_index(drop=True, inplace=True)
 
-# 🟢 Now Compare
-diff = (df_original != df_cleaned).sum()
-print("\n🔍 Columns with Modified Values:\n", diff[diff > 0])
-print("Columns only in Original:", set(df_original.columns) - set(df_cleaned.columns))
-print("Columns only in Cleaned:", set(df_cleaned.columns) - set(df_original.columns))
+if __name__ == "__main__":
+    main()
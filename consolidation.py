@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+from schema import BOOLEAN_COLS, EXCLUDE_COLUMNS, NUMERICAL_COLS, NUMERIC_INT_COLS
+
+# ====================================
+# Duplicate Classroom Consolidation
+# ====================================
+#
+# Every classroom that appears more than once is merged into a single row.
+# All duplicated classrooms are handled together in one grouped pass instead of
+# re-filtering the whole frame per classroom, so the cost grows with the
+# number of rows rather than rows x duplicates.
+#
+# Per-column rules (same as the original per-classroom loop):
+#   key         -> the classroom code itself
+#   null        -> personal identifiers are dropped (None)
+#   ceil_mean   -> count columns: ceiling of the average
+#   round_mean  -> other numerical columns and area_numeric: average rounded to 2 decimals
+#   any         -> boolean columns: True if any entry is True
+#   area        -> "XX.XX sqm" built from the rounded average of area_numeric
+#   mode        -> everything else: most frequent non-null value
+
+
+def find_duplicate_keys(df, key="classroom"):
+    # Keys with more than one row, most frequent first
+    counts = df[key].value_counts()
+    return counts[counts > 1].index.tolist()
+
+
+def build_aggregation_spec(columns, key="classroom", numerical_cols=NUMERICAL_COLS,
+                           numeric_int_cols=NUMERIC_INT_COLS, boolean_cols=BOOLEAN_COLS,
+                           exclude_columns=EXCLUDE_COLUMNS):
+    excluded = {col.lower() for col in exclude_columns}
+    spec = {}
+    for column in columns:
+        if column.lower() in excluded:
+            spec[column] = "null"
+        elif column == key:
+            spec[column] = "key"
+        elif column in numerical_cols:
+            spec[column] = "ceil_mean" if column in numeric_int_cols else "round_mean"
+        elif column == "area_numeric":
+            spec[column] = "round_mean"
+        elif column in boolean_cols:
+            spec[column] = "any"
+        elif column == "area" and "area_numeric" in columns:
+            spec[column] = "area"
+        else:
+            spec[column] = "mode"
+    return spec
+
+
+def _group_codes(rows, key):
+    # Integer group code per row (groups sorted by key) plus the row order
+    # that lays the groups out contiguously
+    codes, keys = pd.factorize(rows[key], sort=True)
+    order = np.argsort(codes, kind="stable")
+    sizes = np.bincount(codes, minlength=len(keys))
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    return codes, pd.Index(keys, name=key), order, sizes, starts
+
+
+def _group_mode(rows, codes, keys, column):
+    # Most frequent non-null value per group; ties go to the smallest value,
+    # matching Series.mode()[0]. Works on integer codes only: each (group, value)
+    # pair is counted with one np.unique and the winner picked with one lexsort.
+    try:
+        value_codes, uniques = pd.factorize(rows[column], sort=True)
+    except TypeError:
+        # Mixed, non-comparable values: fall back to pandas' own mode per group
+        return rows.groupby(codes)[column].agg(
+            lambda s: s.mode().iloc[0] if s.notna().any() else None
+        ).set_axis(keys[np.unique(codes)]).reindex(keys)
+
+    present = value_codes >= 0
+    n_values = max(len(uniques), 1)
+    pairs, counts = np.unique(codes[present].astype("int64") * n_values + value_codes[present],
+                              return_counts=True)
+    pair_groups, pair_values = np.divmod(pairs, n_values)
+
+    order = np.lexsort((pair_values, -counts, pair_groups))
+    pair_groups, pair_values = pair_groups[order], pair_values[order]
+    first = np.concatenate(([True], pair_groups[1:] != pair_groups[:-1])) if len(order) else order.astype(bool)
+
+    modes = pd.Series(uniques.take(pair_values[first]), index=keys[pair_groups[first]])
+    return modes.reindex(keys)
+
+
+def _group_means(rows, columns, keys, order, sizes, starts):
+    # Per-group means that match Series.mean() bit for bit. groupby().mean()
+    # uses compensated summation, and even a small difference in the last bit
+    # flips values like 107.195 to a different 2-decimal rounding. Groups are
+    # bucketed by size and each bucket is summed as a contiguous
+    # (groups x size) block, so every group goes through the same NumPy
+    # reduction that Series.mean() uses - still a handful of vectorized
+    # passes (one per distinct group size), not one per classroom.
+    values = rows[columns].to_numpy(dtype="float64")[order]
+    missing = np.isnan(values)
+    filled = np.where(missing, 0.0, values)
+
+    sums = np.empty((len(keys), len(columns)))
+    counts = np.empty((len(keys), len(columns)))
+    for size in np.unique(sizes):
+        groups = np.flatnonzero(sizes == size)
+        positions = starts[groups][:, None] + np.arange(size)
+        # (groups, columns, size) so each reduction runs over contiguous memory
+        block = np.ascontiguousarray(filled[positions].transpose(0, 2, 1))
+        sums[groups] = block.sum(axis=2)
+        counts[groups] = (~missing[positions]).sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+    return pd.DataFrame(means, index=keys, columns=columns)
+
+
+def consolidate_groups(rows, key="classroom", spec=None):
+    # Collapse every group of `rows` into one row, keeping the column order
+    if spec is None:
+        spec = build_aggregation_spec(rows.columns, key=key)
+
+    mean_cols = [col for col, rule in spec.items() if rule in ("ceil_mean", "round_mean")]
+    if "area" in spec.values() and "area_numeric" not in mean_cols:
+        mean_cols.append("area_numeric")
+    any_cols = [col for col, rule in spec.items() if rule == "any"]
+
+    codes, keys, order, sizes, starts = _group_codes(rows, key)
+    means = _group_means(rows, mean_cols, keys, order, sizes, starts) if mean_cols else None
+    anys = rows[any_cols].groupby(codes).any().set_axis(keys) if any_cols else None
+
+    result = {}
+    for column, rule in spec.items():
+        if rule == "key":
+            result[column] = pd.Series(keys, index=keys)
+        elif rule == "null":
+            result[column] = pd.Series(None, index=keys, dtype=object)
+        elif rule == "ceil_mean":
+            # Keep compact integer types (see dtypes.py); the mean always fits
+            int_dtype = rows[column].dtype if rows[column].dtype.kind in "iu" else "int64"
+            result[column] = np.ceil(means[column]).astype(int_dtype)
+        elif rule == "round_mean":
+            result[column] = means[column].round(2)
+        elif rule == "any":
+            result[column] = anys[column].astype(bool)
+        elif rule == "area":
+            result[column] = means["area_numeric"].round(2).map("{:.2f} sqm".format)
+        else:
+            result[column] = _group_mode(rows, codes, keys, column)
+
+    consolidated = pd.DataFrame(result, index=keys)
+    return consolidated[list(spec)].reset_index(drop=True)
+
+
+def consolidate_duplicates(df, key="classroom", spec=None):
+    # Returns the frame with every duplicated key merged into one row (sorted
+    # by key) and the list of keys that had duplicates
+    duplicate_keys = find_duplicate_keys(df, key)
+    is_duplicate = df[key].isin(duplicate_keys)
+
+    if spec is None:
+        spec = build_aggregation_spec(df.columns, key=key)
+    if duplicate_keys:
+        consolidated = consolidate_groups(df[is_duplicate], key=key, spec=spec)
+        df_clean = pd.concat([df[~is_duplicate], consolidated], ignore_index=True)
+    else:
+        df_clean = df
+    df_clean = df_clean.sort_values(by=key).reset_index(drop=True)
+    return df_clean, duplicate_keys
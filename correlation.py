@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from column_stats import CoMoments
+
+# ====================================
+# Correlations
+# ====================================
+#
+# correlation_matrix(df) gives what DataFrame.corr() gives, computed once:
+#   - without missing values the columns are standardized once, (x - mean) /
+#     std, and the whole matrix is one product Z.T @ Z / (n - 1)
+#   - with missing values, or more than CHUNK_ROWS rows, co-moments are
+#     accumulated chunk by chunk (column_stats.CoMoments, also matrix
+#     products) so only one chunk is ever converted at a time; the result is
+#     the pairwise-complete correlation like pandas'
+#   - method="spearman" does the same on each column's average ranks
+#   - dtype="float32" halves the memory of wide frames; one_hot() adds
+#     categorical columns as 0/1 indicators so they can be correlated too
+#
+# strong_pairs() reads the upper triangle only through a threshold mask and
+# sorts just the pairs that pass. cached_correlation() keeps results in
+# CACHE_DIR, keyed by a hash of the values, so the report, the charts and
+# the visualization scripts do not recompute a matrix for the same data.
+
+CACHE_DIR = Path(os.environ.get("CLASSROOM_CORRELATION_DIR", ".cache/correlation"))
+CACHE_VERSION = 1
+METHODS = ("pearson", "spearman")
+CHUNK_ROWS = 1_000_000
+STRONG = 0.5
+
+
+def numeric_columns(df, columns=None):
+    if columns is None:
+        return list(df.select_dtypes(include=["number"]).columns)
+    return [col for col in columns if col in df.columns]
+
+
+def one_hot(df, columns, dtype="float32", max_levels=50):
+    # "<column>=<value>" 0/1 columns for the `max_levels` most frequent
+    # values of each categorical column
+    indicators = []
+    for col in columns:
+        values = df[col].astype(object)
+        top = values.value_counts().index[:max_levels]
+        indicators.append(pd.get_dummies(values.where(values.isin(top)), prefix=col, prefix_sep="=", dtype=dtype))
+    return pd.concat(indicators, axis=1) if indicators else pd.DataFrame(index=df.index)
+
+
+def _ranks(values):
+    return pd.DataFrame(values).rank().to_numpy(dtype=values.dtype)
+
+
+def _complete_correlation(values):
+    n_rows = len(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = values.mean(axis=0)
+        std = values.std(axis=0, ddof=1)
+        z = (values - mean) / std
+        corr = np.clip((z.T @ z) / (n_rows - 1), -1.0, 1.0).astype("float64")
+    constant = ~(std > 0)
+    corr[constant, :] = np.nan
+    corr[:, constant] = np.nan
+    np.fill_diagonal(corr, np.where(constant, np.nan, 1.0))
+    return corr
+
+
+def _correlation(values, columns, method, chunk_rows):
+    if method not in METHODS:
+        raise ValueError(f"Unknown correlation method: {method} (choose from {', '.join(METHODS)})")
+    if method == "spearman":
+        values = _ranks(values)
+    if len(values) <= chunk_rows and not np.isnan(values).any():
+        return _complete_correlation(values)
+    moments = CoMoments(range(len(columns)))
+    for start in range(0, len(values), chunk_rows):
+        moments.update(pd.DataFrame(values[start:start + chunk_rows]))
+    return moments.corr().to_numpy()
+
+
+def correlation_matrix(df, columns=None, method="pearson", dtype="float64", chunk_rows=CHUNK_ROWS):
+    # DataFrame.corr(method) of the numeric `columns` (default: all numeric)
+    columns = numeric_columns(df, columns)
+    values = df[columns].to_numpy(dtype=dtype, na_value=np.nan)
+    return pd.DataFrame(_correlation(values, columns, method, chunk_rows), index=columns, columns=columns)
+
+
+def streaming_correlation(chunks, columns):
+    # Pearson correlation of `columns` over an iterable of frames (e.g.
+    # pd.read_csv(..., chunksize=...)), holding one chunk at a time
+    moments = CoMoments(columns)
+    for chunk in chunks:
+        moments.update(chunk)
+    return moments.corr()
+
+
+def strong_pairs(corr, threshold=STRONG):
+    # (column, column) -> r for |r| > threshold, every pair once, highest
+    # first
+    values = corr.to_numpy()
+    with np.errstate(invalid="ignore"):
+        rows, cols = np.nonzero(np.triu(np.abs(values) > threshold, k=1))
+    index = pd.MultiIndex.from_arrays([corr.index[rows], corr.columns[cols]])
+    return pd.Series(values[rows, cols], index=index, dtype="float64").sort_values(ascending=False)
+
+
+# ------------------------------------
+# Cache
+# ------------------------------------
+
+def _cache_path(values, columns, method, cache_dir):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([CACHE_VERSION, [str(col) for col in columns], method, str(values.dtype),
+                              values.shape]).encode())
+    digest.update(np.ascontiguousarray(values).tobytes())
+    return Path(cache_dir or CACHE_DIR) / f"{digest.hexdigest()}.json"
+
+
+def cached_correlation(df, columns=None, method="pearson", dtype="float64", cache_dir=None, chunk_rows=CHUNK_ROWS):
+    # correlation_matrix(), read from the cache when the same values were
+    # correlated before
+    columns = numeric_columns(df, columns)
+    values = df[columns].to_numpy(dtype=dtype, na_value=np.nan)
+    path = _cache_path(values, columns, method, cache_dir)
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+        return pd.DataFrame(np.array(entry["values"], dtype="float64"), index=columns, columns=columns)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    corr = _correlation(values, columns, method, chunk_rows)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Stages running at the same time may store the same matrix
+    tmp = path.with_suffix(f".{os.getpid()}-{threading.get_ident()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump({"columns": [str(col) for col in columns], "method": method, "values": corr.tolist()}, f)
+    os.replace(tmp, path)
+    return pd.DataFrame(corr, index=columns, columns=columns)
@@ -0,0 +1,296 @@
+"""Columnar cache for Excel workbooks.
+
+Parsing .xlsx with openpyxl is by far the slowest part of every script, so
+load_excel() converts a sheet into a Parquet/Feather file on the first read
+and loads that on later runs. A cache entry is keyed by the workbook's
+absolute path and sheet, and is valid while the file's size, mtime and
+content hash still match.
+
+    python data_cache.py info                 # list cache entries
+    python data_cache.py invalidate FILE...   # drop the entries for FILE
+    python data_cache.py clear                # drop everything
+    python data_cache.py bench FILE [--sheet NAME]   # cold vs warm load time
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401 - only needed for Parquet/Feather caches
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+CACHE_DIR = Path(os.environ.get("CLASSROOM_CACHE_DIR", ".cache/excel"))
+CACHE_VERSION = 1
+
+# Raw sheets often mix numbers and text in one column ("40" next to
+# "40 chairs"), which Arrow cannot store. Those columns are written as tagged
+# strings and decoded back to the same Python values on load.
+_TAGS = {str: "s", bool: "b", int: "i", float: "f"}
+
+
+def _entry_key(path, sheet_name):
+    return hashlib.sha1(f"{Path(path).resolve()}::{sheet_name}".encode()).hexdigest()[:20]
+
+
+def _entry_paths(path, sheet_name, cache_dir):
+    key = _entry_key(path, sheet_name)
+    return Path(cache_dir) / f"{key}.json", Path(cache_dir) / key
+
+
+def _tmp_path(path):
+    # Per process and thread, so two loads caching the same workbook (batch
+    # workers, a query service reload during a run) never share a tmp file
+    return path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _object_kinds(s):
+    return {type(v.item() if isinstance(v, np.generic) else v) for v in s.dropna().to_numpy()}
+
+
+def _encode_mixed(s):
+    def encode(value):
+        if isinstance(value, np.generic):
+            value = value.item()
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return None
+        tag = _TAGS.get(type(value))
+        if tag is None:
+            raise TypeError(f"cannot cache value of type {type(value).__name__}")
+        if tag == "f":
+            return tag + repr(value)
+        if tag == "b":
+            return tag + ("1" if value else "0")
+        return tag + str(value)
+    return pd.Series([encode(v) for v in s.to_numpy()], index=s.index, dtype=object)
+
+
+def _decode_mixed(s):
+    out = np.full(len(s), np.nan, dtype=object)
+    present = s.notna().to_numpy()
+    if not present.any():
+        return pd.Series(out, index=s.index)
+    tags = s.str[0].to_numpy()
+    payload = s.str[1:]
+    for tag, convert in (("s", lambda p: p.to_numpy(dtype=object)),
+                         ("i", lambda p: p.astype("int64").astype(object).to_numpy()),
+                         ("f", lambda p: p.astype("float64").astype(object).to_numpy()),
+                         ("b", lambda p: (p == "1").astype(object).to_numpy())):
+        mask = present & (tags == tag)
+        if mask.any():
+            out[mask] = convert(payload[mask])
+    return pd.Series(out, index=s.index)
+
+
+def _missing_as_nan(s):
+    # Arrow hands back None for missing strings; read_excel gives NaN
+    values = s.to_numpy(dtype=object, copy=True)
+    values[s.isna().to_numpy()] = np.nan
+    return pd.Series(values, index=s.index)
+
+
+def _write(df, data_path, fmt):
+    # Returns {"mixed": [...], "text": [...]}: object columns that need
+    # decoding after they are read back
+    if fmt == "pickle":
+        df.to_pickle(data_path)
+        return {"mixed": [], "text": []}
+    columns = {"mixed": [], "text": []}
+    stored = df.copy()
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        if _object_kinds(df[col]) <= {str}:
+            columns["text"].append(col)
+        else:
+            columns["mixed"].append(col)
+            stored[col] = _encode_mixed(stored[col])
+    if fmt == "feather":
+        # Uncompressed so the file can be memory-mapped
+        stored.reset_index(drop=True).to_feather(data_path, compression="uncompressed")
+    else:
+        stored.to_parquet(data_path, index=False)
+    return columns
+
+
+def _read(data_path, fmt, columns, memory_map):
+    if fmt == "pickle":
+        return pd.read_pickle(data_path)
+    if fmt == "feather":
+        import pyarrow.feather as feather
+        df = feather.read_table(data_path, memory_map=memory_map).to_pandas()
+    else:
+        import pyarrow.parquet as pq
+        df = pq.read_table(data_path, memory_map=memory_map).to_pandas()
+    for col in columns["mixed"]:
+        df[col] = _decode_mixed(df[col])
+    for col in columns["text"]:
+        df[col] = _missing_as_nan(df[col])
+    return df
+
+
+def _read_entry(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_entry(meta_path, entry):
+    tmp = _tmp_path(meta_path)
+    with open(tmp, "w") as f:
+        json.dump(entry, f, indent=2)
+    os.replace(tmp, meta_path)
+
+
+def load_excel(path, sheet_name=0, cache_dir=None, fmt=None, memory_map=False, verbose=False, **read_kwargs):
+    # pd.read_excel() with a columnar cache in front of it.
+    # fmt: "parquet" (default), "feather" (use with memory_map=True) or
+    # "pickle" (used automatically when pyarrow is not installed).
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    fmt = fmt or ("parquet" if HAS_PYARROW else "pickle")
+    if fmt != "pickle" and not HAS_PYARROW:
+        fmt = "pickle"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    meta_path, data_stem = _entry_paths(path, sheet_name, cache_dir)
+    data_path = data_stem.with_suffix(f".{fmt}")
+
+    stat = os.stat(path)
+    entry = _read_entry(meta_path)
+    options = {"requested_format": fmt, "read_kwargs": repr(sorted(read_kwargs.items())), "version": CACHE_VERSION}
+    if entry and all(entry.get(k) == v for k, v in options.items()) and Path(entry["data_file"]).exists():
+        fresh = entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+        if not fresh and entry["size"] == stat.st_size and entry["content_hash"] == file_hash(path):
+            # Touched but not changed: refresh the timestamps and keep the data
+            entry["mtime_ns"] = stat.st_mtime_ns
+            _write_entry(meta_path, entry)
+            fresh = True
+        if fresh:
+            start = time.perf_counter()
+            df = _read(entry["data_file"], entry["format"], entry["object_columns"], memory_map)
+            warm = time.perf_counter() - start
+            if verbose:
+                print(f"⚡ Loaded '{path}' from cache in {warm:.3f}s (Excel parse took {entry['parse_seconds']:.3f}s)")
+            return df
+
+    start = time.perf_counter()
+    df = pd.read_excel(path, sheet_name=sheet_name, **read_kwargs)
+    parse_seconds = time.perf_counter() - start
+
+    tmp_path = _tmp_path(data_path)
+    try:
+        object_columns = _write(df, tmp_path, fmt)
+    except (TypeError, ValueError, ImportError) as err:
+        # Something Arrow cannot hold: keep the data as a pickle instead
+        tmp_path.unlink(missing_ok=True)
+        if verbose:
+            print(f"⚠️ {fmt} cache not possible for '{path}' ({err}); using pickle")
+        fmt, data_path = "pickle", data_stem.with_suffix(".pickle")
+        tmp_path = _tmp_path(data_path)
+        object_columns = _write(df, tmp_path, fmt)
+    os.replace(tmp_path, data_path)
+    if entry and entry.get("data_file") != str(data_path):
+        Path(entry["data_file"]).unlink(missing_ok=True)
+    _write_entry(meta_path, {
+        "source": str(Path(path).resolve()),
+        "sheet_name": sheet_name,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "content_hash": file_hash(path),
+        "data_file": str(data_path),
+        "format": fmt,
+        "object_columns": object_columns,
+        "parse_seconds": parse_seconds,
+        **options,
+    })
+    if verbose:
+        print(f"📥 Parsed '{path}' in {parse_seconds:.3f}s and cached it")
+    return df
+
+
+def load_cleaned(path):
+    # A cleaned output in any of the pipeline's formats; .xlsx goes through
+    # the cache
+    suffix = Path(path).suffix.lower()
+    if suffix == ".csv":
+        return pd.read_csv(path)
+    if suffix == ".parquet":
+        return pd.read_parquet(path)
+    return load_excel(path)
+
+
+def cache_entries(cache_dir=None):
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    entries = []
+    for meta_path in sorted(cache_dir.glob("*.json")):
+        entry = _read_entry(meta_path)
+        if entry:
+            entries.append((meta_path, entry))
+    return entries
+
+
+def invalidate(path=None, cache_dir=None):
+    # Remove the cache entries for one workbook (all sheets), or all of them
+    removed = 0
+    source = str(Path(path).resolve()) if path else None
+    for meta_path, entry in cache_entries(cache_dir):
+        if source is None or entry["source"] == source:
+            Path(entry["data_file"]).unlink(missing_ok=True)
+            meta_path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cache-dir", default=None)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("info")
+    commands.add_parser("clear")
+    invalidate_parser = commands.add_parser("invalidate")
+    invalidate_parser.add_argument("files", nargs="+")
+    bench_parser = commands.add_parser("bench")
+    bench_parser.add_argument("file")
+    bench_parser.add_argument("--sheet", default=0)
+    bench_parser.add_argument("--format", default=None, choices=["parquet", "feather", "pickle"])
+    bench_parser.add_argument("--memory-map", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        for meta_path, entry in cache_entries(args.cache_dir):
+            size = Path(entry["data_file"]).stat().st_size if Path(entry["data_file"]).exists() else 0
+            print(f"{entry['source']} [{entry['sheet_name']}] -> {entry['data_file']} "
+                  f"({entry['format']}, {size / 1e6:.2f} MB, parse {entry['parse_seconds']:.2f}s)")
+    elif args.command == "clear":
+        print(f"Removed {invalidate(cache_dir=args.cache_dir)} cache entries")
+    elif args.command == "invalidate":
+        removed = sum(invalidate(file, cache_dir=args.cache_dir) for file in args.files)
+        print(f"Removed {removed} cache entries")
+    elif args.command == "bench":
+        invalidate(args.file, cache_dir=args.cache_dir)
+        for label in ("cold", "warm"):
+            start = time.perf_counter()
+            df = load_excel(args.file, sheet_name=args.sheet, cache_dir=args.cache_dir,
+                            fmt=args.format, memory_map=args.memory_map)
+            print(f"{label}: {time.perf_counter() - start:.3f}s ({len(df)} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,449 +1,468 @@
+"""Classroom data pipeline: clean, consolidate, analyse and report.
+
+    python data_processing.py                                  # everything, as before
+    python data_processing.py --no-plots                       # headless: no matplotlib/seaborn
+    python data_processing.py export.xlsx --stages clean,stats
+    python data_processing.py export.csv                       # CSV exports work too
+    python data_processing.py big.csv --output-format parquet  # no .xlsx for the large tables
+
+Stages: clean (cleaned/consolidated/duplicate files - always runs, the other
+stages work on its result), stats (numerical_statistics.xlsx,
+correlation_matrix.xlsx, outlier_review.xlsx), plots (correlation heatmap,
+distribution charts) and report (classroom_data_analysis_report.txt).
+The tables behind the charts and the report (statistics, value counts,
+correlations, floor averages, n_chairs histogram) are also cached for
+Visualization.py, vis2.py, vis3.py and charts.py (see results_cache.py).
+Importing this module runs nothing; matplotlib and seaborn are only imported
+when the plots stage runs.
+
+Once the cleaned frame exists, stages that do not depend on each other
+(statistics, correlations, outliers, charts, report, file writes) run at the
+same time on --stage-workers threads (see scheduler.py).
+
+Every run writes run_record.json: wall and CPU time, rows in/out and memory
+growth of each stage (load, each cleaning rule, consolidation, statistics,
+plots, each file written) and the schedule the stages ran in (--trace also
+saves it for chrome://tracing). --profile also runs cProfile and tracemalloc
+around the top-level stages and saves the slowest ones under profile/.
+"""
+import argparse
+
 import pandas as pd
-import numpy as np 
-import re
-import matplotlib.pyplot as plt
-import seaborn as sns
+
+from cleaning import clean, format_timings
+from column_stats import describe
+from consolidation import consolidate_duplicates
+from correlation import cached_correlation, correlation_matrix as compute_correlation, strong_pairs
+from data_cache import load_excel
+from dtypes import format_memory_report, memory_report, optimize_dtypes
+from export import OUTPUT_FORMATS, Exporter
+from fuzzy_matching import replace_values, resolve_codes
+from instrumentation import RunRecord
+from outliers import outlier_review
+from results_cache import data_key, derive_results, link_sources, save_results
+from scheduler import StageGraph, format_trace, write_chrome_trace
+from schema import BOOLEAN_COLS, NUMERICAL_COLS, NUMERIC_INT_COLS
 
 # Load the dataset
-file_path = "Data Science Classroom Data.xlsx"  
-df = pd.read_excel(file_path, sheet_name="Classroom Data")
-
-# Step 1: Cleaning column names (remove spaces & fix names)
-df.columns = df.columns.str.strip()  
-
-# Step 2: Rename columns for consistency
-column_renames = {
-    "Ligting": "Lighting",
-    "Cleaning service": "Cleaning Service",  
-    "Interior Deign": "Interior Design",
-    "Uage Timing": "Usage Timing",
-    "m_entr_distance": "Main Entrance Distance",
-    "wifi_connec": "WiFi Connection"
-}
-df.rename(columns=column_renames, inplace=True)
+file_path = "Data Science Classroom Data.xlsx"
+sheet_name = "Classroom Data"
+
+# Carry low-cardinality text columns as categoricals, booleans as bool and
+# counts as small integers from here on (see dtypes.py)
+compact_dtypes = True
+
+# Format of the row-level outputs (duplicate entries, consolidated and cleaned
+# data): "xlsx", or "parquet"/"csv" for large exports. cleaned_data.csv and
+# the statistics workbooks are always written. See export.py.
+output_format = "xlsx"
+
+# Merge classroom codes that are a typo of another code ("B63O", "6B30" next
+# to "B630") before looking for duplicates (see fuzzy_matching.py). Off by
+# default: streaming.py, incremental.py, batch_processing.py and
+# compare_files.py compare classroom codes exactly.
+fuzzy_classrooms = False
+
+STAGES = ("clean", "stats", "plots", "report")
+
+# Threads running independent pipeline stages at the same time (statistics,
+# outliers, charts, report, file writes) once the cleaned frame exists; 1
+# runs them one after another (see scheduler.py)
+stage_workers = 4
 
 # Defining numerical columns for later use in duplicate handling
-numerical_cols = ["n_chairs", "n_aircon", "n_windows", "Lighting", "socket", "Nbr of cameras", "Nbr of doors"]
-numeric_int_cols = ["n_chairs", "Nbr of cameras", "Nbr of doors", "n_aircon", "n_windows", "socket"]
-
-# Step 3: Handling non-numeric values in columns that should be numeric
-# Clean n_aircon first to handle cases like "2 (just for hot weather)"
-if "n_aircon" in df.columns:
-    df["n_aircon"] = df["n_aircon"].astype(str).str.strip()
-    # Extract just the numbers
-    df["n_aircon"] = df["n_aircon"].str.extract(r'(\d+)').fillna('')
-    # Convert to numeric
-    df["n_aircon"] = pd.to_numeric(df["n_aircon"], errors='coerce')
-
-
-numeric_cols_to_clean = ["n_chairs", "Nbr of cameras", "Nbr of doors", 
-                         "n_windows", "socket", "Lighting"]
-
-for col in numeric_cols_to_clean:
-    if col in df.columns:
-        # Convert to string first to handle any non-string values
-        df[col] = df[col].astype(str).str.strip()
-        # Extract just the numbers using regex
-        df[col] = df[col].str.extract(r'(\d+(?:\.\d+)?)').fillna('')
-        # Convert to numeric
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-
-
-# Fill numerical values with mean/median
-df["n_chairs"] = df["n_chairs"].fillna(df["n_chairs"].median())
-df["Nbr of cameras"] = df["Nbr of cameras"].fillna(df["Nbr of cameras"].median())
-df["Nbr of doors"] = df["Nbr of doors"].fillna(df["Nbr of doors"].median())
-df["n_aircon"] = df["n_aircon"].fillna(df["n_aircon"].median())
-df["socket"] = df["socket"].fillna(df["socket"].median())
-df["n_windows"] = df["n_windows"].fillna(df["n_windows"].median())
-
-# Fill categorical values with mode
-categorical_cols = ["Cleaning Service", "WiFi Connection", "Seats disposition", 
-                   "Interior Design", "maintenance", "Cyberpower", "Main Entrance Distance", "Noise Level"]
-for col in categorical_cols:
-    if col in df.columns: 
-        df[col] = df[col].fillna(df[col].mode()[0] if not df[col].mode().empty else "Unknown")
-
-# Step 4: Convert data types
-# Convert numerical columns to integers
-for col in numeric_int_cols:
-    if col in df.columns:
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
-
-# Convert yes/no/TRUE/FALSE to boolean values consistently
-boolean_cols = ["has_blinds", "has_smartboard", "has_computer", "Exit banner"]
-boolean_mapping = {
-    "yes": True, "no": False, "Yes": True, "NO": False, "No": False, 
-    "TRUE": True, "FALSE": False, "YES": True, "True": True, "False": False
-}
-
-for col in boolean_cols:
-    if col in df.columns:
-        df[col] = df[col].map(boolean_mapping)
-        # Fill any remaining NaN values with the most common value (mode)
-        most_common = df[col].mode()[0] if not df[col].mode().empty else False
-        df[col] = df[col].fillna(most_common)
-
-# ✅ Floor Column Formatting ✅
-if "floor" in df.columns:
-    df["floor"] = df["floor"].astype(str).str.lower().str.strip() 
-
-    # Standardize floor names
-    floor_mapping = {
-        "first": "1 floor",
-        "second": "2 floor",
-        "third": "3 floor",
-        "ground floor": "0 floor",
-        "1st": "1 floor",
-        "2nd": "2 floor",
-        "2nd floor": "2 floor",
-        "2 nd": "2 floor",
-        "3rd": "3 floor",
-        "0": "0 floor",
-        "-1": "-1 floor"
-    }
-
-    # Replace variations
-    df["floor"] = df["floor"].replace(floor_mapping)
-
-    # Ensure all numeric floors have the word "floor"
-    df["floor"] = df["floor"].apply(lambda x: f"{x} floor" if x.lstrip('-').isdigit() else x)
-
-    # Remove any accidental dots or extra symbols
-    df["floor"] = df["floor"].str.replace(r"\.", "", regex=True)
-
-    # Ensure a single space between number and 'floor'
-    df["floor"] = df["floor"].str.replace(r"(\d+)-?\s*floor", r"\1 floor", regex=True)
-    
-    # Create a numeric floor field for analysis
-    df["floor_number"] = df["floor"].str.extract(r"(-?\d+)").astype(float)
-
-# ✅ Classroom Column Formatting ✅
-if "classroom" in df.columns: 
-    df["classroom"] = df["classroom"].astype(str).str.upper()  
-    
-    # Remove all special characters and spaces 
-    df["classroom"] = df["classroom"].apply(lambda x: re.sub(r"[^A-Z0-9]", "", x))
-    
-# ✅ Lighting Column Formatting ✅
-if "Lighting" in df.columns: 
-    df["Lighting"] = df["Lighting"].astype(str)
-    
-    # Extract only the first number found in the string
-    df["Lighting"] = df["Lighting"].apply(lambda x: re.search(r"\d+", x).group() if re.search(r"\d+", x) else "")
-
-    # Convert to numeric, setting non-numeric values to NaN
-    df["Lighting"] = pd.to_numeric(df["Lighting"], errors="coerce")
-    
-    # Fill missing values with median
-    df["Lighting"] = df["Lighting"].fillna(df["Lighting"].median())
-
-# ✅ Noise Level Standardization ✅
-if "Noise Level" in df.columns:  
-    df["Noise Level"] = df["Noise Level"].astype(str).str.lower().str.strip()  
-
-    # Extract only 'high', 'low', or 'moderate' from the text
-    noise_pattern = r"\b(high|low|moderate)\b"
-    df["Noise Level"] = df["Noise Level"].apply(
-        lambda x: re.search(noise_pattern, x).group().capitalize() if re.search(noise_pattern, x) else ""
-    )
-    
-    # Fill any remaining empty values with mode
-    noise_mode = df["Noise Level"].mode()[0] if not df["Noise Level"].mode().empty else "Moderate"
-    df["Noise Level"] = df["Noise Level"].replace("", noise_mode)
-
-# ✅ Standardize the area column ✅
-if "area" in df.columns:
-    df["area"] = df["area"].astype(str).str.lower().str.strip()  # Normalize text
-
-    # Extract numerical values from area
-    df["area_numeric"] = df["area"].str.extract(r"(\d+\.?\d*)")[0]
-    # Convert to numeric and handle any conversion errors
-    df["area_numeric"] = pd.to_numeric(df["area_numeric"], errors="coerce")
-    
-    # Fill any missing values with the median area
-    median_area = df["area_numeric"].median()
-    df["area_numeric"] = df["area_numeric"].fillna(median_area)
-    
-    # Check for outliers and potentially erroneous entries in area
-   
-    df["area_zscore"] = np.abs((df["area_numeric"] - df["area_numeric"].mean()) / df["area_numeric"].std())
-    
-    # Mark potential outliers (z-score > 3) for investigation
-    outliers = df[df["area_zscore"] > 3].copy()
-    
-    # For area-to-chairs ratio outliers, estimate corrected area
-    df["chairs_area_ratio"] = df["n_chairs"] / df["area_numeric"]
-    median_ratio = df["chairs_area_ratio"].median()
-    
-   
-    small_area_many_chairs = df[(df["area_numeric"] < 10) & (df["n_chairs"] > 50)]
-    for idx, row in small_area_many_chairs.iterrows():
-        corrected_area = row["n_chairs"] / median_ratio
-        df.at[idx, "area_numeric"] = corrected_area
-    
-    # Format area consistently with 2 decimal places and "sqm"
-    df["area"] = df["area_numeric"].apply(lambda x: f"{x:.2f} sqm" if pd.notna(x) else "")
-    
-    # Drop temporary columns used for calculations
-    df.drop(columns=["area_zscore", "chairs_area_ratio"], inplace=True)
-
-# ✅ Standardize Wi-Fi Connection ✅
-if "WiFi Connection" in df.columns:
-    df["WiFi Connection"] = df["WiFi Connection"].astype(str).str.lower().str.strip()
-    
-    # Map similar values to standard categories
-    wifi_mapping = {
-        "good": "Good",
-        "poor": "Poor",
-        "low": "Poor",
-        "non exising": "Poor",
-        "non existing": "Poor"
-    }
-    
-    for key, value in wifi_mapping.items():
-        df["WiFi Connection"] = df["WiFi Connection"].replace(key, value)
-    
-    # Capitalize first letter for consistency
-    df["WiFi Connection"] = df["WiFi Connection"].str.capitalize()
-
-# ✅ Main Entrance Distance Standardization ✅
-if "Main Entrance Distance" in df.columns:
-    df["Main Entrance Distance"] = df["Main Entrance Distance"].astype(str).str.lower().str.strip()
-    
-    # Map to standardized categories
-    distance_mapping = {
-        "short": "Short",
-        "medium": "Medium",
-        "long": "Long",
-        "very short": "Very Short"
-    }
-    
-    for key, value in distance_mapping.items():
-        df["Main Entrance Distance"] = df["Main Entrance Distance"].replace(key, value)
-    
-    # Capitalize for consistency
-    df["Main Entrance Distance"] = df["Main Entrance Distance"].str.capitalize()
+numerical_cols = list(NUMERICAL_COLS)
+numeric_int_cols = list(NUMERIC_INT_COLS)
+boolean_cols = list(BOOLEAN_COLS)
+
+# Updating categorical columns list to include any boolean columns
+categorical_analysis_cols = ["floor", "Noise Level", "WiFi Connection", "Main Entrance Distance"] + boolean_cols
+
+
+def clean_data(raw_df, record=None):
+    # Steps 1-4: column names, numeric text, missing values, booleans and
+    # category standardization - all described as rules in cleaning.py
+    record = record or RunRecord()
+    cleaning_timings = {}
+    with record.stage("clean", rows_in=len(raw_df)) as stage:
+        df = clean(raw_df, timings=cleaning_timings, record=record)
+        stage["rows_out"] = len(df)
+    print("\n✅ Data cleaning rules applied. Slowest rules:")
+    print(format_timings(cleaning_timings, top=5))
+
+    if compact_dtypes:
+        df_object = df
+        with record.stage("compact dtypes", rows_in=len(df)) as stage:
+            df = optimize_dtypes(df)
+            stage["rows_out"] = len(df)
+        print(format_memory_report(memory_report(df_object, df)))
+        del df_object
+    return df
+
 
 # ====================================
 # Handling Duplicate Classrooms
 # ====================================
 
-print("\n✅ Starting Duplicate Classroom Handling...")
-
-df_with_duplicates = df.copy()
-
-# Check for duplicate classrooms
-if "classroom" in df.columns:
-    # Identify duplicate classrooms
-    duplicate_classrooms = df["classroom"].value_counts()
-    duplicate_classrooms = duplicate_classrooms[duplicate_classrooms > 1].index.tolist()
-    
-    print(f"Found {len(duplicate_classrooms)} classrooms with duplicate entries.")
-    
-    # Create a new DataFrame to store the consolidated rows
-    consolidated_df = pd.DataFrame(columns=df.columns)
-    
-    # Define columns to exclude (personal identifiers) - only for consolidated records
-    exclude_columns = ["name", "surname", "ID", "student_id", "person_id", "full_name"]
-    
-    # Process each duplicate classroom
-    for classroom in duplicate_classrooms:
-        # Get all rows for this classroom
-        duplicate_rows = df[df["classroom"] == classroom]
-        
-        # Create a new consolidated row
-        consolidated_row = {}
-        
-        # Process each column
-        for column in df.columns:
-            # Skip personal identifier columns ONLY for consolidated duplicate records
-            if column.lower() in [col.lower() for col in exclude_columns]:
-                consolidated_row[column] = None 
-                continue
-                
-            if column == "classroom":
-              
-                consolidated_row[column] = classroom
-            elif column in numerical_cols:
-                # For numerical columns, take the average, rounded appropriately
-                if column in numeric_int_cols:
-                    # For count-based integers, take the ceiling of the average (round up)
-                    consolidated_row[column] = int(np.ceil(duplicate_rows[column].mean()))
-                else:
-                    # For other numerical values, take the mean
-                    consolidated_row[column] = round(duplicate_rows[column].mean(), 2)
-            elif column == "area_numeric":
-                # Handle area_numeric separately
-                consolidated_row[column] = round(duplicate_rows[column].mean(), 2)
-            elif column == "floor":
-                # Take the most common floor
-                consolidated_row[column] = duplicate_rows[column].mode()[0]
-                # Also update floor_number if it exists
-                if "floor_number" in df.columns:
-                    consolidated_row["floor_number"] = duplicate_rows["floor_number"].mode()[0]
-            elif column in boolean_cols:
-                # For boolean columns, use True if any row has True
-                consolidated_row[column] = duplicate_rows[column].any()
-            elif column == "area":
-                # Use the newly calculated area_numeric for consistency
-                if "area_numeric" in consolidated_row:
-                    area_value = consolidated_row["area_numeric"]
-                else:
-                    area_value = round(duplicate_rows["area_numeric"].mean(), 2)
-                consolidated_row[column] = f"{area_value:.2f} sqm"
-            else:
-                # For other categorical columns, take the most frequent value
-                non_null_values = duplicate_rows[column].dropna()
-                if len(non_null_values) > 0:
-                    consolidated_row[column] = non_null_values.mode()[0]
-                else:
-                    consolidated_row[column] = None
-        
-        
-        consolidated_df = pd.concat([consolidated_df, pd.DataFrame([consolidated_row])], ignore_index=True)
-        
-    # Creating a clean version of the dataframe with duplicates removed and consolidation applied
-    
-    df_clean = df[~df["classroom"].isin(duplicate_classrooms)]
-    
-    # adding the consolidated rows
-    df_clean = pd.concat([df_clean, consolidated_df], ignore_index=True)
-    
-    # Save a record of the original duplicate entries for reference
-    duplicates_file_path = "duplicate_entries.xlsx"
-    df_with_duplicates[df_with_duplicates["classroom"].isin(duplicate_classrooms)].to_excel(duplicates_file_path, index=False)
-    print(f"Saved original duplicate entries to '{duplicates_file_path}' for reference")
-    
-    # Replace the main dataframe with the cleaned version
-    df = df_clean.copy()
-    
-    # Sort by classroom for easier reference
-    df = df.sort_values(by="classroom").reset_index(drop=True)
-    
-    # Save the consolidated dataset
-    consolidated_file_path = "consolidated_cleaned_data.xlsx"
-    df.to_excel(consolidated_file_path, index=False)
-    print(f"✅ Duplicate handling complete! Consolidated file saved as '{consolidated_file_path}'")
-    print(f"✅ Updated existing cleaned data files with consolidated version")
-else:
-    print("⚠️ 'classroom' column not found - skipping duplicate handling")
-
-# Step 5: Save the cleaned dataset
-cleaned_file_path = "cleaned_data.xlsx"
-df.to_excel(cleaned_file_path, index=False)
-df.to_csv("cleaned_data.csv", index=False)
-print(f"✅ Data cleaning complete! Cleaned file saved as '{cleaned_file_path}'")
+def handle_duplicates(df, record=None, exporter=None, output_format=output_format, fuzzy_ids=fuzzy_classrooms):
+    # Returns (consolidated frame, duplicated classroom codes); the files are
+    # written by `exporter` (in the background) or right away
+    record = record or RunRecord()
+    exporter = exporter or Exporter(record, workers=0)
+    print("\n✅ Starting Duplicate Classroom Handling...")
+
+    if fuzzy_ids and "classroom" in df.columns:
+        with record.stage("fuzzy classroom codes", rows_in=len(df)) as stage:
+            code_fixes = resolve_codes(df["classroom"])
+            # A new frame: the caller's classroom codes stay as they were
+            df = df.assign(classroom=replace_values(df["classroom"], code_fixes))
+            stage["rows_out"] = len(df)
+            stage["codes_merged"] = len(code_fixes)
+        if code_fixes:
+            examples = ", ".join(f"{code} -> {fixed}" for code, fixed in list(code_fixes.items())[:5])
+            print(f"Merged {len(code_fixes)} misspelled classroom codes into existing ones ({examples})")
+
+    df_with_duplicates = df.copy()
+    duplicate_classrooms = []
+
+    # Check for duplicate classrooms
+    if "classroom" in df.columns:
+        # Consolidate every duplicated classroom in one grouped pass (see consolidation.py):
+        # averages for numbers, most frequent value for categories, OR for booleans.
+        # Personal identifiers (schema.EXCLUDE_COLUMNS) are dropped on consolidated records only.
+        with record.stage("consolidate duplicates", rows_in=len(df)) as stage:
+            df_clean, duplicate_classrooms = consolidate_duplicates(df, key="classroom")
+            stage["rows_out"] = len(df_clean)
+
+        print(f"Found {len(duplicate_classrooms)} classrooms with duplicate entries.")
+
+        # Save a record of the original duplicate entries for reference
+        duplicates_file_path = f"duplicate_entries.{output_format}"
+        exporter.write(df_with_duplicates[df_with_duplicates["classroom"].isin(duplicate_classrooms)],
+                       duplicates_file_path)
+        print(f"Saving original duplicate entries to '{duplicates_file_path}' for reference")
+
+        # Replace the main dataframe with the cleaned version (already sorted by classroom)
+        df = df_clean
+
+        # Save the consolidated dataset
+        consolidated_file_path = f"consolidated_cleaned_data.{output_format}"
+        exporter.write(df, consolidated_file_path)
+        print(f"✅ Duplicate handling complete! Consolidated file saved as '{consolidated_file_path}'")
+        print(f"✅ Updated existing cleaned data files with consolidated version")
+    else:
+        print("⚠️ 'classroom' column not found - skipping duplicate handling")
+    return df, duplicate_classrooms
+
+
+def save_cleaned(df, exporter=None, output_format=output_format):
+    # Step 5: Save the cleaned dataset. It is the frame the consolidated file
+    # was written from, so the exporter copies that file instead of
+    # serializing the frame again.
+    exporter = exporter or Exporter(workers=0)
+    cleaned_file_path = f"cleaned_data.{output_format}"
+    exporter.write(df, cleaned_file_path)
+    exporter.write(df, "cleaned_data.csv")
+    print(f"✅ Data cleaning complete! Cleaned file saved as '{cleaned_file_path}'")
+
 
 # ====================================
 # 2.2 Statistical Analysis
 # ====================================
 
-print("\n✅ Starting Statistical Analysis...")
-
-
-if "area_numeric" in df.columns and "area_numeric" not in numerical_cols:
-    numerical_cols.append("area_numeric")
-
-# Calculate central tendency measures for numerical columns
-central_tendency = pd.DataFrame()
-
-for col in numerical_cols:
-    if col in df.columns:
-        central_tendency.loc["Mean", col] = df[col].mean()
-        central_tendency.loc["Median", col] = df[col].median()
-        central_tendency.loc["Std Dev", col] = df[col].std()
-        central_tendency.loc["Min", col] = df[col].min()
-        central_tendency.loc["25%", col] = df[col].quantile(0.25)
-        central_tendency.loc["75%", col] = df[col].quantile(0.75)
-        central_tendency.loc["Max", col] = df[col].max()
-        central_tendency.loc["Range", col] = df[col].max() - df[col].min()
-
-# Saving central tendency measures
-central_tendency.to_excel("numerical_statistics.xlsx")
-print("✅ Central tendency calculations complete")
-
-# Correlation analysis for numerical features
-if len(numerical_cols) > 1:
-    
-    existing_num_cols = [col for col in numerical_cols if col in df.columns]
-    correlation_matrix = df[existing_num_cols].corr()
-    correlation_matrix.to_excel("correlation_matrix.xlsx")
-    
-    # Creating a heatmap for correlations
-    plt.figure(figsize=(10, 8))
-    sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', fmt=".2f")
-    plt.title("Correlation Matrix of Numerical Features")
-    plt.tight_layout()
-    plt.savefig("correlation_heatmap.png")
-    print("✅ Correlation analysis complete")
+def analysis_columns(df):
+    columns = list(numerical_cols)
+    if "area_numeric" in df.columns and "area_numeric" not in columns:
+        columns.append("area_numeric")
+    return columns
 
-# Updating categorical columns list to include any boolean columns
-categorical_analysis_cols = ["floor", "Noise Level", "WiFi Connection", "Main Entrance Distance"] + boolean_cols
 
-# Creating value counts for each categorical column
-categorical_stats = {}
-for col in categorical_analysis_cols:
-    if col in df.columns:
-        value_counts = df[col].value_counts().reset_index()
-        value_counts.columns = [col, 'Count']
-        categorical_stats[col] = value_counts
-        
-        # Create bar charts for categorical variables
-        plt.figure(figsize=(10, 6))
-        sns.barplot(x=col, y='Count', data=value_counts)
-        plt.title(f"Distribution of {col}")
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig(f"{col}_distribution.png")
-
-# Creating a comprehensive report of all analyses
-with open("classroom_data_analysis_report.txt", "w") as f:
-    f.write("CLASSROOM DATA ANALYSIS REPORT\n")
-    f.write("============================\n\n")
-    
-    # Dataset overview
-    f.write("1. Dataset Overview\n")
-    f.write("-----------------\n")
-    f.write(f"Number of classrooms: {len(df)}\n")
-    f.write(f"Number of features: {len(df.columns)}\n\n")
-    
-    # Numerical statistics
-    f.write("2. Statistical Analysis of Numerical Features\n")
-    f.write("------------------------------------------\n")
-    f.write(central_tendency.to_string())
-    f.write("\n\n")
-    
-    # Categorical value counts
-    f.write("3. Analysis of Categorical Features\n")
-    f.write("--------------------------------\n")
-    for col, counts in categorical_stats.items():
-        f.write(f"\n{col} Distribution:\n")
-        f.write(counts.to_string(index=False))
-        f.write("\n")
-    
-    # Correlations of interest
-    f.write("\n4. Notable Correlations\n")
-    f.write("----------------------\n")
-    # Highlight strong correlations (absolute value > 0.5)
-    existing_num_cols = [col for col in numerical_cols if col in df.columns]
-    correlation_matrix = df[existing_num_cols].corr()
-    strong_correlations = correlation_matrix.unstack().sort_values(ascending=False)
-    strong_correlations = strong_correlations[(strong_correlations < 1.0) & (abs(strong_correlations) > 0.5)]
-    f.write(strong_correlations.to_string())
-    
-    # Floor-specific analysis
-    f.write("\n\n5. Floor-specific Analysis\n")
-    f.write("------------------------\n")
-    floor_stats = df.groupby("floor")[existing_num_cols].mean()
-    f.write("Average values by floor:\n")
-    f.write(floor_stats.to_string())
-    
-    # Add duplicate analysis information
-    if "classroom" in df.columns and len(duplicate_classrooms) > 0:
-        f.write("\n\n6. Duplicate Classroom Analysis\n")
-        f.write("-----------------------------\n")
-        f.write(f"Number of classrooms with multiple entries: {len(duplicate_classrooms)}\n")
-        f.write("Duplicate classrooms: " + ", ".join(duplicate_classrooms))
-
-print("✅ Statistical analysis complete! All results saved to files.")
\ No newline at end of file
+def central_tendency_table(df):
+    # Calculate central tendency measures for numerical columns: every statistic
+    # for every column in one vectorized pass (see column_stats.py)
+    return describe(df, analysis_columns(df))
+
+
+def correlation_table(df):
+    # Computed once per run (one matrix product, see correlation.py) and
+    # cached next to the cleaned data for the charts and vis scripts
+    existing_num_cols = [col for col in analysis_columns(df) if col in df.columns]
+    return cached_correlation(df, existing_num_cols)
+
+
+def categorical_counts(df):
+    # Creating value counts for each categorical column
+    categorical_stats = {}
+    for col in categorical_analysis_cols:
+        if col in df.columns:
+            value_counts = df[col].value_counts()
+            # Categorical columns also list categories that no longer occur
+            value_counts = value_counts[value_counts > 0].reset_index()
+            value_counts.columns = [col, 'Count']
+            categorical_stats[col] = value_counts
+    return categorical_stats
+
+
+def save_statistics(central_tendency, correlation_matrix, exporter=None):
+    # Saving central tendency measures
+    exporter = exporter or Exporter(workers=0)
+    exporter.write(central_tendency, "numerical_statistics.xlsx", index=True)
+    print("✅ Central tendency calculations complete")
+    if correlation_matrix is not None:
+        exporter.write(correlation_matrix, "correlation_matrix.xlsx", index=True)
+        print("✅ Correlation analysis complete")
+
+
+# ====================================
+# Plots
+# ====================================
+
+def plot_charts(correlation_matrix, categorical_stats, workers=None):
+    # Imported here so runs without plots never load matplotlib/seaborn. The
+    # charts are drawn from the tables above on headless Agg figures that are
+    # closed as soon as they are saved, in parallel (see charts.py).
+    from charts import render_charts, report_charts
+
+    return render_charts(report_charts(correlation_matrix, categorical_stats), workers=workers)
+
+
+# ====================================
+# Report
+# ====================================
+
+def write_report(df, central_tendency, categorical_stats, duplicate_classrooms, path="classroom_data_analysis_report.txt",
+                 correlation_matrix=None):
+    # Creating a comprehensive report of all analyses
+    with open(path, "w") as f:
+        f.write("CLASSROOM DATA ANALYSIS REPORT\n")
+        f.write("============================\n\n")
+
+        # Dataset overview
+        f.write("1. Dataset Overview\n")
+        f.write("-----------------\n")
+        f.write(f"Number of classrooms: {len(df)}\n")
+        f.write(f"Number of features: {len(df.columns)}\n\n")
+
+        # Numerical statistics
+        f.write("2. Statistical Analysis of Numerical Features\n")
+        f.write("------------------------------------------\n")
+        f.write(central_tendency.to_string())
+        f.write("\n\n")
+
+        # Categorical value counts
+        f.write("3. Analysis of Categorical Features\n")
+        f.write("--------------------------------\n")
+        for col, counts in categorical_stats.items():
+            f.write(f"\n{col} Distribution:\n")
+            f.write(counts.to_string(index=False))
+            f.write("\n")
+
+        # Correlations of interest
+        f.write("\n4. Notable Correlations\n")
+        f.write("----------------------\n")
+        # Highlight strong correlations (absolute value > 0.5), each pair once
+        existing_num_cols = [col for col in analysis_columns(df) if col in df.columns]
+        if correlation_matrix is None:
+            correlation_matrix = compute_correlation(df, existing_num_cols)
+        f.write(strong_pairs(correlation_matrix, 0.5).to_string())
+
+        # Floor-specific analysis
+        f.write("\n\n5. Floor-specific Analysis\n")
+        f.write("------------------------\n")
+        floor_stats = df.groupby("floor", observed=True)[existing_num_cols].mean()
+        f.write("Average values by floor:\n")
+        f.write(floor_stats.to_string())
+
+        # Add duplicate analysis information
+        if "classroom" in df.columns and len(duplicate_classrooms) > 0:
+            f.write("\n\n6. Duplicate Classroom Analysis\n")
+            f.write("-----------------------------\n")
+            f.write(f"Number of classrooms with multiple entries: {len(duplicate_classrooms)}\n")
+            f.write("Duplicate classrooms: " + ", ".join(duplicate_classrooms))
+
+
+def run(path=file_path, sheet=sheet_name, stages=STAGES, plot_workers=None, record=None,
+        output_format=output_format, workbook=None, export_workers=2, fuzzy_ids=fuzzy_classrooms,
+        stage_workers=stage_workers):
+    # The whole pipeline (or the chosen stages); returns the final frame.
+    # Stage timings go to `record` (an instrumentation.RunRecord) if given,
+    # with the schedule the stages actually ran in under "schedule".
+    # Independent stages run on `stage_workers` threads and files are written
+    # by `export_workers` threads while the analysis goes on; with
+    # `workbook`, all the .xlsx tables become sheets of that file.
+    record = record or RunRecord()
+    with Exporter(record, workers=export_workers, workbook=workbook) as exporter:
+        graph = build_stages(path, sheet, set(stages) | {"clean"}, plot_workers, record, exporter, output_format,
+                             fuzzy_ids)
+        try:
+            outputs = graph.run(stage_workers)
+        finally:
+            record.info["schedule"] = graph.trace
+    if set(stages) - {"clean"}:
+        print("✅ Statistical analysis complete! All results saved to files.")
+    df, _ = outputs["duplicates"]
+    return df
+
+
+def build_stages(path, sheet, stages, plot_workers, record, exporter, output_format,
+                 fuzzy_ids=fuzzy_classrooms):
+    # The pipeline as a graph of stages (see scheduler.py). Once the
+    # consolidated frame exists, statistics, correlations, counts, outliers,
+    # charts, the report and the file writes each wait only for what they use.
+    graph = StageGraph()
+
+    def load():
+        # Parsed once, then read from the columnar cache (see data_cache.py)
+        with record.stage("load") as stage:
+            if str(path).lower().endswith(".csv"):
+                raw_df = pd.read_csv(path)
+            else:
+                raw_df = load_excel(path, sheet_name=sheet, verbose=True)
+            stage["rows_out"] = len(raw_df)
+        return raw_df
+
+    def duplicates(df):
+        return handle_duplicates(df, record, exporter, output_format, fuzzy_ids)
+
+    def save(handled):
+        save_cleaned(handled[0], exporter, output_format)
+
+    graph.add("load", load)
+    graph.add("clean", lambda raw_df: clean_data(raw_df, record), after=["load"])
+    graph.add("duplicates", duplicates, after=["clean"])
+    graph.add("save cleaned", save, after=["duplicates"])
+    if stages == {"clean"}:
+        return graph
+
+    def stats(handled):
+        df, _ = handled
+        print("\n✅ Starting Statistical Analysis...")
+        with record.stage("stats", rows_in=len(df)):
+            return central_tendency_table(df)
+
+    def correlation(handled):
+        # Correlation analysis for numerical features
+        df, _ = handled
+        with record.stage("correlation", rows_in=len(df)):
+            return correlation_table(df) if len(analysis_columns(df)) > 1 else None
+
+    def counts(handled):
+        df, _ = handled
+        with record.stage("categorical counts", rows_in=len(df)):
+            return categorical_counts(df)
+
+    def results_cache(handled, central_tendency, categorical_stats):
+        # Everything the charts and the report draw from, cached under a hash
+        # of the cleaned data
+        df, _ = handled
+        with record.stage("results cache", rows_in=len(df)):
+            results = derive_results(df, central_tendency, categorical_stats)
+            results_key = data_key(df)
+            save_results(results_key, results)
+        return results_key, results
+
+    def link_cleaned(_, cached):
+        # The cleaned files point to the entry once they are written
+        cleaned_files = ["cleaned_data.csv"]
+        if not (exporter.workbook and output_format == "xlsx"):
+            cleaned_files.append(f"cleaned_data.{output_format}")
+        exporter.after_writes(link_sources, cleaned_files, cached[0])
+
+    graph.add("stats", stats, after=["duplicates"])
+    graph.add("correlation", correlation, after=["duplicates"])
+    graph.add("categorical counts", counts, after=["duplicates"])
+    graph.add("results cache", results_cache, after=["duplicates", "stats", "categorical counts"])
+    graph.add("link cleaned files", link_cleaned, after=["save cleaned", "results cache"])
+
+    if "stats" in stages:
+        def outliers(handled):
+            # Unusual rooms (robust z-scores, robust Mahalanobis distance) for review
+            df, _ = handled
+            with record.stage("outliers", rows_in=len(df)) as stage:
+                review = outlier_review(df)
+                stage["rows_out"] = len(review)
+            return review
+
+        def save_outliers(review, _):
+            review_path = f"outlier_review.{output_format}"
+            exporter.write(review, review_path)
+            print(f"✅ {len(review)} classrooms flagged as outliers - saved to '{review_path}' for review")
+
+        # Files are handed to the exporter in the same order as in a sequential
+        # run, so a --workbook gets its sheets in the same order
+        graph.add("save statistics", lambda central_tendency, correlation_matrix, _: save_statistics(
+            central_tendency, correlation_matrix, exporter), after=["stats", "correlation", "save cleaned"])
+        graph.add("outliers", outliers, after=["duplicates"])
+        graph.add("save outliers", save_outliers, after=["outliers", "save statistics"])
+
+    if "plots" in stages:
+        def plots(correlation_matrix, categorical_stats):
+            with record.stage("plots", child_processes=True) as stage:
+                stage["charts"] = len(plot_charts(correlation_matrix, categorical_stats, workers=plot_workers))
+
+        graph.add("plots", plots, after=["correlation", "categorical counts"])
+
+    if "report" in stages:
+        def report(handled, central_tendency, categorical_stats, correlation_matrix):
+            df, duplicate_classrooms = handled
+            with record.stage("write:classroom_data_analysis_report.txt", rows_in=len(df)):
+                write_report(df, central_tendency, categorical_stats, duplicate_classrooms,
+                             correlation_matrix=correlation_matrix)
+
+        graph.add("report", report, after=["duplicates", "stats", "categorical counts", "correlation"])
+    return graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", nargs="?", default=file_path)
+    parser.add_argument("--sheet", default=sheet_name)
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help=f"comma-separated stages to run (default: {','.join(STAGES)})")
+    parser.add_argument("--no-plots", action="store_true", help="skip the plots stage (no matplotlib/seaborn import)")
+    parser.add_argument("--plot-workers", type=int, default=None,
+                        help="processes rendering the charts (default: one per core)")
+    parser.add_argument("--run-record", default="run_record.json",
+                        help="where to write the per-stage timings (JSON)")
+    parser.add_argument("--profile", action="store_true",
+                        help="also profile the top-level stages (cProfile, tracemalloc); "
+                             "the slowest are saved next to the run record under profile/")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default=output_format,
+                        help="format of the duplicate/consolidated/cleaned data files (default: %(default)s)")
+    parser.add_argument("--workbook", default=None,
+                        help="write all .xlsx tables as sheets of this one workbook instead")
+    parser.add_argument("--export-workers", type=int, default=2,
+                        help="threads writing the output files (0: write in the pipeline's thread)")
+    parser.add_argument("--fuzzy-ids", action="store_true", default=fuzzy_classrooms,
+                        help="also merge classroom codes that are a typo of another code (B63O -> B630)")
+    parser.add_argument("--stage-workers", type=int, default=stage_workers,
+                        help="threads running independent stages (1: one after another; default: %(default)s)")
+    parser.add_argument("--trace", default=None,
+                        help="also save the stage schedule for chrome://tracing / Perfetto (JSON)")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = sorted(set(stages) - set(STAGES))
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+    if args.no_plots:
+        stages = [stage for stage in stages if stage != "plots"]
+    # Stages are only profiled on the main thread, so --profile runs them in order
+    workers = 1 if args.profile else args.stage_workers
+    record = RunRecord(profile=args.profile, file=args.file, sheet=args.sheet, stages=stages, stage_workers=workers)
+    run(args.file, args.sheet, stages, plot_workers=args.plot_workers, record=record,
+        output_format=args.output_format, workbook=args.workbook, export_workers=args.export_workers,
+        fuzzy_ids=args.fuzzy_ids, stage_workers=workers)
+    record.save(args.run_record)
+    print("\n⏱️ Stage timings:")
+    print(record.format())
+    print(f"\n🧵 Stage schedule ({workers} workers):")
+    print(format_trace(record.info["schedule"]))
+    if args.trace:
+        write_chrome_trace(record.info["schedule"], args.trace)
+        print(f"✅ Schedule trace saved as '{args.trace}' (open in chrome://tracing or ui.perfetto.dev)")
+    print(f"✅ Run record saved as '{args.run_record}'")
+
+
+if __name__ == "__main__":
+    main()
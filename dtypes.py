@@ -0,0 +1,58 @@
+import pandas as pd
+
+from schema import BOOLEAN_COLS, CATEGORY_COLS, NUMERIC_INT_COLS
+
+# ====================================
+# Compact Column Types
+# ====================================
+#
+# After cleaning, most text columns hold a handful of distinct values but are
+# stored as one Python string per row. Carrying them as categoricals (plus
+# real bools and the smallest integer type that fits) shrinks the frame
+# several-fold and makes value_counts / groupby work on small integer codes.
+
+
+def optimize_dtypes(df, category_cols=CATEGORY_COLS, boolean_cols=BOOLEAN_COLS, int_cols=NUMERIC_INT_COLS):
+    df = df.copy()
+    for col in category_cols:
+        if col in df.columns and df[col].dtype == object:
+            try:
+                df[col] = df[col].astype("category")
+            except TypeError:
+                # Mixed values that cannot be ordered - keep them as they are
+                pass
+
+    for col in boolean_cols:
+        if col in df.columns and df[col].dtype != bool and df[col].isin([True, False]).all():
+            df[col] = df[col].astype(bool)
+
+    for col in int_cols:
+        if col in df.columns and df[col].dtype.kind in "iu":
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+
+def memory_report(before, after):
+    # Deep memory usage per column, largest savings first
+    report = pd.DataFrame({
+        "before_bytes": before.memory_usage(deep=True, index=False),
+        "after_bytes": after.memory_usage(deep=True, index=False),
+    }).fillna(0).astype("int64")
+    report["saved_bytes"] = report["before_bytes"] - report["after_bytes"]
+    report["before_dtype"] = before.dtypes.astype(str)
+    report["after_dtype"] = after.dtypes.astype(str)
+    report = report.sort_values("saved_bytes", ascending=False)
+    report.loc["Total", ["before_bytes", "after_bytes", "saved_bytes"]] = report[
+        ["before_bytes", "after_bytes", "saved_bytes"]].sum()
+    return report
+
+
+def format_memory_report(report):
+    total = report.loc["Total"]
+    ratio = total["before_bytes"] / max(total["after_bytes"], 1)
+    lines = [f"Working frame memory: {total['before_bytes'] / 1e6:.2f} MB -> "
+             f"{total['after_bytes'] / 1e6:.2f} MB ({ratio:.1f}x smaller)"]
+    for col, row in report.drop(index="Total").head(5).iterrows():
+        lines.append(f"  {col:<25} {row['before_dtype']:>8} -> {row['after_dtype']:<9}"
+                     f" {row['before_bytes'] / 1e6:8.2f} MB -> {row['after_bytes'] / 1e6:.2f} MB")
+    return "\n".join(lines)
@@ -0,0 +1,221 @@
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import RunRecord
+
+try:
+    import xlsxwriter
+    HAS_XLSXWRITER = True
+except ImportError:
+    HAS_XLSXWRITER = False
+
+# ====================================
+# Output files
+# ====================================
+#
+# write_table(df, path) saves a frame as .xlsx, .csv or .parquet depending on
+# the file name; write_workbook(path, sheets) saves several frames as the
+# sheets of one workbook in a single pass.
+#
+# Workbooks are written with xlsxwriter in constant-memory mode when it is
+# installed: one row at a time, each column with the writer for its type, so
+# memory stays flat however many rows there are. pandas' own to_excel fills
+# the sheet column by column, which constant-memory mode cannot take.
+# Without xlsxwriter, pandas/openpyxl writes them as before.
+#
+# An Exporter runs the writes in a small thread pool so the pipeline can
+# carry on (statistics, report) while files are saved, and writes each frame
+# only once: saving the same frame to a second .xlsx file copies the first.
+# Frames handed to an Exporter must not be modified afterwards. Writes may
+# be submitted from several threads (the pipeline's stages, see
+# scheduler.py). With `workbook` set, every
+# .xlsx write becomes a sheet (named after the file) of that one workbook,
+# saved in one pass when the Exporter is closed.
+
+OUTPUT_FORMATS = ("xlsx", "parquet", "csv")
+
+DATETIME_FORMAT = "yyyy-mm-dd hh:mm:ss"
+
+
+def _has_inf(s):
+    return s.dtype.kind == "f" and bool(np.isinf(s.to_numpy()).any())
+
+
+def _column_cells(s):
+    # Values of one column as Python objects, None for missing cells and
+    # "inf"/"-inf" for infinities (as pandas' to_excel writes them)
+    values = s.astype(object).where(s.notna(), None)
+    if _has_inf(s):
+        values = values.replace({np.inf: "inf", -np.inf: "-inf"})
+    return values.tolist()
+
+
+def _cell_writer(worksheet, s):
+    kind = s.dtype.kind
+    if kind == "b":
+        return worksheet.write_boolean
+    if kind in "iu" or (kind == "f" and not _has_inf(s)):
+        return worksheet.write_number
+    if kind == "M":
+        return worksheet.write_datetime
+    # Text, categories and mixed columns: xlsxwriter picks per value
+    return worksheet.write
+
+
+def _write_sheet(workbook, name, df, index):
+    worksheet = workbook.add_worksheet(name)
+    header_format = workbook.add_format({"bold": True, "border": 1, "align": "center"})
+    columns = [df[col] for col in df.columns]
+    header = [str(col) for col in df.columns]
+    if index:
+        columns.insert(0, df.index.to_series())
+        header.insert(0, df.index.name or "")
+    worksheet.write_row(0, 0, header, header_format)
+
+    writers = [_cell_writer(worksheet, s) for s in columns]
+    cells = [_column_cells(s) for s in columns]
+    for row, values in enumerate(zip(*cells), start=1):
+        for col, value in enumerate(values):
+            if value is not None:
+                writers[col](row, col, value)
+
+
+def write_workbook(path, sheets, index=False):
+    # {sheet name: frame} -> one workbook, every sheet in one pass. `index`
+    # is a bool for all sheets or a {sheet name: bool} dict.
+    index_of = index if isinstance(index, dict) else {name: index for name in sheets}
+    if not HAS_XLSXWRITER:
+        with pd.ExcelWriter(path) as writer:
+            for name, df in sheets.items():
+                df.to_excel(writer, sheet_name=name, index=index_of.get(name, False))
+        return path
+
+    workbook = xlsxwriter.Workbook(str(path), {"constant_memory": True, "default_date_format": DATETIME_FORMAT})
+    try:
+        for name, df in sheets.items():
+            _write_sheet(workbook, name, df, index_of.get(name, False))
+    finally:
+        workbook.close()
+    return path
+
+
+def write_table(df, path, index=False, sheet_name="Sheet1"):
+    suffix = Path(path).suffix.lower()
+    if suffix == ".csv":
+        df.to_csv(path, index=index)
+    elif suffix == ".parquet":
+        df.to_parquet(path, index=index)
+    elif suffix == ".xlsx":
+        write_workbook(path, {sheet_name: df}, index=index)
+    else:
+        raise ValueError(f"Unsupported output file type: {path}")
+    return path
+
+
+class Exporter:
+
+    def __init__(self, record=None, workers=2, workbook=None):
+        self.record = record or RunRecord()
+        self.workers = workers
+        self.workbook = workbook
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export") if workers > 0 else None
+        self._written = {}
+        self._paths = set()
+        self._sheets = {}
+        self._sheet_index = {}
+        self._futures = []
+        self._lock = threading.RLock()
+
+    def _run(self, func, *args):
+        if self._pool is None:
+            func(*args)
+            return None
+        future = self._pool.submit(func, *args)
+        self._futures.append(future)
+        return future
+
+    def _save(self, df, path, index, sheet_name):
+        with self.record.stage(f"write:{path}", rows_in=len(df)):
+            write_table(df, path, index=index, sheet_name=sheet_name)
+
+    def _copy(self, first, source, path):
+        if first is not None:
+            first.result()
+        with self.record.stage(f"write:{path}", copy_of=str(source)):
+            shutil.copyfile(source, path)
+
+    def write(self, df, path, index=False, sheet_name="Sheet1"):
+        # Save `df` to `path` (in the background with a thread pool). The same
+        # frame written again in the same format is copied, not re-serialized.
+        suffix = Path(path).suffix.lower()
+        with self._lock:
+            if path in self._paths:
+                return None
+            self._paths.add(path)
+            if self.workbook and suffix == ".xlsx":
+                return self._add_sheet(df, path, index)
+
+            key = (id(df), suffix, index, sheet_name)
+            if key in self._written:
+                _, source, first = self._written[key]
+                return self._run(self._copy, first, source, path)
+            future = self._run(self._save, df, path, index, sheet_name)
+            # The frame itself is kept so its id cannot be reused
+            self._written[key] = (df, path, future)
+            return future
+
+    def _add_sheet(self, df, path, index):
+        # Sheet names are at most 31 characters; a frame already added as
+        # another sheet is not added twice
+        if any(sheet is df for sheet in self._sheets.values()):
+            return None
+        name = Path(path).stem[:31]
+        self._sheets[name] = df
+        self._sheet_index[name] = index
+        return None
+
+    def write_workbook(self, path, sheets, index=False):
+        def save():
+            with self.record.stage(f"write:{path}", rows_in=sum(len(df) for df in sheets.values()),
+                                   sheets=list(sheets)):
+                write_workbook(path, sheets, index=index)
+        return self._run(save)
+
+    def after_writes(self, func, *args):
+        # Call func(*args) once everything submitted so far is on disk
+        with self._lock:
+            pending = list(self._futures)
+
+        def call():
+            for future in pending:
+                future.result()
+            func(*args)
+        return self._run(call)
+
+    def wait(self):
+        # Block until every write is done; re-raises the first failure
+        with self._lock:
+            futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+    def close(self):
+        try:
+            if self._sheets:
+                self.write_workbook(self.workbook, self._sheets, index=self._sheet_index)
+                self._sheets = {}
+            self.wait()
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    from rapidfuzz.distance import OSA
+    HAS_RAPIDFUZZ = True
+except ImportError:
+    HAS_RAPIDFUZZ = False
+
+# ====================================
+# Fuzzy Value Resolution
+# ====================================
+#
+# The value mappings in cleaning.py only know the typos someone listed
+# ("non exising"), and duplicate detection only merges classroom codes that
+# are identical once upper-cased and stripped of separators. resolve() maps
+# the remaining near-misses onto a vocabulary of known values:
+#   - only distinct values are compared, never rows
+#   - a value is matched when exactly one vocabulary entry is closest and
+#     within max_edits() typos (an adjacent swap counts as one), and both
+#     contain the same numbers: "2nd flor" -> "2nd floor", never "4nd floor"
+#   - candidates come from an n-gram index of the vocabulary (a typo only
+#     destroys a few of a word's letter pairs), so each value is compared
+#     with a handful of entries instead of all of them
+#   - answers, including "no match", are cached on disk per vocabulary, so a
+#     later run over the same values does no matching at all; only the
+#     MAX_CACHE_FILES most recently used vocabularies are kept
+#
+# resolve_codes() uses the data as its own vocabulary: codes of the common
+# shape ("B630" -> "A999") are taken as they are, and rare-shaped codes are
+# resolved against them only when they differ by letters typed for digits
+# ("B63O", "B6I0") or by two swapped neighbours ("6B30"). A code with a letter
+# more or less ("B630A", "LAB1") is a different room, never a typo.
+
+CACHE_DIR = Path(os.environ.get("CLASSROOM_FUZZY_DIR", ".cache/fuzzy"))
+CACHE_VERSION = 1
+# Vocabularies kept on disk; the least recently used are dropped beyond this
+MAX_CACHE_FILES = 32
+NGRAM = 2
+
+CLASSROOM_CONFUSABLES = {"O": "0", "I": "1"}
+# Code shapes held by fewer than this share of the distinct codes are typos
+RARE_SHAPE_SHARE = 0.05
+
+_SHAPE = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789", "A" * 52 + "9" * 10)
+
+_loaded = {}
+
+
+def max_edits(value):
+    # Typos allowed for a value of this length: none for very short values
+    if len(value) < 4:
+        return 0
+    return 1 if len(value) < 8 else 2
+
+
+def edit_distance(a, b, limit):
+    # Optimal string alignment distance; anything above `limit` is returned
+    # as limit + 1
+    if HAS_RAPIDFUZZ:
+        return OSA.distance(a, b, score_cutoff=limit)
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+def ngrams(value, n=NGRAM):
+    padded = f"^{value}$"
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def _numbers(value):
+    return tuple(re.findall(r"\d+", value))
+
+
+class NGramIndex:
+
+    def __init__(self, values, n=NGRAM):
+        self.values = list(values)
+        self.n = n
+        self.lengths = np.array([len(value) for value in self.values])
+        self.numbers = [_numbers(value) for value in self.values]
+        postings = {}
+        for i, value in enumerate(self.values):
+            for gram in ngrams(value, n):
+                postings.setdefault(gram, []).append(i)
+        self.postings = {gram: np.array(ids) for gram, ids in postings.items()}
+
+    def candidates(self, value, max_distance):
+        # Positions of the values that can be within `max_distance` edits:
+        # close enough in length and sharing enough n-grams (each edit
+        # destroys at most n + 1 of them)
+        grams = ngrams(value, self.n)
+        close = np.abs(self.lengths - len(value)) <= max_distance
+        need = len(grams) - max_distance * (self.n + 1)
+        if need <= 0:
+            return np.flatnonzero(close)
+        hits = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not hits:
+            return np.array([], dtype=int)
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.values))
+        return np.flatnonzero(close & (shared >= need))
+
+    def nearest(self, value, max_distance):
+        # The single closest value with the same numbers, or None when there
+        # is none within `max_distance` or several are equally close
+        numbers = _numbers(value)
+        best, best_distance, ties = None, max_distance + 1, 0
+        for i in self.candidates(value, max_distance):
+            if self.numbers[i] != numbers:
+                continue
+            distance = edit_distance(value, self.values[i], min(best_distance, max_distance))
+            if distance < best_distance:
+                best, best_distance, ties = i, distance, 1
+            elif distance == best_distance <= max_distance:
+                ties += 1
+        return self.values[best] if best is not None and ties == 1 else None
+
+
+# ------------------------------------
+# Disk cache
+# ------------------------------------
+
+def _cache_path(vocabulary, confusables, max_distance, cache_dir):
+    key = json.dumps([CACHE_VERSION, NGRAM, sorted((confusables or {}).items()), max_distance, vocabulary])
+    return Path(cache_dir or CACHE_DIR) / f"{hashlib.sha1(key.encode()).hexdigest()[:20]}.json"
+
+
+def _load_cache(path):
+    if path not in _loaded:
+        try:
+            with open(path) as f:
+                _loaded[path] = json.load(f)
+            # A hit counts as a use for the eviction
+            os.utime(path)
+        except (OSError, ValueError):
+            _loaded[path] = {}
+    return _loaded[path]
+
+
+def evict(max_files=MAX_CACHE_FILES, cache_dir=None):
+    files = sorted(Path(cache_dir or CACHE_DIR).glob("*.json"), key=lambda p: p.stat().st_mtime_ns, reverse=True)
+    for path in files[max_files:]:
+        path.unlink(missing_ok=True)
+        _loaded.pop(path, None)
+    return len(files[max_files:])
+
+
+def _save_cache(path, resolved):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}-{threading.get_ident()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(resolved, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+    evict(cache_dir=path.parent)
+
+
+def clear_cache(cache_dir=None):
+    _loaded.clear()
+    for path in Path(cache_dir or CACHE_DIR).glob("*.json"):
+        path.unlink()
+
+
+# ------------------------------------
+# Resolution
+# ------------------------------------
+
+def resolve(values, vocabulary, confusables=None, max_distance=None, cache_dir=None):
+    # {value: vocabulary entry} for the values that are not in `vocabulary`
+    # but a typo or two (max_distance, default: max_edits()) away from
+    # exactly one of its entries
+    vocabulary = sorted({str(word) for word in vocabulary})
+    known = set(vocabulary)
+    queries = sorted({str(value) for value in values} - known)
+    if not queries or not vocabulary:
+        return {}
+
+    path = _cache_path(vocabulary, confusables, max_distance, cache_dir)
+    resolved = _load_cache(path)
+    todo = [value for value in queries if value not in resolved]
+    if todo:
+        table = str.maketrans(confusables or {})
+        folded = {}
+        for word in vocabulary:
+            folded.setdefault(word.translate(table), []).append(word)
+        index = NGramIndex(folded)
+        for value in todo:
+            key = value.translate(table)
+            match = index.nearest(key, max_edits(key) if max_distance is None else max_distance)
+            # Two entries that only differ by a confusable letter: ambiguous
+            resolved[value] = folded[match][0] if match is not None and len(folded[match]) == 1 else None
+        _save_cache(path, resolved)
+    return {value: resolved[value] for value in queries if resolved[value] is not None}
+
+
+def code_shape(codes):
+    # "B630" -> "A999", per value of a Series of codes
+    return codes.str.translate(_SHAPE)
+
+
+def transpositions(value):
+    # Every string made by swapping two neighbouring characters of `value`
+    return {value[:i] + value[i + 1] + value[i] + value[i + 2:] for i in range(len(value) - 1)} - {value}
+
+
+def resolve_codes(codes, confusables=CLASSROOM_CONFUSABLES, rare_share=RARE_SHAPE_SHARE):
+    # {rare-shaped code: common-shaped code it is a typo of}
+    uniques = pd.Series(pd.unique(codes.dropna().astype(str)), dtype=object)
+    if uniques.empty:
+        return {}
+    shapes = code_shape(uniques)
+    rare = (shapes.map(shapes.value_counts(normalize=True)) < rare_share).to_numpy()
+    if not rare.any():
+        return {}
+    table = str.maketrans(confusables or {})
+    folded = {}
+    for code in uniques[~rare]:
+        folded.setdefault(code.translate(table), []).append(code)
+    resolved = {}
+    for code in uniques[rare]:
+        key = code.translate(table)
+        matches = folded.get(key) or [match for variant in transpositions(key) for match in folded.get(variant, [])]
+        # Several codes it could be a typo of: ambiguous, kept as it is
+        if len(matches) == 1:
+            resolved[code] = matches[0]
+    return resolved
+
+
+def replace_values(s, mapping):
+    # Series.replace() that also works on categorical columns
+    if not mapping:
+        return s
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.astype(object).replace(mapping).astype("category")
+    return s.replace(mapping)
@@ -0,0 +1,289 @@
+"""Incremental re-processing: only reclean what changed since the last run.
+
+    python incremental.py "Data Science Classroom Data.xlsx"     # first run: full clean, state saved
+    python incremental.py "Data Science Classroom Data.xlsx"     # later runs: only the changes
+    python incremental.py "Data Science Classroom Data.xlsx" --full   # ignore the saved state
+
+Every raw row is fingerprinted (a hash of its cells as text). The previous
+run's row-level results are kept in a state file next to the data cache, and a
+new run:
+
+  - runs the row-local cleaning rules only on new or changed rows
+  - updates the value counts behind the median/mode fills and the area
+    statistics by adding the new rows and taking away the removed ones, then
+    redoes the global steps only for rows whose result actually changes
+  - re-consolidates only the classrooms whose rows changed
+  - updates the statistics table and the correlation matrix from running
+    sums / co-moments and value counts instead of rescanning every column
+
+The outputs match a full run of data_processing.py (statistics up to
+floating-point rounding). If the columns of the sheet change, the run starts
+from scratch.
+"""
+import argparse
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cleaning import PIPELINE, area_numeric, clean, is_global
+from column_stats import TABLE_ROWS, CoMoments, weighted_median, weighted_quantile
+from consolidation import build_aggregation_spec, consolidate_duplicates, find_duplicate_keys
+from data_cache import load_excel
+from export import Exporter
+from schema import NUMERICAL_COLS
+from streaming import add_counts, replay, resolve_global_steps, split_pipeline
+
+STATE_DIR = Path(os.environ.get("CLASSROOM_STATE_DIR", ".cache/incremental"))
+STATE_VERSION = 1
+STATS_COLUMNS = list(NUMERICAL_COLS) + ["area_numeric"]
+
+
+def row_keys(raw):
+    # One key per raw row: a hash of its cells as text. Repeated identical
+    # rows get different keys through their occurrence number.
+    fingerprints = pd.util.hash_pandas_object(raw.astype(str), index=False).to_numpy()
+    occurrence = pd.Series(fingerprints).groupby(fingerprints).cumcount().to_numpy()
+    keys = pd.util.hash_pandas_object(pd.DataFrame({"row": fingerprints, "occurrence": occurrence}), index=False)
+    return pd.Index(keys.to_numpy(), name="row_key")
+
+
+def _state_path(path, sheet_name, state_dir):
+    key = hashlib.sha1(f"{Path(path).resolve()}::{sheet_name}".encode()).hexdigest()[:20]
+    return Path(state_dir or STATE_DIR) / f"{key}.pkl"
+
+
+def _update_counts(total, removed, added):
+    total = add_counts(total, -removed) if total is not None and len(removed) else total
+    return add_counts(total, added)
+
+
+def _value_counts(df, column):
+    return df[column].value_counts(dropna=False, sort=False)
+
+
+def _area_pairs(df):
+    return df.groupby(["area", "n_chairs"], dropna=False, sort=False).size()
+
+
+def _by_label(fills):
+    return {operation.label: value for operation, value in fills.items()}
+
+
+def _changed_values(deferred, column, values, old_fills, new_fills):
+    # Distinct row-local values of `column` whose cleaned result differs
+    # between the old and the new fill values (None: the dtype changed, so
+    # every row needs redoing)
+    operations = [op for op in deferred if op.column == column]
+    old = {op: old_fills[op.label] for op in operations if is_global(op) and op.label in old_fills}
+    new = {op: new_fills[op] for op in operations if is_global(op) and op in new_fills}
+    frame = pd.DataFrame({column: values}).infer_objects()
+    before = replay(operations, frame.copy(), np.ones(len(frame)), old)[column]
+    after = replay(operations, frame.copy(), np.ones(len(frame)), new)[column]
+    if before.dtype != after.dtype:
+        return None
+    same = (before == after) | (before.isna() & after.isna())
+    return values[~same.to_numpy()]
+
+
+def _area_rows(local, pairs, chairs_operations, fills, old_stats, new_stats):
+    # Rows whose standardize_area() result changes with the new statistics
+    if old_stats is None or new_stats is None:
+        return np.zeros(len(local), dtype=bool)
+    frame = replay(chairs_operations, pairs.index.to_frame(index=False), pairs.to_numpy(), fills)
+    area = area_numeric(frame["area"])
+    affected = np.zeros(len(frame), dtype=bool)
+    if old_stats["median_area"] != new_stats["median_area"]:
+        affected |= area.isna().to_numpy()
+    if (old_stats["median_area"], old_stats["median_ratio"]) != (new_stats["median_area"], new_stats["median_ratio"]):
+        filled = area.fillna(new_stats["median_area"])
+        affected |= ((filled < 10) & (frame["n_chairs"] > 50)).to_numpy()
+    return local["area"].isin(frame.loc[affected, "area"]).to_numpy()
+
+
+def _cast(df, dtypes):
+    for column, dtype in dtypes.items():
+        if column in df.columns and df[column].dtype != dtype:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def _output_dtypes(output, spec, cleaned, has_duplicates):
+    # Consolidated rows carry averages, so those columns are float whenever
+    # any classroom was consolidated (as in a full run)
+    for column, rule in spec.items():
+        if rule == "round_mean":
+            dtype = "float64" if has_duplicates else cleaned[column].dtype
+            if output[column].dtype != dtype:
+                output[column] = output[column].astype(dtype)
+    return output
+
+
+def statistics_table(stat_counts, moments):
+    # describe()-style table from value counts (median, quartiles, min, max)
+    # and running sums (mean, std)
+    means, stds = moments.mean(), moments.std()
+    table = {}
+    for column, counts in stat_counts.items():
+        values = counts.index.to_numpy(dtype="float64")
+        weights = counts.to_numpy()
+        present = ~np.isnan(values)
+        low = values[present].min() if present.any() else np.nan
+        high = values[present].max() if present.any() else np.nan
+        table[column] = [means[column], weighted_median(values, weights), stds[column], low,
+                         weighted_quantile(values, weights, 0.25), weighted_quantile(values, weights, 0.75),
+                         high, high - low]
+    return pd.DataFrame(table, index=TABLE_ROWS, dtype="float64")
+
+
+def process_incremental(path, sheet_name="Classroom Data", state_dir=None, full=False, key="classroom",
+                        verbose=True):
+    # Clean, consolidate and summarise `path`, reusing the previous run's
+    # results for rows that did not change. Returns (output frame, cleaned
+    # rows before consolidation, statistics table, correlation matrix, summary).
+    log = print if verbose else (lambda *args: None)
+    start = time.perf_counter()
+    raw = load_excel(path, sheet_name=sheet_name)
+    raw.index = row_keys(raw)
+    keys = raw.index
+
+    state_path = _state_path(path, sheet_name, state_dir)
+    state = None
+    if not full and state_path.exists():
+        state = pd.read_pickle(state_path)
+        if state.get("version") != STATE_VERSION or state["columns"] != list(raw.columns):
+            log("⚠️ Sheet columns changed since the last run - processing everything")
+            state = None
+
+    row_local, deferred = split_pipeline(PIPELINE)
+    fill_columns = []
+    for operation in deferred:
+        if is_global(operation) and operation.column and operation.column not in fill_columns:
+            fill_columns.append(operation.column)
+
+    # Row-local rules on new/changed rows only
+    if state:
+        previous_local, previous_cleaned = state["local"], state["cleaned"]
+        is_new = ~keys.isin(previous_local.index)
+        removed = previous_local.index.difference(keys)
+    else:
+        previous_local = previous_cleaned = None
+        is_new = np.ones(len(keys), dtype=bool)
+        removed = pd.Index([])
+    local_new = clean(raw[is_new], pipeline=row_local)
+    local = pd.concat([previous_local.loc[keys[~is_new]], local_new]).loc[keys] if state else local_new
+    removed_local = previous_local.loc[removed] if state else local_new.iloc[:0]
+
+    # Value counts behind the fills and the area step: add new, take away removed
+    counts = dict(state["counts"]) if state else {}
+    for column in fill_columns:
+        if column in local.columns:
+            counts[column] = _update_counts(counts.get(column), _value_counts(removed_local, column),
+                                            _value_counts(local_new, column))
+    pairs = None
+    if {"area", "n_chairs"} <= set(local.columns):
+        pairs = _update_counts(state["pairs"] if state else None, _area_pairs(removed_local), _area_pairs(local_new))
+    final_operations, fills, dtypes, area_stats = resolve_global_steps(deferred, counts, pairs)
+
+    # Global steps for new rows and for rows whose fill/area result changed
+    redo = is_new.copy()
+    if state:
+        for column in counts:
+            values = counts[column].index.to_numpy(dtype=object)
+            changed = _changed_values(deferred, column, values, state["fills"], fills)
+            if changed is None or state["dtypes"].get(column) != dtypes.get(column):
+                redo[:] = True
+                break
+            if len(changed):
+                redo |= local[column].isin(changed).to_numpy()
+        if pairs is not None:
+            area_index = next(i for i, op in enumerate(deferred) if op.rule.kind == "frame")
+            chairs = [op for op in deferred[:area_index] if op.column == "n_chairs"]
+            redo |= _area_rows(local, pairs, chairs, fills, state["area_stats"], area_stats)
+    cleaned_redo = _cast(clean(local[redo], pipeline=final_operations), dtypes)
+    cleaned = pd.concat([previous_cleaned.loc[keys[~redo]], cleaned_redo]).loc[keys] if state else cleaned_redo
+
+    # Re-consolidate only the classrooms whose rows changed
+    spec = build_aggregation_spec(cleaned.columns, key=key)
+    duplicate_keys = find_duplicate_keys(cleaned, key)
+    if state:
+        affected = pd.Index(cleaned.loc[redo, key]).union(previous_cleaned.loc[removed, key])
+        previous_output = state["output"]
+        stale = previous_output[key].isin(affected)
+        part, _ = consolidate_duplicates(cleaned[cleaned[key].isin(affected)], key=key, spec=spec)
+        output = pd.concat([previous_output[~stale], part], ignore_index=True)
+        output = output.sort_values(by=key).reset_index(drop=True)
+        removed_output = previous_output[stale]
+    else:
+        affected = pd.Index(cleaned[key].unique())
+        output, _ = consolidate_duplicates(cleaned, key=key, spec=spec)
+        part, removed_output = output, output.iloc[:0]
+    output = _output_dtypes(output, spec, cleaned, bool(duplicate_keys))
+    part = _output_dtypes(part.copy(), spec, cleaned, bool(duplicate_keys))
+
+    # Statistics and correlations from running sums and value counts
+    stats_columns = [col for col in STATS_COLUMNS if col in output.columns]
+    moments = state["moments"] if state and state["moments"].columns == stats_columns else None
+    stat_counts = dict(state["stat_counts"]) if moments is not None else {}
+    if moments is None:
+        moments, removed_output, part = CoMoments(stats_columns), output.iloc[:0], output
+    moments.update(removed_output, sign=-1).update(part)
+    for column in stats_columns:
+        stat_counts[column] = _update_counts(stat_counts.get(column), _value_counts(removed_output, column),
+                                             _value_counts(part, column))
+    statistics = statistics_table(stat_counts, moments)
+    correlation = moments.corr()
+
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = state_path.with_suffix(".tmp")
+    pd.to_pickle({
+        "version": STATE_VERSION, "columns": list(raw.columns), "local": local, "cleaned": cleaned,
+        "counts": counts, "pairs": pairs, "fills": _by_label(fills), "dtypes": dtypes, "area_stats": area_stats,
+        "output": output, "moments": moments, "stat_counts": stat_counts,
+    }, tmp_path)
+    os.replace(tmp_path, state_path)
+
+    summary = {
+        "rows": len(keys), "new_rows": int(is_new.sum()), "removed_rows": len(removed),
+        "recleaned_rows": int(redo.sum()), "reconsolidated_classrooms": len(affected),
+        "duplicate_classrooms": len(duplicate_keys), "seconds": time.perf_counter() - start,
+        "changed": bool(is_new.any() or len(removed) or redo.any()),
+    }
+    log(f"🔁 {summary['new_rows']} new/changed rows, {summary['removed_rows']} removed, "
+        f"{summary['recleaned_rows']} recleaned, {summary['reconsolidated_classrooms']} classrooms "
+        f"re-consolidated ({summary['seconds']:.2f}s)")
+    return output, cleaned, statistics, correlation, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", nargs="?", default="Data Science Classroom Data.xlsx")
+    parser.add_argument("--sheet", default="Classroom Data")
+    parser.add_argument("--state-dir", default=None, help=f"where run state is kept (default {STATE_DIR})")
+    parser.add_argument("--full", action="store_true", help="ignore the saved state and process everything")
+    args = parser.parse_args()
+
+    output, cleaned, statistics, correlation, summary = process_incremental(
+        args.file, args.sheet, state_dir=args.state_dir, full=args.full)
+    if not summary["changed"] and Path("cleaned_data.csv").exists():
+        print("✅ Nothing changed since the last run - outputs left as they are")
+        return
+
+    duplicate_keys = find_duplicate_keys(cleaned)
+    # Written in parallel, the consolidated frame only once (see export.py)
+    with Exporter() as exporter:
+        exporter.write(cleaned[cleaned["classroom"].isin(duplicate_keys)], "duplicate_entries.xlsx")
+        exporter.write(output, "consolidated_cleaned_data.xlsx")
+        exporter.write(output, "cleaned_data.xlsx")
+        exporter.write(output, "cleaned_data.csv")
+        exporter.write(statistics, "numerical_statistics.xlsx", index=True)
+        exporter.write(correlation, "correlation_matrix.xlsx", index=True)
+    print("✅ Updated cleaned_data.xlsx/.csv, consolidated_cleaned_data.xlsx, duplicate_entries.xlsx, "
+          "numerical_statistics.xlsx and correlation_matrix.xlsx")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+# ====================================
+# Run records
+# ====================================
+#
+# A RunRecord collects one entry per pipeline stage:
+#
+#     record = RunRecord(file="Data Science Classroom Data.xlsx")
+#     with record.stage("load") as stage:
+#         df = load_excel(...)
+#         stage["rows_out"] = len(df)
+#     record.save("run_record.json")
+#
+# Each entry has the wall and CPU seconds, rows in/out (when the caller sets
+# them), resident memory at the start and end and how much the process's
+# peak memory grew during the stage. Stages can be nested ("clean" holds one
+# entry per cleaning rule); entries name their parent.
+#
+# With profile=True the top-level stages also run under cProfile and
+# tracemalloc (nested stages cannot have a profiler of their own). save()
+# then writes the profiles of the slowest stages next to the record.
+#
+# Stages may also run in worker threads (see export.py, scheduler.py). They
+# nest per thread, count that thread's CPU time only and are never profiled.
+# Peak memory is only known for the whole process, so a stage that was open
+# at the same time as a stage on another thread records peak_rss_delta_mb as
+# null (None) rather than growth it may not have caused. CPU time of child
+# processes is also only known for the whole process; a stage that runs a
+# process pool (the chart render pool) opens with child_processes=True and
+# records what its children used as child_cpu_s, unless another such stage
+# was open at the same time (then None).
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_mb():
+    # Current resident memory (Linux; falls back to the peak elsewhere)
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE / 2**20
+    except OSError:
+        return peak_rss_mb()
+
+
+def child_cpu_s():
+    # User + system CPU of the child processes that have finished so far
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+class RunRecord:
+
+    def __init__(self, profile=False, top=3, **info):
+        self.info = {"started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                     "python": sys.version.split()[0], **info}
+        self.stages = []
+        self.profile = profile
+        self.top = top
+        self._local = threading.local()
+        # Stages open right now on any thread, for the overlap check
+        self._open = []
+        self._open_lock = threading.Lock()
+        self._profiles = []
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._child_cpu_start = child_cpu_s()
+        if profile and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _stack(self):
+        # Open stages of the calling thread
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, name, rows_in=None, child_processes=False, **extra):
+        stack = self._stack()
+        main_thread = threading.current_thread() is threading.main_thread()
+        entry = {"name": name, "parent": stack[-1]["name"] if stack else None,
+                 "rows_in": rows_in, "rows_out": None, **extra}
+        if not main_thread:
+            entry["thread"] = threading.current_thread().name
+        profiler = None
+        if self.profile and main_thread and not stack:
+            profiler = cProfile.Profile()
+            tracemalloc.reset_peak()
+        self.stages.append(entry)
+        stack.append(entry)
+        overlap = {"entry": entry, "thread": threading.get_ident(), "overlapped": False,
+                   "children": child_processes, "children_overlapped": False}
+        with self._open_lock:
+            for other in self._open:
+                if other["thread"] != overlap["thread"]:
+                    other["overlapped"] = overlap["overlapped"] = True
+                if other["children"] and child_processes:
+                    other["children_overlapped"] = overlap["children_overlapped"] = True
+            self._open.append(overlap)
+        cpu_time = time.process_time if main_thread else time.thread_time
+        rss_start, peak_start = rss_mb(), peak_rss_mb()
+        start, cpu_start, child_start = time.perf_counter(), cpu_time(), child_cpu_s()
+        if profiler:
+            profiler.enable()
+        try:
+            yield entry
+        finally:
+            if profiler:
+                profiler.disable()
+            entry["wall_s"] = time.perf_counter() - start
+            entry["cpu_s"] = cpu_time() - cpu_start
+            entry["rss_start_mb"] = rss_start
+            entry["rss_end_mb"] = rss_mb()
+            with self._open_lock:
+                self._open.remove(overlap)
+            entry["peak_rss_delta_mb"] = None if overlap["overlapped"] else peak_rss_mb() - peak_start
+            if child_processes:
+                entry["child_cpu_s"] = None if overlap["children_overlapped"] else child_cpu_s() - child_start
+            if profiler:
+                entry["traced_peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+                snapshot = tracemalloc.take_snapshot().statistics("lineno")[:20]
+                self._profiles.append((entry, profiler, snapshot))
+            stack.pop()
+
+    def summary(self):
+        return {
+            "wall_s": time.perf_counter() - self._start,
+            "cpu_s": time.process_time() - self._cpu_start,
+            "child_cpu_s": child_cpu_s() - self._child_cpu_start,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+    def as_dict(self):
+        return {"run": {**self.info, **self.summary()}, "stages": self.stages}
+
+    def save(self, path="run_record.json", profile_dir=None):
+        # JSON record; with profiling, also the cProfile (.prof) and a text
+        # summary (cumulative time, top allocations) of the slowest stages
+        record = self.as_dict()
+        if self._profiles:
+            profile_dir = Path(profile_dir or Path(path).parent / "profile")
+            profile_dir.mkdir(parents=True, exist_ok=True)
+            slowest = sorted(self._profiles, key=lambda profile: profile[0]["wall_s"], reverse=True)[:self.top]
+            for stage, profiler, snapshot in slowest:
+                base = profile_dir / "".join(c if c.isalnum() or c in "-_." else "_" for c in stage["name"])
+                profiler.dump_stats(f"{base}.prof")
+                text = io.StringIO()
+                pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(30)
+                text.write("\nLargest allocations still held at the end of the stage (tracemalloc):\n")
+                for stat in snapshot:
+                    text.write(f"{stat}\n")
+                Path(f"{base}.txt").write_text(text.getvalue())
+                stage["profile"] = f"{base}.prof"
+        with open(path, "w") as f:
+            json.dump(record, f, indent=2, default=str)
+        return path
+
+    def format(self, parent=None):
+        # Stage table for the console (top-level stages unless `parent` is given)
+        lines = [f"  {'stage':<42} {'wall s':>8} {'cpu s':>8} {'child s':>8} {'rows in':>9} {'rows out':>9} "
+                 f"{'+peak MB':>9}"]
+        for stage in self.stages:
+            if stage["parent"] != parent:
+                continue
+            rows_in = "" if stage["rows_in"] is None else stage["rows_in"]
+            rows_out = "" if stage["rows_out"] is None else stage["rows_out"]
+            peak = "" if stage["peak_rss_delta_mb"] is None else f"{stage['peak_rss_delta_mb']:.1f}"
+            child = "" if stage.get("child_cpu_s") is None else f"{stage['child_cpu_s']:.3f}"
+            lines.append(f"  {stage['name']:<42} {stage['wall_s']:8.3f} {stage['cpu_s']:8.3f} {child:>8} "
+                         f"{rows_in:>9} {rows_out:>9} {peak:>9}")
+        return "\n".join(lines)
@@ -0,0 +1,154 @@
+"""Flag unusual classrooms in the cleaned data for review.
+
+    python outliers.py                                   # cleaned_data.csv -> outlier_review.csv
+    python outliers.py cleaned_data.parquet --output review.xlsx
+
+A row is flagged when one of its values is far from the column's median
+(robust z-score: distance in MADs, scaled to match a standard deviation on
+normal data) or when its combination of chairs, area, sockets, lighting and
+windows is far from the bulk of the rooms (robust Mahalanobis distance).
+Median/MAD and the robust covariance are not dragged along by the outliers
+themselves the way mean/std are. The rows are only flagged, never changed.
+"""
+import argparse
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from data_cache import load_cleaned
+from export import write_table
+from schema import OUTLIER_COLS
+
+# MAD -> standard deviation for normally distributed data
+MAD_SCALE = 1.4826
+# |robust z| above this flags a single value (Iglewicz & Hoaglin)
+ZSCORE_LIMIT = 3.5
+# Squared robust distances above this chi-square quantile flag a row
+DISTANCE_QUANTILE = 0.975
+# Share of the rows the robust centre and covariance are taken from
+SUPPORT = 0.75
+MAX_STEPS = 30
+# Larger tables estimate the centre/covariance on a fixed random sample of
+# this many rows, then score every row in one pass
+SAMPLE_ROWS = 100_000
+
+
+def chi2_quantile(q, dof):
+    # Wilson-Hilferty approximation, good to a few percent for dof >= 2
+    z = NormalDist().inv_cdf(q)
+    return dof * (1 - 2 / (9 * dof) + z * np.sqrt(2 / (9 * dof))) ** 3
+
+
+def robust_scale(values):
+    # MAD per column, scaled like a standard deviation; columns where more
+    # than half the values are equal fall back to the mean absolute deviation
+    center = np.nanmedian(values, axis=0)
+    deviation = np.abs(values - center)
+    scale = MAD_SCALE * np.nanmedian(deviation, axis=0)
+    fallback = 1.2533 * np.nanmean(deviation, axis=0)
+    return center, np.where(scale > 0, scale, fallback)
+
+
+def robust_zscores(values):
+    # (value - median) / scaled MAD, per column of a 2-D array; 0 for
+    # constant columns, NaN where the value is missing
+    center, scale = robust_scale(values)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (values - center) / scale
+    return np.where(scale > 0, z, np.where(np.isnan(values), np.nan, 0.0))
+
+
+def mahalanobis_sq(values, center, covariance):
+    diff = values - center
+    return ((diff @ np.linalg.pinv(covariance)) * diff).sum(axis=1)
+
+
+def robust_covariance(values, support=SUPPORT, max_steps=MAX_STEPS, sample_rows=SAMPLE_ROWS):
+    # Centre and covariance of the `support` share of rows closest to each
+    # other: starting from the median/MAD, repeatedly keep the closest rows
+    # and re-estimate from them until the subset stops changing (the
+    # concentration steps of the minimum covariance determinant). Returns
+    # (centre, covariance, squared distances of all rows).
+    if len(values) > sample_rows:
+        sample = np.random.default_rng(0).choice(len(values), sample_rows, replace=False)
+        center, covariance, _ = robust_covariance(values[np.sort(sample)], support, max_steps, sample_rows)
+        distances = mahalanobis_sq(values, center, covariance)
+        return center, covariance, distances
+    n_rows, n_cols = values.shape
+    keep = min(n_rows, max(n_cols + 1, int(np.ceil(support * n_rows))))
+    center, scale = robust_scale(values)
+    scale = np.where(scale > 0, scale, 1.0)
+    distances = (((values - center) / scale) ** 2).sum(axis=1)
+    covariance = np.diag(scale ** 2)
+    subset = None
+    for _ in range(max_steps):
+        closest = np.sort(np.argpartition(distances, keep - 1)[:keep])
+        if subset is not None and np.array_equal(closest, subset):
+            break
+        subset = closest
+        center = values[subset].mean(axis=0)
+        covariance = np.cov(values[subset], rowvar=False)
+        distances = mahalanobis_sq(values, center, covariance)
+    # Rescale so the median distance is the chi-square median, as it would
+    # be for the full normal distribution rather than its central part
+    factor = np.median(distances) / chi2_quantile(0.5, n_cols)
+    if factor > 0:
+        covariance = covariance * factor
+        distances = distances / factor
+    return center, covariance, distances
+
+
+def outlier_scores(df, columns=OUTLIER_COLS):
+    # Robust z-score per column and the robust distance per row (NaN where a
+    # value is missing), with the column/row flags
+    columns = [col for col in columns if col in df.columns]
+    values = df[columns].to_numpy(dtype="float64", na_value=np.nan)
+    z = robust_zscores(values)
+    scores = pd.DataFrame(z, index=df.index, columns=[f"{col}_robust_z" for col in columns])
+
+    complete = ~np.isnan(values).any(axis=1)
+    distance = np.full(len(df), np.nan)
+    limit = np.sqrt(chi2_quantile(DISTANCE_QUANTILE, len(columns))) if columns else np.inf
+    if len(columns) >= 2 and complete.sum() > len(columns):
+        _, _, squared = robust_covariance(values[complete])
+        distance[complete] = np.sqrt(squared)
+    scores["robust_distance"] = distance
+    scores["multivariate_outlier"] = distance > limit
+    scores["outlier"] = scores["multivariate_outlier"] | (np.abs(np.nan_to_num(z)) > ZSCORE_LIMIT).any(axis=1)
+    return scores, columns
+
+
+def outlier_review(df, columns=OUTLIER_COLS, key="classroom"):
+    # The flagged rows: key, the checked columns, their robust z-scores, the
+    # robust distance and which checks flagged them; most unusual first
+    scores, columns = outlier_scores(df, columns)
+    flagged = scores["outlier"].to_numpy()
+    review = df.loc[flagged, ([key] if key in df.columns else []) + columns].copy()
+    review = review.join(scores.loc[flagged].drop(columns=["outlier", "multivariate_outlier"]))
+
+    flagged_by = pd.Series("", index=review.index)
+    for col in columns:
+        far = np.abs(review[f"{col}_robust_z"].to_numpy()) > ZSCORE_LIMIT
+        flagged_by = flagged_by + np.where(far, f"{col}, ", "")
+    flagged_by = flagged_by + np.where(scores.loc[flagged, "multivariate_outlier"], "combination, ", "")
+    review["flagged_by"] = flagged_by.str.rstrip(", ")
+    return review.sort_values("robust_distance", ascending=False, na_position="last")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", nargs="?", default="cleaned_data.csv", help="cleaned data (.csv, .parquet or .xlsx)")
+    parser.add_argument("--output", default="outlier_review.csv", help=".csv, .parquet or .xlsx")
+    args = parser.parse_args()
+
+    df = load_cleaned(args.file)
+    review = outlier_review(df)
+    write_table(review, args.output)
+    print(f"✅ {len(review)} of {len(df)} rows flagged for review - saved as '{args.output}'")
+    if len(review):
+        print(review["flagged_by"].value_counts().head(10).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+"""Filter and aggregate queries over the cleaned classroom data, locally or over HTTP.
+
+    python query_service.py serve                              # cleaned_data.csv on http://127.0.0.1:8765
+    python query_service.py serve cleaned_data.parquet --port 9000
+    python query_service.py query "floor_number=2&has_smartboard=true&n_chairs__gte=40&main_entrance_distance__in=Short,Very short"
+    python query_service.py aggregate "group_by=floor&metrics=count,mean:n_chairs&has_computer=true"
+
+The cleaned output (.csv, .parquet or .xlsx) is loaded once into an
+in-memory SQLite table with indexes on classroom, floor_number, n_chairs,
+area_numeric and the boolean and categorical facility columns. Queries are
+query strings:
+
+    <column>=<value>            equal (text is compared case-insensitively)
+    <column>__in=a,b            one of the values
+    <column>__ne / __gt / __gte / __lt / __lte=<value>
+    <column>__contains=<text>
+    columns=a,b  order=-n_chairs  limit=20            (/classrooms)
+    group_by=floor  metrics=count,mean:n_chairs,max:area_numeric   (/aggregate)
+
+Column names match case-insensitively with "_" for spaces
+(main_entrance_distance). Endpoints: GET /classrooms, GET /aggregate,
+GET /columns, GET /status, POST /reload.
+
+Results are cached until the data changes. The file is checked at most once
+per --check-interval seconds; when it has changed, only the rows that differ
+(by a hash of their cells, see incremental.row_keys) are deleted/inserted.
+"""
+import argparse
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from data_cache import load_cleaned
+from incremental import row_keys
+from schema import BOOLEAN_COLS, CATEGORY_COLS
+
+TABLE = "classrooms"
+INDEXED_COLUMNS = ["classroom", "floor_number", "n_chairs", "area_numeric"] + BOOLEAN_COLS + CATEGORY_COLS
+OPERATORS = {"eq": "=", "ne": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<=", "in": "IN",
+             "contains": "LIKE"}
+METRICS = {"count": "COUNT", "sum": "SUM", "mean": "AVG", "avg": "AVG", "min": "MIN", "max": "MAX"}
+TRUE_WORDS = {"true", "yes", "1"}
+FALSE_WORDS = {"false", "no", "0"}
+
+CACHE_SIZE = 256
+CHECK_INTERVAL = 1.0
+MAX_LIMIT = 10_000
+
+
+def column_alias(name):
+    # "Main Entrance Distance" -> "main_entrance_distance"
+    return re.sub(r"[^0-9a-z]+", "_", str(name).lower()).strip("_")
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _sql_type(s):
+    kind = s.dtype.kind
+    if kind in "biu":
+        return "INTEGER"
+    if kind == "f":
+        return "REAL"
+    return "TEXT COLLATE NOCASE"
+
+
+def _rows(df, keys):
+    # Python values for SQLite: None for missing cells, booleans as 0/1
+    columns = [df[col].astype(object).where(df[col].notna(), None).tolist() for col in df.columns]
+    return zip(*columns, keys.tolist())
+
+
+class ClassroomQueries:
+
+    def __init__(self, path, check_interval=CHECK_INTERVAL, cache_size=CACHE_SIZE):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self.cache_size = cache_size
+        self.version = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.last_reload = {}
+        self._db = sqlite3.connect(":memory:", check_same_thread=False)
+        self._lock = threading.RLock()
+        self._cache = OrderedDict()
+        self._columns = []
+        self._kinds = {}
+        self._keys = np.array([], dtype=np.int64)
+        self._signature = None
+        self._checked = 0.0
+        self.reload(force=True)
+
+    # ------------------------------------
+    # Loading
+    # ------------------------------------
+
+    def _file_signature(self):
+        stat = self.path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _create_table(self, df):
+        self._db.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        columns = ", ".join(f"{_quote(col)} {_sql_type(df[col])}" for col in df.columns)
+        self._db.execute(f"CREATE TABLE {TABLE} ({columns}, row_key INTEGER)")
+        for col in [col for col in INDEXED_COLUMNS if col in df.columns] + ["row_key"]:
+            self._db.execute(f"CREATE INDEX {_quote('idx_' + column_alias(col))} ON {TABLE} ({_quote(col)})")
+        self._columns = list(df.columns)
+        self._kinds = {col: df[col].dtype.kind for col in df.columns}
+        self._keys = np.array([], dtype=np.int64)
+
+    def _insert(self, df, keys):
+        placeholders = ", ".join("?" * (len(df.columns) + 1))
+        self._db.executemany(f"INSERT INTO {TABLE} VALUES ({placeholders})", _rows(df, keys))
+
+    def reload(self, force=False):
+        # Re-read the file if it changed (checked at most every
+        # check_interval seconds unless forced); returns True on a reload
+        now = time.monotonic()
+        if not force and now - self._checked < self.check_interval:
+            return False
+        with self._lock:
+            self._checked = now
+            try:
+                signature = self._file_signature()
+                if signature == self._signature:
+                    return False
+                start = time.perf_counter()
+                df = load_cleaned(self.path)
+            except (OSError, ValueError) as error:
+                # Probably being replaced or still being written: keep the
+                # current data, retry later
+                if self._signature is None:
+                    raise
+                self.last_reload = {"error": str(error)}
+                return False
+            keys = row_keys(df).to_numpy().view(np.int64)
+
+            full = list(df.columns) != self._columns or \
+                any(df[col].dtype.kind != self._kinds[col] for col in df.columns)
+            if full:
+                self._create_table(df)
+                removed, added = np.array([], dtype=np.int64), np.ones(len(df), dtype=bool)
+            else:
+                removed = np.setdiff1d(self._keys, keys)
+                added = ~np.isin(keys, self._keys)
+            self._db.executemany(f"DELETE FROM {TABLE} WHERE row_key = ?", ((int(key),) for key in removed))
+            self._insert(df[added], keys[added])
+            self._db.execute("ANALYZE")
+            self._db.commit()
+
+            self._keys = keys
+            self._signature = signature
+            self.version += 1
+            self._cache.clear()
+            self.last_reload = {"rows": len(df), "removed": len(removed), "added": int(added.sum()),
+                                "full": full, "seconds": round(time.perf_counter() - start, 3)}
+            return True
+
+    # ------------------------------------
+    # Queries
+    # ------------------------------------
+
+    def column(self, name):
+        if name in self._columns:
+            return name
+        aliases = {column_alias(col): col for col in self._columns}
+        if column_alias(name) in aliases:
+            return aliases[column_alias(name)]
+        raise ValueError(f"unknown column '{name}'")
+
+    def _value(self, column, text):
+        kind = self._kinds[column]
+        text = str(text).strip()
+        if kind == "b":
+            if text.lower() in TRUE_WORDS:
+                return 1
+            if text.lower() in FALSE_WORDS:
+                return 0
+            raise ValueError(f"'{column}' takes true/false, not '{text}'")
+        if kind in "iuf":
+            try:
+                return float(text)
+            except ValueError:
+                raise ValueError(f"'{column}' takes a number, not '{text}'") from None
+        return text
+
+    def _where(self, filters):
+        # filters: {"column" or "column__op": value}; lists for __in
+        clauses, params = [], []
+        for key, value in sorted(filters.items()):
+            name, _, op = key.partition("__")
+            op = op or "eq"
+            if op not in OPERATORS:
+                raise ValueError(f"unknown operator '{op}' (choose from {', '.join(OPERATORS)})")
+            column = self.column(name)
+            if op == "in":
+                values = value.split(",") if isinstance(value, str) else list(value)
+                clauses.append(f"{_quote(column)} IN ({', '.join('?' * len(values))})")
+                params += [self._value(column, v) for v in values]
+            elif op == "contains":
+                # % and _ in the text are matched literally
+                clauses.append(f"{_quote(column)} LIKE ? ESCAPE '\\'")
+                params.append("%" + re.sub(r"([\\%_])", r"\\\1", str(value)) + "%")
+            elif value is None or (isinstance(value, str) and value.lower() in ("null", "none")):
+                clauses.append(f"{_quote(column)} IS {'NOT ' if op == 'ne' else ''}NULL")
+            else:
+                clauses.append(f"{_quote(column)} {OPERATORS[op]} ?")
+                params.append(self._value(column, value))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def _fetch(self, sql, params):
+        with self._lock:
+            cursor = self._db.execute(sql, params)
+            names = [d[0] for d in cursor.description]
+            rows = cursor.fetchall()
+        booleans = [i for i, name in enumerate(names) if self._kinds.get(name) == "b"]
+        records = []
+        for row in rows:
+            record = dict(zip(names, row))
+            for i in booleans:
+                if row[i] is not None:
+                    record[names[i]] = bool(row[i])
+            records.append(record)
+        return records
+
+    def _cached(self, key, compute):
+        self.reload()
+        key = (self.version,) + key
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return self._cache[key], True
+        result = compute()
+        with self._lock:
+            self.cache_misses += 1
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result, False
+
+    def query(self, filters=None, columns=None, order_by=None, limit=None):
+        # Matching rows as dicts; order_by "col" or "-col" (descending)
+        filters = dict(filters or {})
+        columns = [self.column(col) for col in columns] if columns else list(self._columns)
+        order_by = order_by or ("classroom" if "classroom" in self._columns else None)
+        limit = max(1, min(int(limit), MAX_LIMIT)) if limit else MAX_LIMIT
+
+        def compute():
+            where, params = self._where(filters)
+            sql = f"SELECT {', '.join(_quote(col) for col in columns)} FROM {TABLE}{where}"
+            if order_by:
+                sql += f" ORDER BY {_quote(self.column(order_by.lstrip('-')))}" + (" DESC" if order_by[0] == "-" else "")
+            count = self._fetch(f"SELECT COUNT(*) AS n FROM {TABLE}{where}", params)[0]["n"]
+            return {"count": count, "rows": self._fetch(sql + f" LIMIT {limit}", params)}
+
+        key = ("query", tuple(sorted((k, str(v)) for k, v in filters.items())), tuple(columns), order_by, limit)
+        return self._cached(key, compute)
+
+    def aggregate(self, group_by=None, metrics=("count",), filters=None):
+        # metrics: "count" or "<sum|mean|min|max>:<column>"
+        filters = dict(filters or {})
+        group_by = [self.column(col) for col in group_by or []]
+        selects = []
+        for metric in metrics:
+            func, _, name = metric.partition(":")
+            if func not in METRICS:
+                raise ValueError(f"unknown metric '{func}' (choose from {', '.join(METRICS)})")
+            if func == "count":
+                selects.append(("count", "COUNT(*)"))
+            else:
+                column = self.column(name)
+                selects.append((f"{func}:{column}", f"{METRICS[func]}({_quote(column)})"))
+
+        def compute():
+            where, params = self._where(filters)
+            fields = [_quote(col) for col in group_by] + [f"{expr} AS {_quote(label)}" for label, expr in selects]
+            sql = f"SELECT {', '.join(fields)} FROM {TABLE}{where}"
+            if group_by:
+                grouping = ", ".join(_quote(col) for col in group_by)
+                sql += f" GROUP BY {grouping} ORDER BY {grouping}"
+            return {"groups": self._fetch(sql, params)}
+
+        key = ("aggregate", tuple(group_by), tuple(metrics), tuple(sorted((k, str(v)) for k, v in filters.items())))
+        return self._cached(key, compute)
+
+    def describe_columns(self):
+        indexed = set(INDEXED_COLUMNS)
+        types = {"b": "boolean", "i": "integer", "u": "integer", "f": "number"}
+        return [{"name": col, "alias": column_alias(col), "type": types.get(self._kinds[col], "text"),
+                 "indexed": col in indexed} for col in self._columns]
+
+    def status(self):
+        return {"file": str(self.path), "rows": len(self._keys), "version": self.version,
+                "last_reload": self.last_reload, "cache_entries": len(self._cache),
+                "cache_hits": self.cache_hits, "cache_misses": self.cache_misses}
+
+
+# ====================================
+# HTTP service
+# ====================================
+
+def parse_query(query_string):
+    # Query string -> (filters, options); the option names are not columns
+    params = dict(parse_qsl(query_string, keep_blank_values=True))
+    options = {name: params.pop(name) for name in ("columns", "order", "limit", "group_by", "metrics")
+               if name in params}
+    for name in ("columns", "group_by", "metrics"):
+        if name in options:
+            options[name] = [part.strip() for part in options[name].split(",") if part.strip()]
+    return params, options
+
+
+def answer(queries, path, query_string):
+    # (status, JSON-ready body) for one request path
+    filters, options = parse_query(query_string)
+    start = time.perf_counter()
+    if path == "/classrooms":
+        result, cached = queries.query(filters, options.get("columns"), options.get("order"), options.get("limit"))
+    elif path == "/aggregate":
+        result, cached = queries.aggregate(options.get("group_by"), options.get("metrics", ["count"]), filters)
+    elif path == "/columns":
+        return 200, {"columns": queries.describe_columns()}
+    elif path == "/status":
+        return 200, queries.status()
+    else:
+        return 404, {"error": f"unknown endpoint '{path}'"}
+    return 200, {**result, "cached": cached, "ms": round((time.perf_counter() - start) * 1000, 3)}
+
+
+def make_handler(queries):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def _send(self, status, body):
+            data = json.dumps(body, default=str).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            try:
+                self._send(*answer(queries, url.path.rstrip("/") or "/", url.query))
+            except ValueError as error:
+                self._send(400, {"error": str(error)})
+
+        def do_POST(self):
+            if urlsplit(self.path).path.rstrip("/") != "/reload":
+                self._send(404, {"error": "POST /reload only"})
+                return
+            reloaded = queries.reload(force=True)
+            self._send(200, {"reloaded": reloaded, **queries.status()})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve")
+    serve_parser.add_argument("file", nargs="?", default="cleaned_data.csv")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--check-interval", type=float, default=CHECK_INTERVAL,
+                              help="seconds between checks for a new cleaned file")
+    for name in ("query", "aggregate"):
+        command_parser = commands.add_parser(name)
+        command_parser.add_argument("query_string", nargs="?", default="")
+        command_parser.add_argument("--file", default="cleaned_data.csv")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    queries = ClassroomQueries(args.file, check_interval=getattr(args, "check_interval", CHECK_INTERVAL))
+    print(f"✅ Loaded {queries.last_reload['rows']} rows from '{args.file}' in {time.perf_counter() - start:.2f}s")
+
+    if args.command == "serve":
+        server = ThreadingHTTPServer((args.host, args.port), make_handler(queries))
+        print(f"🌐 Serving on http://{args.host}:{args.port}/classrooms (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+        return
+
+    try:
+        status, body = answer(queries, f"/{'classrooms' if args.command == 'query' else 'aggregate'}",
+                              args.query_string)
+    except ValueError as error:
+        parser.error(str(error))
+    records = body["rows"] if args.command == "query" else body["groups"]
+    print(pd.DataFrame(records).to_string(index=False) if records else "(no rows)")
+    if args.command == "query":
+        print(f"{body['count']} matching classrooms ({body['ms']:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
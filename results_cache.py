@@ -0,0 +1,255 @@
+"""Cache of the tables the charts and the report are drawn from.
+
+    python results_cache.py info                    # list cached results
+    python results_cache.py build cleaned_data.xlsx # compute them for a file
+    python results_cache.py clear                   # drop everything
+
+data_processing.py stores its derived tables here at the end of a run: the
+statistics table, value counts per column, the correlation matrix, the
+floor averages, the n_chairs histogram and the first rows. Each entry is
+keyed by a hash of the cleaned frame. The cleaned files written in that run
+point to the entry (by size and mtime), so Visualization.py, vis2.py, vis3.py
+and charts.py load a few small tables instead of re-reading the cleaned data.
+For a file without an entry, the data is read once, the tables are
+computed and stored, and later runs use them. Only the MAX_ENTRIES most
+recently used entries are kept.
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+from charts import histogram_data, value_counts_table
+from column_stats import describe
+from correlation import cached_correlation
+from schema import NUMERICAL_COLS
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+CACHE_DIR = Path(os.environ.get("CLASSROOM_RESULTS_DIR", ".cache/results"))
+CACHE_VERSION = 2
+MAX_ENTRIES = 8
+# Value counts keep the most frequent values only (free-text columns such as
+# classroom codes have one per row)
+MAX_COUNTS = 1000
+HEAD_ROWS = 5
+
+_SOURCES = "sources.json"
+_SOURCES_LOCK = threading.Lock()
+
+
+def data_key(df):
+    # Hash of the values, column names and dtypes of a frame
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([CACHE_VERSION, [[str(col), str(df[col].dtype)] for col in df.columns]]).encode())
+    for col in df.columns:
+        s = df[col]
+        if s.dtype.kind in "biufcmM":
+            digest.update(s.to_numpy().tobytes())
+        else:
+            digest.update(pd.util.hash_pandas_object(s, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def analysis_columns(df):
+    return [col for col in NUMERICAL_COLS + ["area_numeric"] if col in df.columns]
+
+
+def missing_text_as_na(df):
+    # The cleaning leaves missing text as the string "nan" ("nan" floors),
+    # which the cleaned files store as an empty cell. Read as missing here so
+    # the tables are the same whether they come from the pipeline's frame or
+    # from the file. Returns (frame, columns that had "nan").
+    changed = []
+    for col in df.select_dtypes(include=["object", "category"]).columns:
+        literal = (df[col].astype(object) == "nan").to_numpy()
+        if literal.any():
+            if not changed:
+                df = df.copy(deep=False)
+            df[col] = df[col].mask(literal)
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].cat.remove_unused_categories()
+            changed.append(col)
+    return df, changed
+
+
+def derive_results(df, central_tendency=None, categorical_stats=None):
+    # Every table the charts and the report need, from the cleaned frame.
+    # Tables data_processing.py already has are passed in, not recomputed
+    # (except value counts that counted "nan").
+    df, changed = missing_text_as_na(df)
+    columns = analysis_columns(df)
+    categorical = list(df.select_dtypes(include=["object", "category"]).columns)
+    passed = {col: counts for col, counts in (categorical_stats or {}).items() if col not in changed}
+    value_counts, distinct = {}, {}
+    for col in categorical + list(df.select_dtypes(include=["bool"]).columns):
+        value_counts[col] = passed[col] if col in passed else value_counts_table(df[col], top=MAX_COUNTS)
+        distinct[col] = int(df[col].nunique())
+
+    results = {
+        "rows": len(df),
+        "dtypes": {str(col): str(dtype) for col, dtype in df.dtypes.items()},
+        "head": df.head(HEAD_ROWS),
+        "central_tendency": central_tendency if central_tendency is not None else describe(df, columns),
+        "categorical": categorical,
+        "value_counts": value_counts,
+        "distinct": distinct,
+        "correlation": cached_correlation(df),
+        "floor_means": df.groupby("floor", observed=True)[columns].mean() if "floor" in df.columns else None,
+        "n_chairs_histogram": histogram_data(df["n_chairs"]) if "n_chairs" in df.columns else None,
+    }
+    return results
+
+
+# ------------------------------------
+# Entries
+# ------------------------------------
+
+def _entry_path(key, cache_dir):
+    return Path(cache_dir or CACHE_DIR) / f"{key}.pickle"
+
+
+def read_results(key, cache_dir=None):
+    # The entry for `key`, or None; a hit counts as a use for the eviction
+    path = _entry_path(key, cache_dir)
+    try:
+        with open(path, "rb") as f:
+            results = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    os.utime(path)
+    return results
+
+
+def save_results(key, results, cache_dir=None, max_entries=MAX_ENTRIES):
+    # Store `results` under `key` (data_key() of the frame), then drop the
+    # least recently used entries beyond `max_entries`
+    path = _entry_path(key, cache_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}-{threading.get_ident()}.tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(results, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    evict(max_entries, cache_dir)
+
+
+def evict(max_entries=MAX_ENTRIES, cache_dir=None):
+    entries = sorted(Path(cache_dir or CACHE_DIR).glob("*.pickle"), key=lambda p: p.stat().st_mtime_ns, reverse=True)
+    for path in entries[max_entries:]:
+        path.unlink(missing_ok=True)
+    return len(entries[max_entries:])
+
+
+# ------------------------------------
+# Files -> entries
+# ------------------------------------
+
+def _read_sources(cache_dir):
+    try:
+        with open(Path(cache_dir or CACHE_DIR) / _SOURCES) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+@contextmanager
+def _sources_locked(cache_dir):
+    # One update of sources.json at a time: across threads, and across
+    # processes (batch workers, concurrent runs) where fcntl is available
+    directory = Path(cache_dir or CACHE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    with _SOURCES_LOCK, open(directory / "sources.lock", "a") as handle:
+        if HAS_FCNTL:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        yield
+
+
+def link_sources(paths, key, cache_dir=None):
+    # Record that the files in `paths` hold the data of entry `key`
+    with _sources_locked(cache_dir):
+        sources = _read_sources(cache_dir)
+        for path in paths:
+            if Path(path).exists():
+                stat = os.stat(path)
+                sources[str(Path(path).resolve())] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "key": key}
+        # Files whose entry was evicted no longer need a link
+        sources = {path: link for path, link in sources.items() if _entry_path(link["key"], cache_dir).exists()}
+        index = Path(cache_dir or CACHE_DIR) / _SOURCES
+        tmp = index.with_suffix(f".{os.getpid()}-{threading.get_ident()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(sources, f, indent=1)
+        os.replace(tmp, index)
+
+
+def load_results(path="cleaned_data.xlsx", cache_dir=None, verbose=False):
+    # The derived tables of a cleaned file: from the cache while the file is
+    # unchanged, otherwise computed from the file (and cached)
+    start = time.perf_counter()
+    link = _read_sources(cache_dir).get(str(Path(path).resolve()))
+    if link:
+        stat = os.stat(path)
+        if link["size"] == stat.st_size and link["mtime_ns"] == stat.st_mtime_ns:
+            results = read_results(link["key"], cache_dir)
+            if results is not None:
+                if verbose:
+                    print(f"⚡ Loaded the tables for '{path}' from cache in {time.perf_counter() - start:.3f}s")
+                return results
+
+    from data_cache import load_cleaned
+    from dtypes import optimize_dtypes
+
+    # Categoricals / small ints make the counts cheaper (see dtypes.py)
+    df = optimize_dtypes(load_cleaned(path))
+    key = data_key(df)
+    results = read_results(key, cache_dir)
+    if results is None:
+        results = derive_results(df)
+        save_results(key, results, cache_dir)
+    link_sources([path], key, cache_dir)
+    if verbose:
+        print(f"📥 Computed the tables for '{path}' in {time.perf_counter() - start:.3f}s and cached them")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cache-dir", default=None)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("info")
+    commands.add_parser("clear")
+    build_parser = commands.add_parser("build")
+    build_parser.add_argument("file")
+    args = parser.parse_args()
+
+    cache_dir = Path(args.cache_dir or CACHE_DIR)
+    if args.command == "info":
+        files = {}
+        for path, link in _read_sources(cache_dir).items():
+            files.setdefault(link["key"], []).append(path)
+        entries = sorted(cache_dir.glob("*.pickle"), key=lambda p: p.stat().st_mtime_ns, reverse=True)
+        for entry in entries:
+            used = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.stat().st_mtime))
+            print(f"{entry.stem} ({entry.stat().st_size / 1e3:.1f} kB, used {used}): "
+                  f"{', '.join(files.get(entry.stem, [])) or 'no files'}")
+    elif args.command == "clear":
+        removed = evict(0, cache_dir)
+        (cache_dir / _SOURCES).unlink(missing_ok=True)
+        print(f"Removed {removed} cache entries")
+    elif args.command == "build":
+        results = load_results(args.file, cache_dir, verbose=True)
+        print(f"✅ {results['rows']} rows, {len(results['value_counts'])} value count tables")
+
+
+if __name__ == "__main__":
+    main()
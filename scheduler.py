@@ -0,0 +1,122 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# ====================================
+# Stage scheduler
+# ====================================
+#
+# A StageGraph holds the stages of a pipeline and what each one needs:
+#
+#     graph = StageGraph()
+#     graph.add("load", load_data)
+#     graph.add("clean", clean_data, after=["load"])      # clean_data(<result of load>)
+#     graph.add("stats", central_tendency_table, after=["clean"])
+#     graph.add("report", write_report, after=["clean", "stats"])
+#     results = graph.run(workers=4)                       # {stage: result}
+#
+# A stage is called with the results of the stages it comes after, in that
+# order, as soon as they are all done. Stages that do not depend on each
+# other run at the same time in a thread pool - file writes, chart rendering
+# and most pandas/NumPy work release the GIL. Stages can only come after
+# stages added before them, so the graph never has a cycle. With workers <= 1
+# the stages run one by one in the order they were added, in the calling
+# thread, exactly like a plain script.
+#
+# run() keeps a trace of the actual schedule: when each stage became ready,
+# started and ended, and on which thread. format_trace() prints it as a
+# timeline; write_chrome_trace() saves it for chrome://tracing or Perfetto.
+# A stage that waits long after becoming ready means too few workers; a
+# long chain of stages on one thread is the critical path.
+
+
+class StageGraph:
+
+    def __init__(self):
+        self.stages = {}
+        self.trace = []
+
+    def add(self, name, func, after=()):
+        if name in self.stages:
+            raise ValueError(f"Stage '{name}' added twice")
+        missing = [dep for dep in after if dep not in self.stages]
+        if missing:
+            raise ValueError(f"Stage '{name}' comes after unknown stage(s): {', '.join(missing)}")
+        self.stages[name] = (func, list(after))
+
+    def _call(self, name, results, ready, start):
+        func, after = self.stages[name]
+        started = time.perf_counter()
+        result = func(*[results[dep] for dep in after])
+        self.trace.append({"stage": name, "thread": threading.current_thread().name, "after": after,
+                           "ready_s": ready - start, "start_s": started - start,
+                           "end_s": time.perf_counter() - start})
+        return result
+
+    def run(self, workers=None):
+        # Run every stage with `workers` threads (default: one per core) and
+        # return {stage: result}. The first failure stops the run: stages
+        # already running finish, nothing new starts and the error is raised.
+        workers = (os.cpu_count() or 1) if workers is None else workers
+        results, self.trace = {}, []
+        start = time.perf_counter()
+        if workers <= 1:
+            for name in self.stages:
+                results[name] = self._call(name, results, time.perf_counter(), start)
+            return results
+
+        waiting = {name: set(after) for name, (_, after) in self.stages.items()}
+        running = {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stage") as pool:
+            try:
+                while waiting or running:
+                    for name in [name for name, deps in waiting.items() if not deps]:
+                        del waiting[name]
+                        future = pool.submit(self._call, name, results, time.perf_counter(), start)
+                        running[future] = name
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        results[name] = future.result()
+                        for deps in waiting.values():
+                            deps.discard(name)
+            except BaseException:
+                pool.shutdown(wait=True, cancel_futures=True)
+                raise
+        self.trace.sort(key=lambda entry: entry["start_s"])
+        return results
+
+
+# ------------------------------------
+# Schedule trace
+# ------------------------------------
+
+def format_trace(trace, width=40):
+    # One line per stage: start/end (s from the start of the run), time spent
+    # ready but waiting for a worker, thread, and a bar on a common time axis
+    total = max((entry["end_s"] for entry in trace), default=0) or 1e-9
+    lines = [f"  {'stage':<34} {'start s':>8} {'end s':>8} {'wait s':>7}  {'thread':<10} timeline"]
+    for entry in sorted(trace, key=lambda entry: entry["start_s"]):
+        first = min(width - 1, int(entry["start_s"] / total * width))
+        last = max(first + 1, int(round(entry["end_s"] / total * width)))
+        bar = " " * first + "#" * (last - first)
+        lines.append(f"  {entry['stage']:<34} {entry['start_s']:8.3f} {entry['end_s']:8.3f} "
+                     f"{entry['start_s'] - entry['ready_s']:7.3f}  {entry['thread']:<10} |{bar:<{width}}|")
+    return "\n".join(lines)
+
+
+def write_chrome_trace(trace, path):
+    # Trace Event Format (chrome://tracing, https://ui.perfetto.dev): one row
+    # per thread, one box per stage
+    threads = {name: tid for tid, name in enumerate(dict.fromkeys(entry["thread"] for entry in trace))}
+    events = [{"name": "thread_name", "ph": "M", "pid": 0, "tid": tid, "args": {"name": name}}
+              for name, tid in threads.items()]
+    for entry in trace:
+        events.append({"name": entry["stage"], "ph": "X", "pid": 0, "tid": threads[entry["thread"]],
+                       "ts": entry["start_s"] * 1e6, "dur": (entry["end_s"] - entry["start_s"]) * 1e6,
+                       "args": {"after": entry["after"], "waited_s": entry["start_s"] - entry["ready_s"]}})
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return path
@@ -0,0 +1,25 @@
+# Column groups shared by the cleaning, consolidation and reporting steps.
+# Keep these in one place so every stage agrees on what a column "is".
+
+# Numerical columns used for statistics and duplicate handling
+NUMERICAL_COLS = ["n_chairs", "n_aircon", "n_windows", "Lighting", "socket", "Nbr of cameras", "Nbr of doors"]
+
+# Count-based columns that are stored as integers
+NUMERIC_INT_COLS = ["n_chairs", "Nbr of cameras", "Nbr of doors", "n_aircon", "n_windows", "socket"]
+
+# yes/no style columns converted to booleans
+BOOLEAN_COLS = ["has_blinds", "has_smartboard", "has_computer", "Exit banner"]
+
+# Free-text categorical columns filled with their mode
+CATEGORICAL_COLS = ["Cleaning Service", "WiFi Connection", "Seats disposition",
+                    "Interior Design", "maintenance", "Cyberpower", "Main Entrance Distance", "Noise Level"]
+
+# Personal identifiers - nulled out on consolidated duplicate records
+EXCLUDE_COLUMNS = ["name", "surname", "ID", "student_id", "person_id", "full_name"]
+
+# Low-cardinality text columns that can be carried as pandas categoricals
+CATEGORY_COLS = ["floor", "Noise Level", "WiFi Connection", "Main Entrance Distance", "Cleaning Service",
+                 "Seats disposition", "Interior Design", "maintenance", "Cyberpower", "Usage Timing"]
+
+# Measurements checked together for unusual rooms (see outliers.py)
+OUTLIER_COLS = ["n_chairs", "area_numeric", "socket", "Lighting", "n_windows"]
@@ -0,0 +1,459 @@
+"""Chunked cleaning for classroom exports that do not fit in memory.
+
+    python streaming.py "Data Science Classroom Data.xlsx" --sheet "Classroom Data"
+    python streaming.py export.csv --chunk-size 20000 --output cleaned_data.csv
+
+clean_streaming() writes the same cleaned_data.csv as clean() followed by
+consolidate_duplicates() on the whole sheet, while holding only about one
+chunk of rows in memory at a time:
+
+  pass 1   read the file in chunks (openpyxl read-only mode / csv reader),
+           note which kinds of values every column holds and spool the rows
+  pass 2   parse each chunk the way read_excel/read_csv parse the whole file,
+           run the row-local rules and count the values each global rule
+           (median/mode fills, the area step) will see
+  between  work out every fill value and the area statistics from those
+           counts, and cut the sorted classroom codes into ranges
+  pass 3   run the remaining rules with the fixed values and append each row
+           to the spool of its classroom range
+  finally  consolidate duplicates and sort one range at a time, appending to
+           the output file
+
+Fill values are exact, not estimates: they come from value counts, which stay
+small because survey columns hold few distinct values. The classroom counts
+grow with the number of distinct classrooms, not with the number of rows.
+"""
+import argparse
+import csv
+import io
+import pickle
+import re
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+from cleaning import PIPELINE, area_numeric, clean, is_global, standardize_area, with_fill_value
+from column_stats import ColumnStats, stats_table, weighted_median, weighted_mode
+from consolidation import build_aggregation_spec, consolidate_duplicates
+from schema import NUMERICAL_COLS
+
+CHUNK_SIZE = 50_000
+
+# pandas' default NA strings and boolean spellings (read_excel/read_csv)
+NA_STRINGS = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+              "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"}
+BOOL_STRINGS = {"True", "TRUE", "true", "False", "FALSE", "false"}
+_INT_TEXT = re.compile(r"[+-]?\d+")
+
+
+# ------------------------------------
+# Reading
+# ------------------------------------
+
+def _excel_value(cell):
+    # Same conversion as pandas' openpyxl reader
+    value = cell.value
+    if value is None:
+        return ""
+    if cell.data_type == "e":
+        return np.nan
+    if cell.data_type == "n":
+        as_int = int(value)
+        return as_int if as_int == value else float(value)
+    return value
+
+
+def _excel_rows(path, sheet_name):
+    from openpyxl import load_workbook
+
+    book = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = book[sheet_name] if isinstance(sheet_name, str) else book.worksheets[sheet_name]
+        sheet.reset_dimensions()
+        blank = 0
+        for row in sheet.rows:
+            values = [_excel_value(cell) for cell in row]
+            while values and values[-1] == "":
+                values.pop()
+            if not values:
+                # Blank rows are kept, except at the end of the sheet
+                blank += 1
+                continue
+            for _ in range(blank):
+                yield []
+            blank = 0
+            yield values
+    finally:
+        book.close()
+
+
+def _csv_rows(path):
+    with open(path, newline="") as f:
+        for values in csv.reader(f):
+            if values:
+                yield values
+
+
+def _parse_excel(rows):
+    return TextParser(rows, header=0, skip_blank_lines=False).read()
+
+
+def _parse_csv(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    return pd.read_csv(buffer)
+
+
+def _value_kinds(values, kinds):
+    # Record one example of every kind of value in a column. The parser picks
+    # a column's type from the kinds of values it holds, not from how often
+    # each occurs, so parsing a chunk together with these examples gives it
+    # the type the whole column would get.
+    strings = set()
+    for value in values:
+        kind = value.__class__
+        if kind is str:
+            strings.add(value)
+        elif kind is float and value != value:
+            kinds.setdefault("na", value)
+        elif kind is int and not -2**63 <= value < 2**63:
+            kinds.setdefault("bigint", value)
+        else:
+            kinds.setdefault(kind, value)
+    for value in strings:
+        if value in NA_STRINGS:
+            kind = "na"
+        elif value in BOOL_STRINGS:
+            kind = "text:bool"
+        else:
+            stripped = value.strip()
+            try:
+                float(stripped)
+                kind = "text:int" if _INT_TEXT.fullmatch(stripped) else "text:float"
+            except ValueError:
+                kind = "text"
+            if stripped != value:
+                kind += ":padded"
+        kinds.setdefault(kind, value)
+    return kinds
+
+
+def _example_rows(kinds, width):
+    # Rows that contain every recorded kind of value for every column
+    examples = [list(kinds.get(i, {}).values()) or [""] for i in range(width)]
+    n_rows = max(len(values) for values in examples)
+    return [[values[j % len(values)] for values in examples] for j in range(n_rows)]
+
+
+def _chunks(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ------------------------------------
+# Spooling
+# ------------------------------------
+
+def _dump(path, obj):
+    with open(path, "ab") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load_all(path):
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def add_counts(total, counts):
+    # Running value counts; NaN is counted as a value of its own. Negative
+    # counts remove values (values left with a zero count are dropped).
+    if total is None:
+        return counts
+    levels = list(range(counts.index.nlevels))
+    total = pd.concat([total, counts]).groupby(level=levels, dropna=False, sort=False).sum()
+    return total[total != 0]
+
+
+# ------------------------------------
+# Planning
+# ------------------------------------
+
+def fill_value(operation, values, weights):
+    kind, default = operation.rule
+    if kind == "fill_median":
+        return weighted_median(values, weights)
+    return weighted_mode(values, weights, default)
+
+
+def split_pipeline(pipeline=PIPELINE):
+    # (row_local, deferred) operations. An operation can run chunk by chunk
+    # in pass 2 when it is row-local and no global step has touched its
+    # column yet; everything else waits for pass 3.
+    row_local, deferred = [], []
+    touched = set()
+    for operation in pipeline:
+        kind = operation.rule.kind
+        if kind == "frame":
+            if operation.func is not standardize_area:
+                raise ValueError(f"{operation.label} cannot be streamed")
+            deferred.append(operation)
+            touched.update(("area", "area_numeric"))
+        elif kind == "row_frame":
+            (deferred if deferred else row_local).append(operation)
+        elif is_global(operation) or operation.column in touched:
+            deferred.append(operation)
+            touched.add(operation.column)
+        else:
+            row_local.append(operation)
+    return row_local, deferred
+
+
+def replay(operations, frame, weights, fills):
+    # Run `operations` on a frame of distinct values. Fills use the value
+    # already in `fills`, or work it out from the weighted values first.
+    for operation in operations:
+        if operation.column not in frame.columns:
+            continue
+        if is_global(operation):
+            if operation not in fills:
+                fills[operation] = fill_value(operation, frame[operation.column], weights)
+            operation = with_fill_value(operation, fills[operation])
+        frame = operation.func(frame)
+    return frame
+
+
+def area_statistics(pairs, chairs_operations, fills):
+    # standardize_area()'s statistics from the counts of (raw area, n_chairs)
+    frame = pairs.index.to_frame(index=False)
+    frame = replay(chairs_operations, frame, pairs.to_numpy(), fills)
+    area = area_numeric(frame["area"])
+    median_area = weighted_median(area, pairs)
+    area = area.fillna(median_area)
+    return {
+        "median_area": median_area,
+        "median_ratio": weighted_median(frame["n_chairs"] / area, pairs),
+    }
+
+
+def resolve_global_steps(deferred, counts, pairs):
+    # Fill values and area statistics from value counts. Returns the deferred
+    # operations with those values fixed, the fills, the dtype every counted
+    # column ends up with, and the area statistics.
+    fills, dtypes, stats = {}, {}, None
+    for column, column_counts in counts.items():
+        frame = pd.DataFrame({column: column_counts.index.to_numpy(dtype=object)})
+        operations = [op for op in deferred if op.column == column]
+        frame = replay(operations, frame.infer_objects(), column_counts.to_numpy(), fills)
+        dtypes[column] = frame[column].dtype
+    final_operations = []
+    for i, operation in enumerate(deferred):
+        if operation.func is standardize_area:
+            if pairs is not None:
+                chairs = [op for op in deferred[:i] if op.column == "n_chairs"]
+                stats = area_statistics(pairs, chairs, fills)
+                operation = operation._replace(func=lambda df, stats=stats: standardize_area(df, stats))
+        elif is_global(operation) and operation in fills:
+            operation = with_fill_value(operation, fills[operation])
+        final_operations.append(operation)
+    return final_operations, fills, dtypes, stats
+
+
+def _key_ranges(key_counts, chunk_size):
+    # First key of every range of sorted keys holding about chunk_size rows
+    # (all rows of one key always land in the same range)
+    bounds, rows = [], 0
+    for key, count in sorted(key_counts.items()):
+        if rows >= chunk_size:
+            bounds.append(key)
+            rows = 0
+        rows += count
+    return np.array(bounds, dtype=object)
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# ------------------------------------
+# Streaming clean
+# ------------------------------------
+
+def clean_streaming(path, output_path="cleaned_data.csv", sheet_name=0, chunk_size=CHUNK_SIZE,
+                    duplicates_path="duplicate_entries.csv", key="classroom", pipeline=PIPELINE,
+                    stats_path=None, stats_columns=None, workdir=None, verbose=True):
+    # Clean (and consolidate) a .xlsx or .csv file chunk by chunk into a CSV
+    # file. With stats_path, the central-tendency table of stats_columns
+    # (default: NUMERICAL_COLS + area_numeric) is merged from per-range
+    # summaries and saved there. Returns a summary with row counts, pass
+    # timings and peak RSS.
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        rows, parse = _csv_rows(path), _parse_csv
+    else:
+        rows, parse = _excel_rows(path, sheet_name), _parse_excel
+    row_local, deferred = split_pipeline(pipeline)
+    summary = {"rows": 0, "chunks": 0, "duplicate_keys": 0, "seconds": {}}
+
+    with tempfile.TemporaryDirectory(prefix="classroom-stream-", dir=workdir) as tmp:
+        tmp = Path(tmp)
+        log = print if verbose else (lambda *args: None)
+
+        # Pass 1: raw rows and the kinds of values in every column
+        start = time.perf_counter()
+        header = next(rows, None)
+        if header is None:
+            raise ValueError(f"'{path}' is empty")
+        kinds, width = {}, len(header)
+        for chunk in _chunks(rows, chunk_size):
+            width = max(width, max(len(row) for row in chunk))
+            for i, values in enumerate(zip(*[row + [""] * (width - len(row)) for row in chunk])):
+                _value_kinds(values, kinds.setdefault(i, {}))
+            _dump(tmp / "raw.pkl", chunk)
+            summary["rows"] += len(chunk)
+            summary["chunks"] += 1
+        examples = _example_rows(kinds, width)
+        header = header + [""] * (width - len(header))
+        summary["seconds"]["read"] = time.perf_counter() - start
+        log(f"📥 Pass 1: read {summary['rows']} rows in {summary['chunks']} chunks")
+
+        # Pass 2: parse, row-local rules, value counts for the global steps
+        start = time.perf_counter()
+        fill_columns = []
+        for operation in deferred:
+            if is_global(operation) and operation.column and operation.column not in fill_columns:
+                fill_columns.append(operation.column)
+        counts, pairs, key_counts, offset = {}, None, None, 0
+        columns = None
+        for chunk in _load_all(tmp / "raw.pkl") if summary["rows"] else []:
+            padded = [row + [""] * (width - len(row)) for row in chunk]
+            df = parse([header] + padded + examples).iloc[:len(chunk)]
+            df.index = pd.RangeIndex(offset, offset + len(df))
+            offset += len(df)
+            df = clean(df, pipeline=row_local)
+            columns = df.columns
+            for column in fill_columns:
+                if column in df.columns:
+                    counts[column] = add_counts(counts.get(column), df[column].value_counts(dropna=False, sort=False))
+            if {"area", "n_chairs"} <= set(df.columns):
+                pairs = add_counts(pairs, df.groupby(["area", "n_chairs"], dropna=False, sort=False).size())
+            if key in df.columns:
+                key_counts = add_counts(key_counts, df[key].value_counts(dropna=False, sort=False))
+            _dump(tmp / "local.pkl", df)
+        summary["seconds"]["row_local"] = time.perf_counter() - start
+
+        # Fill values, area statistics and classroom ranges
+        start = time.perf_counter()
+        final_operations, _, dtypes, _ = resolve_global_steps(deferred, counts, pairs)
+
+        duplicate_keys = set()
+        bounds = np.array([], dtype=object)
+        if key_counts is not None:
+            key_counts = key_counts.to_dict()
+            duplicate_keys = {k for k, count in key_counts.items() if count > 1}
+            bounds = _key_ranges(key_counts, chunk_size)
+            del key_counts
+        summary["duplicate_keys"] = len(duplicate_keys)
+        summary["seconds"]["statistics"] = time.perf_counter() - start
+
+        # Pass 3: global steps with fixed values, rows spooled by key range
+        start = time.perf_counter()
+        n_ranges = len(bounds) + 1
+        wrote_duplicates = False
+        cleaned_columns = header if columns is None else columns
+        for df in _load_all(tmp / "local.pkl") if columns is not None else []:
+            df = clean(df, pipeline=final_operations)
+            for column, dtype in dtypes.items():
+                if column in df.columns and df[column].dtype != dtype:
+                    df[column] = df[column].astype(dtype)
+            cleaned_columns = df.columns
+            if key not in df.columns:
+                _dump(tmp / "range0.pkl", df)
+                continue
+            is_duplicate = df[key].isin(duplicate_keys)
+            if duplicates_path and is_duplicate.any():
+                df[is_duplicate].to_csv(duplicates_path, index=False, mode="a" if wrote_duplicates else "w",
+                                        header=not wrote_duplicates)
+                wrote_duplicates = True
+            ranges = np.searchsorted(bounds, df[key].to_numpy(dtype=object), side="right")
+            for r in np.unique(ranges):
+                _dump(tmp / f"range{r}.pkl", df[ranges == r])
+        if duplicates_path and not wrote_duplicates:
+            # Written on every run, like the in-memory pipeline, so an older
+            # run's duplicates never pass for this one's
+            pd.DataFrame(columns=cleaned_columns).to_csv(duplicates_path, index=False)
+        summary["seconds"]["global"] = time.perf_counter() - start
+
+        # One key range at a time: consolidate, sort, append
+        start = time.perf_counter()
+        spec = None
+        wrote_output = False
+        stats = {}
+        stats_columns = stats_columns or NUMERICAL_COLS + ["area_numeric"]
+        for r in range(n_ranges):
+            part_path = tmp / f"range{r}.pkl"
+            if not part_path.exists():
+                continue
+            part = pd.concat(_load_all(part_path))
+            part_path.unlink()
+            if key in part.columns:
+                spec = spec or build_aggregation_spec(part.columns, key=key)
+                part, _ = consolidate_duplicates(part, key=key, spec=spec)
+                if duplicate_keys:
+                    # Consolidated rows carry averages, so the whole column is float
+                    for column, rule in spec.items():
+                        if rule == "round_mean" and part[column].dtype.kind in "iub":
+                            part[column] = part[column].astype("float64")
+            part.to_csv(output_path, index=False, mode="a" if wrote_output else "w", header=not wrote_output)
+            wrote_output = True
+            if stats_path:
+                for column in stats_columns:
+                    if column in part.columns:
+                        stats.setdefault(column, ColumnStats()).update(part[column])
+        if not wrote_output:
+            pd.DataFrame(columns=header if columns is None else columns).to_csv(output_path, index=False)
+        if stats_path:
+            stats_table(stats).to_excel(stats_path)
+        summary["seconds"]["consolidate"] = time.perf_counter() - start
+
+    summary["peak_rss_mb"] = peak_rss_mb()
+    log(f"✅ Pass 2/3: {summary['duplicate_keys']} classrooms with duplicates, "
+        f"cleaned data written to '{output_path}'")
+    log("⏱️ " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in summary["seconds"].items())
+        + f" - peak RSS {summary['peak_rss_mb']:.0f} MB")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", help=".xlsx or .csv export")
+    parser.add_argument("--sheet", default="Classroom Data", help="sheet name (Excel only)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--output", default="cleaned_data.csv")
+    parser.add_argument("--duplicates", default="duplicate_entries.csv",
+                        help="where to save the original rows of duplicated classrooms")
+    parser.add_argument("--stats", default=None, metavar="XLSX",
+                        help="also save the central-tendency table, e.g. numerical_statistics.xlsx")
+    parser.add_argument("--workdir", default=None, help="directory for the temporary spool files")
+    args = parser.parse_args()
+    clean_streaming(args.file, args.output, sheet_name=args.sheet, chunk_size=args.chunk_size,
+                    duplicates_path=args.duplicates, stats_path=args.stats, workdir=args.workdir)
+
+
+if __name__ == "__main__":
+    main()
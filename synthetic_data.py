@@ -0,0 +1,204 @@
+"""Synthetic classroom exports for benchmarks and tests of scale.
+
+    python synthetic_data.py --rows 100000                        # synthetic_classrooms.xlsx
+    python synthetic_data.py --rows 2000000 --output big.csv --duplicate-rate 0.3 --seed 7
+    python synthetic_data.py --sections 3000 --output sections.csv   # course sections for allocation.py
+
+The rows have the raw survey's columns (including its typos: "Ligting",
+"Uage Timing", "Interior Deign", "classroom " with a trailing space) and the
+same kinds of messy values the cleaning rules handle: numbers written as text
+("2 (just for hot weather)", "6 windows", "10 lamps"), spelled-out floors
+("2 nd", "third", "5. floor"), misspelled categories ("non exising"),
+yes/no/TRUE/maybe booleans, areas in mixed units, tiny areas in rooms with
+more than 50 chairs and empty cells at about the rates of the real export.
+A share of the rows (--duplicate-rate) repeat a classroom that already
+occurs, often spelled differently ("B-630", "b 630", "B630").
+
+The same seed always gives the same file. Workbooks hold at most 1,048,575
+rows; use a .csv output beyond that. --sections writes course sections
+(size, weekly meetings, equipment needs) in the input format of
+allocation.py instead.
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import xlsxwriter  # noqa: F401
+    EXCEL_ENGINE = "xlsxwriter"
+except ImportError:
+    EXCEL_ENGINE = "openpyxl"
+
+SHEET_NAME = "Classroom Data"
+EXCEL_MAX_ROWS = 1_048_575
+
+# Raw values of the free-text columns and the share of empty cells, as seen
+# in the survey export
+TEXT_COLUMNS = {
+    "floor": (["first", "second", "third", "1st", "2nd", "2 nd", "2nd floor", "3rd", "ground floor",
+               "Ground Floor ", "0", "-1", "1", "2", "4", "5. floor", "3-floor"], 0.08),
+    "has_blinds": (["NO", "No", "no", "YES", "Yes", "yes", "TRUE", "FALSE", "maybe"], 0.13),
+    "has_smartboard": ([True, False, "yes", "no"], 0.2),
+    "has_computer": (["Yes", "No", "True", "False"], 0.0),
+    "Exit banner": (["yes", "no"], 0.31),
+    "Cleaning service": (["daily", "weekly"], 0.33),
+    "wifi_connec": (["good", "Good ", "excellent", "poor", "low", "non existing", "non exising"], 0.12),
+    "Seats disposition": (["rows", "groups", "U shape"], 0.23),
+    "Interior Deign": (["old", "modern"], 0.34),
+    "maintenance": (["good", "bad"], 0.31),
+    "Cyberpower": (["yes", "no"], 0.36),
+    "m_entr_distance": (["short", "Medium", "long", "very short", "Very Short "], 0.15),
+    "Noise Level": (["high", "HIGH!", "Low noise", "moderate level", "quiet"], 0.17),
+    "Uage Timing": (["morning", "evening", "all day"], 0.0),
+    "name": (["ann", "bob"], 0.0),
+}
+
+# Column order of the export
+COLUMNS = ["classroom ", "floor", "n_chairs", "n_aircon", "n_windows", "Ligting", "socket", "Nbr of cameras",
+           "Nbr of doors", "area", "has_blinds", "has_smartboard", "has_computer", "Exit banner",
+           "Cleaning service", "wifi_connec", "Seats disposition", "Interior Deign", "maintenance", "Cyberpower",
+           "m_entr_distance", "Noise Level", "Uage Timing", "name"]
+
+# Weekly meeting patterns of course sections
+DAY_PATTERNS = [("Mon", "Wed"), ("Tue", "Thu"), ("Mon", "Wed", "Fri"), ("Mon",), ("Tue",), ("Wed",), ("Thu",),
+                ("Fri",)]
+START_TIMES = ["08:00", "10:00", "12:00", "14:00", "17:00", "19:00"]
+
+AREA_FORMATS = ["{:.0f}", "{:.0f} sqm", "{:.0f}m2", "{:.0f} square meters", "  {:.2f} SQM ", "{:.1f}"]
+
+
+def _pick(rng, values, n_rows, missing_rate=0.0):
+    # Random choice of raw values (any type), None for empty cells
+    values = np.array(values + [None], dtype=object)
+    index = rng.integers(0, len(values) - 1, n_rows)
+    index[rng.random(n_rows) < missing_rate] = len(values) - 1
+    return values[index]
+
+
+def _counts(rng, low, high, n_rows, missing_rate, text_rate=0.0, unit=None, variants=()):
+    # Integer counts as objects; some written as "<n> <unit>" or taken from
+    # `variants` (e.g. "2 (just for hot weather)"), some empty
+    values = rng.integers(low, high + 1, n_rows).astype(object)
+    if unit:
+        as_text = np.flatnonzero(rng.random(n_rows) < text_rate)
+        values[as_text] = [f"{v} {unit}" for v in values[as_text]]
+    if variants:
+        as_variant = np.flatnonzero(rng.random(n_rows) < text_rate)
+        values[as_variant] = np.array(variants, dtype=object)[rng.integers(0, len(variants), len(as_variant))]
+    values[rng.random(n_rows) < missing_rate] = None
+    return values
+
+
+def _classrooms(rng, n_rows, duplicate_rate):
+    # Codes like "B-630"; duplicate rows reuse an earlier classroom, often
+    # with another spelling of its code
+    n_rooms = max(1, n_rows - int(n_rows * duplicate_rate))
+    digits = max(3, len(str(n_rooms)) + 1)
+    numbers = rng.choice(np.arange(10 ** (digits - 1), 10 ** digits), n_rooms, replace=False)
+    blocks = np.array(list("ABCDE"))[rng.integers(0, 5, n_rooms)]
+    room = np.concatenate([np.arange(n_rooms), rng.integers(0, n_rooms, n_rows - n_rooms)])
+    room = room[rng.permutation(n_rows)]
+
+    separator = np.array(["-", " ", "", "-"])[rng.integers(0, 4, n_rows)]
+    separator[room < n_rooms // 2] = "-"
+    codes = np.char.add(np.char.add(blocks[room], separator), numbers[room].astype(str))
+    lower = rng.random(n_rows) < 0.1
+    codes[lower] = np.char.lower(codes[lower])
+    return codes.astype(object)
+
+
+def _areas(rng, n_chairs, n_rows, missing_rate=0.26, tiny_rate=0.02):
+    # Areas in mixed units; a few rooms with more than 50 chairs get an area
+    # under 10 sqm (a typo the area step corrects)
+    area = rng.uniform(15, 150, n_rows)
+    crowded = np.flatnonzero(pd.to_numeric(pd.Series(n_chairs), errors="coerce").to_numpy() > 50)
+    tiny = crowded[rng.random(len(crowded)) < tiny_rate * n_rows / max(1, len(crowded))]
+    area[tiny] = rng.uniform(3, 9.5, len(tiny))
+    fmt = rng.integers(0, len(AREA_FORMATS), n_rows)
+    values = np.empty(n_rows, dtype=object)
+    for i, template in enumerate(AREA_FORMATS):
+        rows = np.flatnonzero(fmt == i)
+        values[rows] = [template.format(a) for a in area[rows]]
+    values[tiny] = [f"{a:.1f}" for a in area[tiny]]
+    missing = rng.random(n_rows) < missing_rate
+    missing[tiny] = False
+    values[missing] = None
+    return values
+
+
+def make_raw_frame(n_rows, duplicate_rate=0.2, seed=0):
+    # Raw export with `n_rows` rows, `duplicate_rate` of them repeating a
+    # classroom that is already in the frame
+    rng = np.random.default_rng(seed)
+    columns = {
+        "classroom ": _classrooms(rng, n_rows, duplicate_rate),
+        "n_chairs": _counts(rng, 5, 120, n_rows, 0.06),
+        "n_aircon": _counts(rng, 0, 3, n_rows, 0.1, 0.1, "unit", ["2 (just for hot weather)"]),
+        "n_windows": _counts(rng, 0, 7, n_rows, 0.06, 0.05, "windows"),
+        "Ligting": _counts(rng, 2, 16, n_rows, 0.13, 0.15, "lamps", ["6 (broken 2)", "12.5", " 8 "]),
+        "socket": _counts(rng, 0, 20, n_rows, 0.06),
+        "Nbr of cameras": _counts(rng, 0, 2, n_rows, 0.04, 0.05, "cam"),
+        "Nbr of doors": _counts(rng, 1, 2, n_rows, 0.05, 0.05, "doors"),
+    }
+    columns["area"] = _areas(rng, columns["n_chairs"], n_rows)
+    for col, (values, missing_rate) in TEXT_COLUMNS.items():
+        columns[col] = _pick(rng, values, n_rows, missing_rate)
+    return pd.DataFrame(columns)[COLUMNS]
+
+
+def make_sections(n_sections, seed=0):
+    # Course sections for allocation.py: size, meetings and equipment needs
+    rng = np.random.default_rng(seed)
+    patterns = rng.integers(0, len(DAY_PATTERNS), n_sections)
+    times = np.array(START_TIMES)[rng.integers(0, len(START_TIMES), n_sections)]
+    return pd.DataFrame({
+        "section": [f"S{i:05d}" for i in range(n_sections)],
+        "size": np.clip(rng.lognormal(3.3, 0.55, n_sections).round(), 5, 115).astype(int),
+        "slots": [";".join(f"{day} {time}" for day in DAY_PATTERNS[p]) for p, time in zip(patterns, times)],
+        "needs_smartboard": rng.random(n_sections) < 0.3,
+        "needs_computer": rng.random(n_sections) < 0.2,
+        "min_sockets": np.where(rng.random(n_sections) < 0.1, 10, 0),
+        "quiet": rng.random(n_sections) < 0.15,
+    })
+
+
+def write_raw_frame(df, path, sheet_name=SHEET_NAME):
+    # .csv or a workbook, depending on the file name
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        df.to_csv(path, index=False)
+    elif len(df) > EXCEL_MAX_ROWS:
+        raise ValueError(f"{len(df)} rows do not fit in a worksheet ({EXCEL_MAX_ROWS} max) - write a .csv")
+    else:
+        df.to_excel(path, sheet_name=sheet_name, index=False, engine=EXCEL_ENGINE)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--output", default="synthetic_classrooms.xlsx", help=".xlsx or .csv")
+    parser.add_argument("--duplicate-rate", type=float, default=0.2,
+                        help="share of rows repeating an earlier classroom (default: 0.2)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sections", type=int, default=None,
+                        help="write this many course sections (allocation.py input) instead")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.sections is not None:
+        sections = make_sections(args.sections, args.seed)
+        sections.to_csv(args.output, index=False)
+        print(f"✅ {len(sections)} synthetic course sections saved as '{args.output}'")
+        return
+    df = make_raw_frame(args.rows, args.duplicate_rate, args.seed)
+    path = write_raw_frame(df, args.output)
+    print(f"✅ {len(df)} synthetic rows ({df['classroom '].nunique()} classroom spellings) "
+          f"saved as '{path}' in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
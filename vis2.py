@@ -1,31 +1,37 @@
-import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-# Load the cleaned dataset
-df = pd.read_excel("cleaned_data.xlsx")
+from results_cache import load_results
 
-# Select numeric data for heatmap
-numeric_df = df.select_dtypes(include=['number'])
+# Load the tables derived from the cleaned dataset (cached by
+# data_processing.py, or computed once from the file - see results_cache.py)
+results = load_results("cleaned_data.xlsx", verbose=True)
 
 # Create a single figure with subplots
 fig, axes = plt.subplots(2, 2, figsize=(15, 10))
 fig.suptitle("Classroom Data Visualizations", fontsize=16)
 
 # Distribution of Classroom Sizes (Histogram)
-sns.histplot(df["n_chairs"], bins=10, kde=True, color="blue", ax=axes[0, 0])
+histogram = results["n_chairs_histogram"]
+axes[0, 0].bar(histogram["edges"][:-1], histogram["counts"], width=np.diff(histogram["edges"]), align="edge",
+               color="blue", alpha=0.5, edgecolor="white")
+if histogram["kde_x"] is not None:
+    axes[0, 0].plot(histogram["kde_x"], histogram["kde_y"], color="blue")
 axes[0, 0].set_title("Distribution of Classroom Sizes")
 axes[0, 0].set_xlabel("Number of Chairs")
 axes[0, 0].set_ylabel("Frequency")
 
-# Number of Classrooms Per Floor (Countplot)
-sns.countplot(y=df["floor"], order=df["floor"].value_counts().index, palette="viridis", ax=axes[0, 1])
+# Number of Classrooms Per Floor (bars from the floor counts)
+floor_counts = results["value_counts"]["floor"]
+sns.barplot(x="Count", y="floor", data=floor_counts, order=floor_counts["floor"].tolist(), orient="h",
+            palette="viridis", ax=axes[0, 1])
 axes[0, 1].set_title("Number of Classrooms Per Floor")
 axes[0, 1].set_xlabel("Number of Classrooms")
 axes[0, 1].set_ylabel("Floor")
 
 # Heatmap: Correlation Between Numeric Features
-sns.heatmap(numeric_df.corr(), annot=True, cmap="coolwarm", fmt=".2f", linewidths=0.5, ax=axes[1, 0])
+sns.heatmap(results["correlation"], annot=True, cmap="coolwarm", fmt=".2f", linewidths=0.5, ax=axes[1, 0])
 axes[1, 0].set_title("Correlation Between Classroom Features")
 
 # Hide the empty subplot (axes[1,1]) if you're using a 2x2 layout
@@ -1,23 +1,26 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-# Load your Excel file
-df = pd.read_excel("cleaned_data.xlsx")
+from results_cache import load_results
 
-# Select categorical columns (usually of type 'object')
-categorical_df = df.select_dtypes(include='object')
+# Load the tables derived from the cleaned dataset (cached by
+# data_processing.py, or computed once from the file - see results_cache.py)
+results = load_results("cleaned_data.xlsx", verbose=True)
 
 # Set the style for the plots
 sns.set(style="whitegrid")
 
-# Plot each categorical feature
-for col in categorical_df.columns:
+# Plot each categorical feature (text/category columns) from its value counts
+for col in results["categorical"]:
+    counts = results["value_counts"][col]
     plt.figure(figsize=(8, 5))
-    sns.countplot(data=df, x=col, palette='pastel', order=df[col].value_counts().index)
+    sns.barplot(data=counts, x=col, y="Count", palette='pastel', order=counts[col].tolist())
     plt.title(f'Distribution of {col}')
     plt.xlabel(col)
     plt.ylabel("Count")
     plt.xticks(rotation=45)
     plt.tight_layout()
     plt.show()
+    # Free the figure once shown (with a non-interactive backend show()
+    # returns straight away and the figures would pile up)
+    plt.close()